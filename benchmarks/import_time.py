@@ -0,0 +1,42 @@
+"""
+Measure how long ``import pynwb`` takes in a fresh interpreter.
+
+Usage::
+
+    python benchmarks/import_time.py [--repeat N] [--cache-dir DIR]
+
+With ``--cache-dir``, the core namespace is loaded from a cache in DIR (see ``PYNWB_CACHE_DIR``), which is
+filled by the first run.
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import subprocess
+import sys
+
+IMPORT = 'import time; t = time.time(); import pynwb; print(time.time() - t)'
+
+
+def run(code, env):
+    out = subprocess.check_output([sys.executable, '-c', code], env=env, stderr=subprocess.STDOUT)
+    return [float(x) for x in out.decode('utf-8').splitlines()[-1].split()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='measure the time it takes to import pynwb')
+    parser.add_argument('--repeat', type=int, default=10, help='the number of imports to time')
+    parser.add_argument('--cache-dir', default=None, help='the directory to cache the core namespace in')
+    args = parser.parse_args()
+    env = dict(os.environ)
+    env.pop('PYNWB_CACHE_DIR', None)
+    if args.cache_dir is not None:
+        env['PYNWB_CACHE_DIR'] = args.cache_dir
+        run(IMPORT, env)
+    times = sorted(run(IMPORT, env)[-1] for i in range(args.repeat))
+    print('import pynwb: median %.1f ms, min %.1f ms over %d runs' %
+          (1000 * times[len(times) // 2], 1000 * times[0], args.repeat))
+
+
+if __name__ == '__main__':
+    main()
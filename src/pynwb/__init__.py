@@ -2,7 +2,7 @@
 for reading and writing data in NWB format
 '''
 import os.path
-from copy import deepcopy
+from copy import copy
 from warnings import warn
 
 import h5py
@@ -10,9 +10,10 @@ import h5py
 CORE_NAMESPACE = 'core'
 
 from .form.spec import NamespaceCatalog  # noqa: E402
-from .form.utils import docval, getargs, popargs, call_docval_func  # noqa: E402
+from .form.utils import docval, getargs, popargs, call_docval_func, get_docval  # noqa: E402
 from .form.backends.io import FORMIO  # noqa: E402
-from .form.backends.hdf5 import HDF5IO as _HDF5IO  # noqa: E402
+from .form.backends.hdf5 import HDF5IO as _HDF5IO, H5ChunkCache, H5ChunkLRUCache, H5ChunkPlanner  # noqa: E402
+from .form.backends.hdf5 import H5RepackPolicy  # noqa: E402,F401
 from .form.validate import ValidatorMap  # noqa: E402
 from .form.build import BuildManager  # noqa: E402
 
@@ -26,6 +27,9 @@ def __get_resources():
     from os.path import join
     ret = dict()
     ret['namespace_path'] = join(resource_filename(__name__, 'data'), __core_ns_file_name)
+    # the loaded core namespace is only cached if PYNWB_CACHE_DIR is set to a directory only the user can write to,
+    # since the cache is unpickled on import
+    ret['cache_dir'] = os.environ.get('PYNWB_CACHE_DIR') or None
     return ret
 
 
@@ -58,28 +62,65 @@ def get_type_map(**kwargs):
     extensions = getargs('extensions', kwargs)
     type_map = None
     if extensions is None:
-        type_map = deepcopy(__TYPE_MAP)
+        type_map = copy(__TYPE_MAP)
     else:
+        key = __get_extensions_key(extensions)
+        if key is not None:
+            cached = __EXTENSION_TYPE_MAPS.get(key)
+            if cached is not None and all(os.path.exists(f) and os.path.getmtime(f) == t for f, t in cached[1]):
+                return copy(cached[0])
+        files = list()
         if isinstance(extensions, TypeMap):
             type_map = extensions
         else:
-            type_map = deepcopy(__TYPE_MAP)
+            type_map = copy(__TYPE_MAP)
         if isinstance(extensions, list):
             for ext in extensions:
                 if isinstance(ext, str):
-                    type_map.load_namespaces(ext)
+                    __load_extension(type_map, ext, files)
                 elif isinstance(ext, TypeMap):
                     type_map.merge(ext)
                 else:
                     msg = 'extensions must be a list of paths to namespace specs or a TypeMaps'
                     raise ValueError(msg)
         elif isinstance(extensions, str):
-            type_map.load_namespaces(extensions)
+            __load_extension(type_map, extensions, files)
         elif isinstance(extensions, TypeMap):
             type_map.merge(extensions)
+        if key is not None:
+            __EXTENSION_TYPE_MAPS[key] = (copy(type_map), [(f, os.path.getmtime(f)) for f in files])
     return type_map
 
 
+# the TypeMaps for the extensions loaded with get_type_map, keyed by the paths to the namespace files. Each entry
+# holds the TypeMap and the modification times of the namespace and specification files it was loaded from
+__EXTENSION_TYPE_MAPS = dict()
+
+
+def __get_extensions_key(extensions):
+    paths = extensions if isinstance(extensions, list) else [extensions]
+    if not all(isinstance(p, str) for p in paths):
+        return None
+    return tuple(os.path.abspath(p) for p in paths)
+
+
+def __load_extension(type_map, namespace_path, files):
+    namespace_dir = os.path.dirname(os.path.abspath(namespace_path))
+    files.append(os.path.abspath(namespace_path))
+    for ns in type_map.load_namespaces(namespace_path):
+        try:
+            sources = type_map.namespace_catalog.get_namespace_sources(ns)
+        except KeyError:
+            # the namespace only includes other namespaces
+            continue
+        files.extend(os.path.join(namespace_dir, s) for s in sources)
+
+
+def __clear_extension_type_maps():
+    # the TypeMaps for extensions are copies of the global TypeMap, so they must be loaded again when it changes
+    __EXTENSION_TYPE_MAPS.clear()
+
+
 @docval({'name': 'extensions', 'type': (str, TypeMap, list),
          'doc': 'a path to a namespace, a TypeMap, or a list consisting paths to namespaces and TypeMaps',
          'default': None},
@@ -103,13 +144,14 @@ def load_namespaces(**kwargs):
     Load namespaces from file
     '''
     namespace_path = getargs('namespace_path', kwargs)
+    __clear_extension_type_maps()
     return __TYPE_MAP.load_namespaces(namespace_path)
 
 
 # load the core namespace i.e. base NWB specification
 __resources = __get_resources()
 if os.path.exists(__resources['namespace_path']):
-    load_namespaces(__resources['namespace_path'])
+    __TYPE_MAP.load_namespaces(__resources['namespace_path'], cache_dir=__resources['cache_dir'])
 
 
 @docval(returns="a tuple of the available namespaces", rtype=tuple)
@@ -131,6 +173,7 @@ def register_class(**kwargs):
     neurodata_type, namespace, container_cls = getargs('neurodata_type', 'namespace', 'container_cls', kwargs)
 
     def _dec(cls):
+        __clear_extension_type_maps()
         __TYPE_MAP.register_container_type(namespace, neurodata_type, cls)
         return cls
     if container_cls is None:
@@ -152,6 +195,7 @@ def register_map(**kwargs):
     container_cls, mapper_cls = getargs('container_cls', 'mapper_cls', kwargs)
 
     def _dec(cls):
+        __clear_extension_type_maps()
         __TYPE_MAP.register_map(container_cls, cls)
         return cls
     if mapper_cls is None:
@@ -169,6 +213,8 @@ def get_class(**kwargs):
     """Get the class object of the NWBContainer subclass corresponding to a given neurdata_type.
     """
     neurodata_type, namespace = getargs('neurodata_type', 'namespace', kwargs)
+    # a class generated for the neurodata_type is registered with the global TypeMap
+    __clear_extension_type_maps()
     return __TYPE_MAP.get_container_cls(namespace, neurodata_type)
 
 
@@ -186,6 +232,21 @@ def validate(**kwargs):
     return validator.validate(builder)
 
 
+@docval({'name': 'nbytes', 'type': int, 'doc': 'the largest number of bytes to put in a chunk', 'default': 1024**2},
+        returns="a chunk planner for the data of the core neurodata_types", rtype=H5ChunkPlanner,
+        is_method=False)
+def get_chunk_planner(**kwargs):
+    '''
+    Get an H5ChunkPlanner that chunks the data of ElectricalSeries for reading windows of time across channels,
+    of ImageSeries for reading whole frames, and of RoiResponseSeries for reading the trace of one ROI
+    '''
+    planner = H5ChunkPlanner(getargs('nbytes', kwargs))
+    planner.set_access_pattern('ElectricalSeries', 'time')
+    planner.set_access_pattern('ImageSeries', 'frame')
+    planner.set_access_pattern('RoiResponseSeries', 'series')
+    return planner
+
+
 class NWBHDF5IO(_HDF5IO):
 
     @docval({'name': 'path', 'type': str, 'doc': 'the path to the HDF5 file'},
@@ -197,10 +258,27 @@ class NWBHDF5IO(_HDF5IO):
             {'name': 'extensions', 'type': (str, TypeMap, list),
              'doc': 'a path to a namespace, a TypeMap, or a list consisting paths \
              to namespaces and TypeMaps', 'default': None},
-            {'name': 'file', 'type': h5py.File, 'doc': 'a pre-existing h5py.File object', 'default': None})
+            {'name': 'file', 'type': h5py.File, 'doc': 'a pre-existing h5py.File object', 'default': None},
+            {'name': 'lazy', 'type': bool,
+             'doc': 'read the contents of each group only when it is first accessed', 'default': False},
+            {'name': 'memmap', 'type': bool,
+             'doc': 'read contiguous, uncompressed numeric datasets as read-only numpy.memmap arrays',
+             'default': False},
+            {'name': 'chunk_cache', 'type': H5ChunkCache,
+             'doc': 'the chunk cache settings to use for all chunked datasets that are read', 'default': None},
+            {'name': 'dataset_chunk_cache', 'type': dict,
+             'doc': 'the chunk cache settings to use for specific datasets, keyed by the path of the dataset',
+             'default': None},
+            {'name': 'chunk_lru_cache', 'type': H5ChunkLRUCache,
+             'doc': 'a cache of decompressed chunks to read all chunked datasets through', 'default': None},
+            {'name': 'chunk_planner', 'type': H5ChunkPlanner,
+             'doc': 'the planner to choose the shape of chunks with, when chunking is needed but no chunk shape '
+                    'is given. Defaults to the planner returned by get_chunk_planner', 'default': None})
     def __init__(self, **kwargs):
-        path, mode, manager, extensions, load_namespaces, file_obj =\
-            popargs('path', 'mode', 'manager', 'extensions', 'load_namespaces', 'file', kwargs)
+        path, mode, manager, extensions, load_namespaces, file_obj, lazy, memmap, chunk_cache, dataset_chunk_cache,\
+            chunk_lru_cache, chunk_planner = popargs('path', 'mode', 'manager', 'extensions', 'load_namespaces',
+                                                     'file', 'lazy', 'memmap', 'chunk_cache', 'dataset_chunk_cache',
+                                                     'chunk_lru_cache', 'chunk_planner', kwargs)
         if load_namespaces:
             if manager is not None:
                 warn("loading namespaces from file - ignoring 'manager'")
@@ -226,7 +304,23 @@ class NWBHDF5IO(_HDF5IO):
                 manager = get_manager(extensions=extensions)
             elif manager is None:
                 manager = get_manager()
-        super(NWBHDF5IO, self).__init__(path, manager=manager, mode=mode, file=file_obj)
+        if chunk_planner is None:
+            chunk_planner = get_chunk_planner()
+        super(NWBHDF5IO, self).__init__(path, manager=manager, mode=mode, file=file_obj, lazy=lazy,
+                                        memmap=memmap, chunk_cache=chunk_cache,
+                                        dataset_chunk_cache=dataset_chunk_cache, chunk_lru_cache=chunk_lru_cache,
+                                        chunk_planner=chunk_planner)
+
+    @classmethod
+    @docval(*get_docval(_HDF5IO.repack_file))
+    def repack_file(cls, **kwargs):
+        '''
+        Copy an NWB file, rewriting each dataset with the storage options that `policy` gives it. The data types
+        of groups are looked up in the core namespace, unless another manager is given.
+        '''
+        if kwargs.get('manager') is None:
+            kwargs['manager'] = get_manager()
+        call_docval_func(super(NWBHDF5IO, cls).repack_file, kwargs)
 
 
 from . import io as __io  # noqa: F401,E402
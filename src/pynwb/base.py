@@ -2,8 +2,10 @@ from warnings import warn
 
 from collections import Iterable
 
+import numpy as np
+
 from .form.utils import docval, getargs, popargs, fmt_docval_args, call_docval_func
-from .form.data_utils import AbstractDataChunkIterator, DataIO
+from .form.data_utils import AbstractDataChunkIterator, DataIO, BufferPool, read_into, extend_data
 
 from . import register_class, CORE_NAMESPACE
 from .core import NWBDataInterface, MultiContainerInterface, NWBData
@@ -181,6 +183,45 @@ class TimeSeries(NWBDataInterface):
         else:
             return self.fields['data']
 
+    @docval({'name': 'selection', 'type': None, 'doc': 'the selection of data to read. Read all data if None',
+             'default': None},
+            {'name': 'out', 'type': np.ndarray, 'doc': 'the NumPy array to read into', 'default': None},
+            {'name': 'pool', 'type': BufferPool, 'doc': 'the pool to get the array to read into from, if out is None',
+             'default': None},
+            returns='the array that was read into', rtype=np.ndarray)
+    def read_data(self, **kwargs):
+        """
+        Read a selection of data into a preallocated NumPy array, instead of allocating a new array for each read.
+        Data read from an HDF5 file is read straight into the array.
+        """
+        selection, out, pool = getargs('selection', 'out', 'pool', kwargs)
+        return read_into(self.data, selection, out=out, pool=pool)
+
+    @docval({'name': 'data', 'type': ('array_data', 'data'), 'doc': 'the samples to add to the end of data'},
+            {'name': 'timestamps', 'type': ('array_data', 'data'),
+             'doc': 'the timestamps of the samples. Required if this TimeSeries has timestamps', 'default': None})
+    def append_data(self, **kwargs):
+        """
+        Add samples to the end of this TimeSeries. If data and timestamps were read from a file that is open for
+        writing, they are resized in place, which requires that they were written with an unlimited first axis.
+        """
+        data, timestamps = getargs('data', 'timestamps', kwargs)
+        if isinstance(self.fields['data'], TimeSeries):
+            raise ValueError("cannot append to data linked from TimeSeries '%s'" % self.fields['data'].name)
+        if 'timestamps' in self.fields:
+            if timestamps is None:
+                raise ValueError("'timestamps' must be given to append to a TimeSeries with timestamps")
+            if isinstance(self.fields['timestamps'], TimeSeries):
+                raise ValueError("cannot append to timestamps linked from TimeSeries '%s'"
+                                 % self.fields['timestamps'].name)
+            if len(timestamps) != len(data):
+                raise ValueError("got %d timestamps for %d samples" % (len(timestamps), len(data)))
+        elif timestamps is not None:
+            raise ValueError("cannot append timestamps to a TimeSeries with a sampling rate")
+        self.fields['data'] = extend_data(self.fields['data'], data)
+        if timestamps is not None:
+            self.fields['timestamps'] = extend_data(self.fields['timestamps'], timestamps)
+
     @property
     def data_link(self):
         return self.__get_links('data_link')
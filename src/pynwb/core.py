@@ -1,9 +1,9 @@
 from h5py import RegionReference
 import numpy as np
-import pandas as pd
 
 from .form.utils import docval, getargs, ExtenderMeta, call_docval_func, popargs, get_docval, fmt_docval_args, pystr
 from .form import Container, Data, DataRegion, get_region_slicer
+from .form.data_utils import append_data, extend_data
 
 from . import CORE_NAMESPACE, register_class
 from six import with_metaclass
@@ -294,22 +294,12 @@ class NWBData(NWBBaseType, Data):
         return self.data[args]
 
     def append(self, arg):
-        if isinstance(self.data, list):
-            self.data.append(arg)
-        elif isinstance(self.data, np.ndarray):
-            self.__data = np.append(self.__data, [arg])
-        else:
-            msg = "NWBData cannot append to object of type '%s'" % type(self.__data)
-            raise ValueError(msg)
+        self.__data = append_data(self.__data, arg)
+        self.set_modified()
 
     def extend(self, arg):
-        if isinstance(self.data, list):
-            self.data.extend(arg)
-        elif isinstance(self.data, np.ndarray):
-            self.__data = np.append(self.__data, [arg])
-        else:
-            msg = "NWBData cannot extend object of type '%s'" % type(self.__data)
-            raise ValueError(msg)
+        self.__data = extend_data(self.__data, arg)
+        self.set_modified()
 
 
 @register_class('Index', CORE_NAMESPACE)
@@ -350,7 +340,7 @@ class VectorData(NWBData):
     @docval({'name': 'val', 'type': None, 'doc': 'the value to add to this column'})
     def add_row(self, **kwargs):
         val = getargs('val', kwargs)
-        self.data.append(val)
+        self.append(val)
 
 
 @register_class('VectorIndex', CORE_NAMESPACE)
@@ -371,7 +361,7 @@ class VectorIndex(Index):
 
     def add_vector(self, arg):
         self.target.extend(arg)
-        self.data.append(len(self.target))
+        self.append(len(self.target))
 
     def add_row(self, arg):
         self.add_vector(arg)
@@ -531,12 +521,14 @@ class NWBTable(NWBData):
         '''Produce a pandas DataFrame containing this table's data.
         '''
 
+        import pandas as pd
+
         data = {colname: self[colname] for ii, colname in enumerate(self.columns)}
         return pd.DataFrame(data)
 
     @classmethod
     @docval(
-        {'name': 'df', 'type': pd.DataFrame, 'doc': 'input data'},
+        {'name': 'df', 'type': 'DataFrame', 'doc': 'input data'},
         {'name': 'name', 'type': str, 'doc': 'the name of this container', 'default': None},
         {
             'name': 'extra_ok',
@@ -1082,7 +1074,7 @@ class DynamicTable(NWBDataInterface):
             row_id = data.pop('id', None)
         if row_id is None:
             row_id = len(self)
-        self.id.data.append(row_id)
+        self.id.append(row_id)
 
         for colname, colnum in self.__colids.items():
             if colname not in data:
@@ -1205,6 +1197,8 @@ class DynamicTable(NWBDataInterface):
         '''Produce a pandas DataFrame containing this table's data.
         '''
 
+        import pandas as pd
+
         data = {}
         for name in self.colnames:
             col = self.__df_cols[self.__colids[name]]
@@ -1214,7 +1208,7 @@ class DynamicTable(NWBDataInterface):
 
     @classmethod
     @docval(
-        {'name': 'df', 'type': pd.DataFrame, 'doc': 'source DataFrame'},
+        {'name': 'df', 'type': 'DataFrame', 'doc': 'source DataFrame'},
         {'name': 'name', 'type': str, 'doc': 'the name of this table'},
         {
             'name': 'index_column',
@@ -7,8 +7,6 @@ from . import register_class, CORE_NAMESPACE
 from .base import TimeSeries
 from .core import DynamicTable, ElementIdentifiers
 
-import pandas as pd
-
 
 @register_class('TimeIntervals', CORE_NAMESPACE)
 class TimeIntervals(DynamicTable):
@@ -87,7 +85,7 @@ class TimeIntervals(DynamicTable):
 
     @classmethod
     @docval(
-        {'name': 'df', 'type': pd.DataFrame, 'doc': 'source DataFrame'},
+        {'name': 'df', 'type': 'DataFrame', 'doc': 'source DataFrame'},
         {'name': 'name', 'type': str, 'doc': 'the name of this table'},
         {
             'name': 'index_column',
@@ -4,7 +4,7 @@ from collections import Iterable
 from warnings import warn
 import copy as _copy
 
-from .form.utils import docval, getargs, fmt_docval_args, call_docval_func, get_docval
+from .form.utils import docval, getargs, fmt_docval_args, call_docval_func, get_docval, trusted_docval
 from .form import Container
 
 from . import register_class, CORE_NAMESPACE
@@ -467,7 +467,13 @@ class NWBFile(MultiContainerInterface):
         d = _copy.copy(kwargs['data']) if kwargs.get('data') is not None else kwargs
         if d.get('group_name', None) is None:
             d['group_name'] = d['group'].name
-        call_docval_func(self.electrodes.add_row, d)
+        if kwargs.get('data') is None:
+            # the arguments that DynamicTable.add_row checks have been checked above
+            with trusted_docval():
+                call_docval_func(self.electrodes.add_row, d)
+        else:
+            # the row passed as data has not been checked
+            call_docval_func(self.electrodes.add_row, d)
 
     @docval({'name': 'region', 'type': (slice, list, tuple), 'doc': 'the indices of the table'},
             {'name': 'description', 'type': str, 'doc': 'a brief description of what this electrode is'},
@@ -507,7 +513,13 @@ class NWBFile(MultiContainerInterface):
 
         """
         self.__check_units()
-        call_docval_func(self.units.add_unit, kwargs)
+        if kwargs.get('data') is None:
+            # the arguments have been checked against the signature of Units.add_unit above
+            with trusted_docval():
+                call_docval_func(self.units.add_unit, kwargs)
+        else:
+            # the row passed as data has not been checked
+            call_docval_func(self.units.add_unit, kwargs)
 
     def __check_trials(self):
         if self.trials is None:
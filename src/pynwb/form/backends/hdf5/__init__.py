@@ -1,7 +1,7 @@
 # flake8: noqa: F401
 from . import h5_utils
 from .h5tools import HDF5IO
-from .h5_utils import H5RegionSlicer, H5DataIO
+from .h5_utils import H5RegionSlicer, H5DataIO, H5ChunkCache, H5ChunkLRUCache, H5ChunkPlanner, H5RepackPolicy
 from . import h5tools
 from .h5tools import H5SpecWriter
 from .h5tools import H5SpecReader
@@ -1,12 +1,17 @@
 from copy import copy
-from collections import Iterable
+from collections import Iterable, OrderedDict
+from itertools import product
 from six import binary_type, text_type
-from h5py import Group, Dataset, RegionReference, Reference, special_dtype
+from h5py import Group, Dataset, RegionReference, Reference, special_dtype, check_dtype, h5r, h5s, h5t, h5z
+from multiprocessing.pool import ThreadPool
 import json
 import h5py
 import numpy as np
 import warnings
 import os
+import posixpath
+import weakref
+import zlib
 
 from ...query import FORMDataset
 from ...array import Array
@@ -15,6 +20,91 @@ from ...data_utils import RegionSlicer, DataIO, AbstractDataChunkIterator
 
 from ...spec import SpecWriter, SpecReader
 
+# the most regions of a dataset that are read together by H5RegionSlicer
+MAX_REGION_BATCH = 1024
+
+# the number of rows of a reference column whose object addresses are read and cached together
+REF_ADDRESS_BLOCK = 4096
+
+
+class H5ChunkLRUCache(object):
+    '''
+    A least-recently-used cache of the decompressed chunks of HDF5 datasets, keyed by file, dataset path and
+    chunk index, that holds at most a given number of bytes. A cache can be shared by several HDF5IO objects.
+    '''
+
+    @docval({'name': 'nbytes', 'type': int, 'doc': 'the maximum number of bytes of chunks to hold',
+             'default': 256 * 1024**2})
+    def __init__(self, **kwargs):
+        self.__max_nbytes = getargs('nbytes', kwargs)
+        if self.__max_nbytes <= 0:
+            raise ValueError("nbytes must be positive - got %d" % self.__max_nbytes)
+        self.__chunks = OrderedDict()
+        self.__nbytes = 0
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+
+    @property
+    def max_nbytes(self):
+        return self.__max_nbytes
+
+    @property
+    def nbytes(self):
+        '''The number of bytes of chunks held now'''
+        return self.__nbytes
+
+    @property
+    def hits(self):
+        return self.__hits
+
+    @property
+    def misses(self):
+        return self.__misses
+
+    @property
+    def evictions(self):
+        return self.__evictions
+
+    @property
+    def hit_rate(self):
+        '''The fraction of chunk lookups that were found in the cache, or None if there were no lookups'''
+        total = self.__hits + self.__misses
+        return self.__hits / float(total) if total > 0 else None
+
+    def __len__(self):
+        return len(self.__chunks)
+
+    def get(self, key):
+        '''Get the chunk for key, or None if it is not in the cache'''
+        ret = self.__chunks.pop(key, None)
+        if ret is None:
+            self.__misses += 1
+        else:
+            self.__hits += 1
+            self.__chunks[key] = ret
+        return ret
+
+    def put(self, key, chunk):
+        '''Add a chunk to the cache, evicting the least recently used chunks to stay within the byte budget'''
+        old = self.__chunks.pop(key, None)
+        if old is not None:
+            self.__nbytes -= old.nbytes
+        if chunk.nbytes > self.__max_nbytes:
+            return
+        self.__chunks[key] = chunk
+        self.__nbytes += chunk.nbytes
+        while self.__nbytes > self.__max_nbytes:
+            evicted_key, evicted = self.__chunks.popitem(last=False)
+            self.__nbytes -= evicted.nbytes
+            self.__evictions += 1
+
+    def clear(self, filename=None):
+        '''Remove all chunks from the cache, or only those of the given file'''
+        for key in list(self.__chunks.keys()):
+            if filename is None or key[0] == filename:
+                self.__nbytes -= self.__chunks.pop(key).nbytes
+
 
 class H5Dataset(FORMDataset):
     @docval({'name': 'dataset', 'type': (Dataset, Array), 'doc': 'the HDF5 file lazily evaluate'},
@@ -22,11 +112,170 @@ class H5Dataset(FORMDataset):
     def __init__(self, **kwargs):
         self.__io = popargs('io', kwargs)
         call_docval_func(super(H5Dataset, self).__init__, kwargs)
+        self.__ref_addresses = dict()
+        self.__region_queue = list()
+        self.__region_queue_limit = MAX_REGION_BATCH  # the length of the queue at which to drop dead slicers
 
     @property
     def io(self):
         return self.__io
 
+    def __getitem__(self, arg):
+        cache = getattr(self.io, 'chunk_lru_cache', None)
+        if cache is not None and isinstance(self.dataset, Dataset) and self.dataset.chunks is not None:
+            ret = self.__read_cached(cache, arg)
+            if ret is not None:
+                return ret
+        return super(H5Dataset, self).__getitem__(arg)
+
+    def read_direct(self, dest, source_sel=None):
+        '''
+        Read the selection source_sel of this dataset, or all of it if source_sel is None, into the NumPy array dest
+        '''
+        if isinstance(self.dataset, Dataset) and getattr(self.io, 'chunk_lru_cache', None) is None:
+            self.dataset.read_direct(dest, source_sel=source_sel)
+        else:
+            dest[...] = self[Ellipsis if source_sel is None else source_sel]
+
+    def __read_cached(self, cache, arg):
+        '''
+        Read the selection arg by putting together the chunks it covers, reading through the chunk cache.
+        Return None if arg is not a selection of ints and slices.
+        '''
+        shape, chunks = self.dataset.shape, self.dataset.chunks
+        key = arg if isinstance(arg, tuple) else (arg,)
+        if sum(k is Ellipsis for k in key) == 1:
+            i = key.index(Ellipsis)
+            key = key[:i] + (slice(None),) * (len(shape) - len(key) + 1) + key[i + 1:]
+        if len(key) > len(shape):
+            return None
+        key = key + (slice(None),) * (len(shape) - len(key))
+        bounds = list()
+        local = list()
+        for k, n in zip(key, shape):
+            if isinstance(k, (int, np.integer)) and not isinstance(k, (bool, np.bool_)):
+                i = k + n if k < 0 else k
+                if not 0 <= i < n:
+                    return None
+                bounds.append((i, i + 1))
+                local.append(0)
+            elif isinstance(k, slice):
+                start, stop, step = k.indices(n)
+                if step < 1 or stop <= start:
+                    return None
+                bounds.append((start, stop))
+                local.append(slice(None, None, step))
+            else:
+                return None
+        block = np.empty([stop - start for start, stop in bounds], dtype=self.dataset.dtype)
+        chunk_ranges = [range(start // c, (stop - 1) // c + 1) for (start, stop), c in zip(bounds, chunks)]
+        for idx in product(*chunk_ranges):
+            chunk = self.__get_chunk(cache, idx)
+            src = list()
+            dst = list()
+            for i, c, (start, stop) in zip(idx, chunks, bounds):
+                lo, hi = max(start, i * c), min(stop, (i + 1) * c)
+                src.append(slice(lo - i * c, hi - i * c))
+                dst.append(slice(lo - start, hi - start))
+            block[tuple(dst)] = chunk[tuple(src)]
+        return block[tuple(local)]
+
+    def __get_chunk(self, cache, idx):
+        key = (self.dataset.file.filename, self.dataset.name, idx)
+        ret = cache.get(key)
+        if ret is None:
+            ret = self.dataset[tuple(slice(i * c, min((i + 1) * c, n))
+                                     for i, c, n in zip(idx, self.dataset.chunks, self.dataset.shape))]
+            ret.setflags(write=False)
+            cache.put(key, ret)
+        return ret
+
+    def _get_ref_addresses(self, arg, field=None):
+        '''
+        Get the addresses of the objects pointed to by the object references in the selection arg of this
+        dataset, or of the given field of this compound dataset. The addresses are read and cached REF_ADDRESS_BLOCK
+        rows at a time, and only for the blocks that arg selects from. Returns None if the underlying dataset is
+        not a one-dimensional HDF5 dataset
+        '''
+        if not isinstance(self.dataset, Dataset) or len(self.dataset.shape) != 1:
+            return None
+        rows = self.__get_rows(arg, self.dataset.shape[0])
+        blocks = self.__ref_addresses.setdefault(field, dict())
+        row_blocks = rows // REF_ADDRESS_BLOCK
+        needed = np.unique(row_blocks)
+        for b in needed:
+            if b not in blocks:
+                blocks[b] = self.__read_ref_addresses(b * REF_ADDRESS_BLOCK, field)
+        if len(needed) == 0:
+            return np.empty(rows.shape, dtype=np.uint64)
+        # only the last block of the dataset can be short, so the offset of a row in the joined blocks is
+        # the position of its block times the block size plus its offset in its block
+        addresses = np.concatenate([blocks[b] for b in needed])
+        return addresses[np.searchsorted(needed, row_blocks) * REF_ADDRESS_BLOCK + rows % REF_ADDRESS_BLOCK]
+
+    @staticmethod
+    def __get_rows(arg, length):
+        '''Get the indices of the rows that the selection arg selects from a one-dimensional dataset of length rows'''
+        if isinstance(arg, tuple) and len(arg) == 1:
+            arg = arg[0]
+        if isinstance(arg, slice):
+            return np.arange(*arg.indices(length))
+        if isinstance(arg, (int, np.integer)):
+            return np.asarray(arg + length if arg < 0 else arg)
+        if isinstance(arg, (list, np.ndarray)):
+            rows = np.asarray(arg)
+            if rows.dtype == bool:
+                return np.flatnonzero(rows)
+            return np.where(rows < 0, rows + length, rows)
+        # e.g. Ellipsis, which selects every row
+        return np.arange(length)[arg]
+
+    def __read_ref_addresses(self, start, field):
+        '''Read the addresses behind the object references in the block of rows starting at start'''
+        # an object reference is stored as the address of the object, so read the raw references
+        mtype = h5t.STD_REF_OBJ
+        if field is not None:
+            mtype = h5t.create(h5t.COMPOUND, mtype.get_size())
+            mtype.insert(field.encode('UTF-8'), 0, h5t.STD_REF_OBJ)
+        count = min(REF_ADDRESS_BLOCK, self.dataset.shape[0] - start)
+        fspace = self.dataset.id.get_space()
+        fspace.select_hyperslab((start,), (count,))
+        ret = np.empty((count,), dtype=np.uint64)
+        self.dataset.id.read(h5s.create_simple((count,)), fspace, ret, mtype=mtype)
+        return ret
+
+    def _queue_region(self, slicer, region):
+        '''
+        Queue a region of this dataset to read the next time a queued region is needed. The queue does not keep
+        the slicer alive, and the region of a slicer that is gone is not read. The regions of slicers that are
+        gone are dropped whenever the queue has doubled in length, so it stays within twice the number of slicers
+        still waiting for their region
+        '''
+        self.__region_queue.append((weakref.ref(slicer), region))
+        if len(self.__region_queue) >= self.__region_queue_limit:
+            self.__region_queue = [(ref, region) for ref, region in self.__region_queue if ref() is not None]
+            self.__region_queue_limit = max(MAX_REGION_BATCH, 2 * len(self.__region_queue))
+
+    def _read_queued_regions(self, slicer):
+        '''
+        Read the region queued by slicer together with at most MAX_REGION_BATCH - 1 regions queued after it, and
+        hand each one to the slicer that queued it
+        '''
+        queue = [(ref, region) for ref, region in self.__region_queue if ref() is not None]
+        start = next((i for i, (ref, region) in enumerate(queue) if ref() is slicer), None)
+        if start is None:
+            self.__region_queue = queue
+            return
+        self.__region_queue = queue[:start] + queue[start + MAX_REGION_BATCH:]
+        batch = [(ref(), region) for ref, region in queue[start:start + MAX_REGION_BATCH]]
+        batch = [(s, region) for s, region in batch if s is not None]
+        if not isinstance(self.dataset, Dataset):
+            data = [self.dataset[region] for s, region in batch]
+        else:
+            data = read_regions(self.dataset, [region for s, region in batch])
+        for (s, region), d in zip(batch, data):
+            s._set_region(d)
+
     @property
     def regionref(self):
         return self.dataset.regionref
@@ -46,11 +295,13 @@ class H5TableDataset(H5Dataset):
         types = popargs('types', kwargs)
         call_docval_func(super(H5TableDataset, self).__init__, kwargs)
         self.__refgetters = dict()
+        self.__refcols = list()
         for i, t in enumerate(types):
             if t is RegionReference:
                 self.__refgetters[i] = self.__get_regref
             elif t is Reference:
                 self.__refgetters[i] = self.__get_ref
+                self.__refcols.append(i)
         tmp = list()
         for i in range(len(self.dataset.dtype)):
             sub = self.dataset.dtype[i]
@@ -80,12 +331,23 @@ class H5TableDataset(H5Dataset):
         if isinstance(arg, int):
             self.__swap_refs(rows)
         else:
-            for row in rows:
-                self.__swap_refs(row)
+            # swap the object references of each column at once
+            swapped = set()
+            for i in self.__refcols:
+                field = self.dataset.dtype.names[i]
+                addresses = self._get_ref_addresses(arg, field)
+                if addresses is not None:
+                    rows[field] = self.io._get_ref_containers(self.dataset.file, rows[field], addresses)
+                    swapped.add(i)
+            if len(swapped) < len(self.__refgetters):
+                for row in rows:
+                    self.__swap_refs(row, skip=swapped)
         return rows
 
-    def __swap_refs(self, row):
+    def __swap_refs(self, row, skip=()):
         for i in self.__refgetters:
+            if i in skip:
+                continue
             getref = self.__refgetters[i]
             row[i] = getref(row[i])
 
@@ -102,6 +364,10 @@ class H5ReferenceDataset(H5Dataset):
     def __getitem__(self, arg):
         ref = super(H5ReferenceDataset, self).__getitem__(arg)
         if isinstance(ref, np.ndarray):
+            if check_dtype(ref=self.dataset.dtype) is Reference:
+                addresses = self._get_ref_addresses(arg)
+                if addresses is not None:
+                    return list(self.io._get_ref_containers(self.dataset.file, ref, addresses))
             return [self.io.get_container(self.dataset.file[x]) for x in ref]
         else:
             return self.io.get_container(self.dataset.file[ref])
@@ -174,6 +440,84 @@ class H5SpecReader(SpecReader):
         return ret
 
 
+@docval({'name': 'dataset', 'type': Dataset, 'doc': 'the HDF5 dataset to read from'},
+        {'name': 'regions', 'type': (list, tuple), 'doc': 'the region references to read'},
+        returns='the data selected by each region reference', rtype=list,
+        is_method=False)
+def read_regions(**kwargs):
+    '''
+    Read the data selected by many region references to the same dataset. Regions whose columns overlap or are
+    next to each other are read together: the rows they select are merged into as few contiguous hyperslabs as
+    possible, each of which is read once, and the result is split back up per region. Regions that are not made
+    of whole blocks of rows or points are read on their own.
+    '''
+    dataset, regions = getargs('dataset', 'regions', kwargs)
+    ret = [None] * len(regions)
+    if len(dataset.shape) == 0:
+        return [dataset[region] for region in regions]
+    # the selection of each region, as the rows it covers, the bounds of what it covers in each row,
+    # and its points if it is a point selection
+    selections = dict()
+    for i, region in enumerate(regions):
+        sid = h5r.get_region(region, dataset.id)
+        sel_type = sid.get_select_type()
+        if sel_type == h5s.SEL_ALL:
+            selections[i] = (np.arange(dataset.shape[0]), np.zeros(len(dataset.shape) - 1, dtype=int),
+                             np.array(dataset.shape[1:], dtype=int), None)
+        elif sel_type == h5s.SEL_HYPERSLABS:
+            blocks = sid.get_select_hyper_blocklist().astype(np.int64)
+            blocks = blocks[np.argsort(blocks[:, 0, 0])]
+            start, stop = blocks[:, 0, 1:], blocks[:, 1, 1:] + 1
+            if not ((start == start[0]).all() and (stop == stop[0]).all()):
+                ret[i] = dataset[region]
+                continue
+            rows = np.concatenate([np.arange(b[0, 0], b[1, 0] + 1) for b in blocks])
+            selections[i] = (rows, start[0], stop[0], None)
+        elif sel_type == h5s.SEL_POINTS:
+            points = sid.get_select_elem_pointlist().astype(np.int64)
+            if len(points) == 0:
+                ret[i] = dataset[region]
+                continue
+            selections[i] = (points[:, 0], points[:, 1:].min(axis=0), points[:, 1:].max(axis=0) + 1, points)
+        else:
+            ret[i] = dataset[region]
+    # group the regions whose columns overlap or touch, so that reading a group together does not read columns
+    # between them that none of them selects
+    groups = list()
+    for i in sorted(selections, key=lambda i: tuple(selections[i][1])):
+        start, stop = selections[i][1:3]
+        if len(groups) > 0 and (start <= groups[-1][1]).all() and (groups[-1][0] <= stop).all():
+            col_start, col_stop, group = groups[-1]
+            groups[-1] = (np.minimum(col_start, start), np.maximum(col_stop, stop), group + [i])
+        else:
+            groups.append((start, stop, [i]))
+    for col_start, col_stop, group in groups:
+        _read_region_group(dataset, {i: selections[i] for i in group}, col_start.astype(int),
+                           col_stop.astype(int), ret)
+    return ret
+
+
+def _read_region_group(dataset, selections, col_start, col_stop, ret):
+    '''
+    Read the columns from col_start to col_stop of every row selected in selections, in as few contiguous reads
+    as possible, and put what each selection selects from them in ret
+    '''
+    rows = np.unique(np.concatenate([sel[0] for sel in selections.values()]))
+    breaks = np.where(np.diff(rows) > 1)[0] + 1
+    run_starts = rows[np.concatenate([[0], breaks])]
+    run_stops = rows[np.concatenate([breaks - 1, [len(rows) - 1]])] + 1
+    cols = tuple(slice(int(a), int(b)) for a, b in zip(col_start, col_stop))
+    data = np.concatenate([dataset[(slice(int(a), int(b)),) + cols] for a, b in zip(run_starts, run_stops)])
+    run_offsets = np.concatenate([[0], np.cumsum(run_stops - run_starts)[:-1]])
+    for i, (sel_rows, start, stop, points) in selections.items():
+        run = np.searchsorted(run_starts, sel_rows, side='right') - 1
+        pos = run_offsets[run] + sel_rows - run_starts[run]
+        if points is None:
+            ret[i] = data[(pos,) + tuple(slice(a, b) for a, b in zip(start - col_start, stop - col_start))]
+        else:
+            ret[i] = data[(pos,) + tuple(points[:, 1:].T - col_start[:, np.newaxis])]
+
+
 class H5RegionSlicer(RegionSlicer):
 
     @docval({'name': 'dataset', 'type': (Dataset, H5Dataset), 'doc': 'the HDF5 dataset to slice'},
@@ -183,8 +527,16 @@ class H5RegionSlicer(RegionSlicer):
         self.__regref = getargs('region', kwargs)
         self.__len = self.__dataset.regionref.selection(self.__regref)[0]
         self.__region = None
+        if isinstance(self.__dataset, H5Dataset):
+            # read together with the other regions of the same dataset
+            self.__dataset._queue_region(self, self.__regref)
+
+    def _set_region(self, region):
+        self.__region = region
 
     def __read_region(self):
+        if self.__region is None and isinstance(self.__dataset, H5Dataset):
+            self.__dataset._read_queued_regions(self)
         if self.__region is None:
             self.__region = self.__dataset[self.__regref]
 
@@ -196,6 +548,416 @@ class H5RegionSlicer(RegionSlicer):
         return self.__len
 
 
+class H5ChunkCache(object):
+    '''
+    The chunk cache settings to use when reading chunked datasets, and how many chunks to read ahead
+    along the first axis during sequential reads
+    '''
+
+    @docval({'name': 'nbytes', 'type': int, 'doc': 'the size of the chunk cache in bytes', 'default': 1024**2},
+            {'name': 'nslots', 'type': int,
+             'doc': 'the number of slots in the hash table of the chunk cache. This should be a prime number '
+                    'about 100 times the number of chunks that fit in the cache', 'default': 521},
+            {'name': 'w0', 'type': float,
+             'doc': 'the preemption policy, between 0 and 1. 1 evicts fully read chunks first', 'default': 0.75},
+            {'name': 'read_ahead', 'type': int,
+             'doc': 'the number of chunks along the first axis to read ahead of each read that misses '
+                    'the chunks read before. 0 disables read-ahead', 'default': 0})
+    def __init__(self, **kwargs):
+        self.__nbytes, self.__nslots, self.__w0, self.__read_ahead = getargs('nbytes', 'nslots', 'w0', 'read_ahead',
+                                                                             kwargs)
+        if not 0.0 <= self.__w0 <= 1.0:
+            raise ValueError("w0 must be between 0 and 1 - got %s" % self.__w0)
+        if self.__read_ahead < 0:
+            raise ValueError("read_ahead must not be negative - got %d" % self.__read_ahead)
+
+    @property
+    def nbytes(self):
+        return self.__nbytes
+
+    @property
+    def nslots(self):
+        return self.__nslots
+
+    @property
+    def w0(self):
+        return self.__w0
+
+    @property
+    def read_ahead(self):
+        return self.__read_ahead
+
+
+class H5ChunkPlanner(object):
+    '''
+    Choose the chunk shape of a dataset from its shape, dtype and the way it is going to be read, keeping each
+    chunk within a byte budget. The supported access patterns are:
+
+    * ``'time'``: windows of consecutive rows, with all other axes. Chunks span as many rows as fit.
+    * ``'frame'``: one whole row, e.g. one image, at a time. Chunks are a single row.
+    * ``'series'``: long runs of rows of a single column, e.g. the trace of one ROI. Chunks are one column wide.
+
+    The access pattern of a dataset is looked up by the data type of the group that contains it, and the
+    name of the dataset. Datasets without an access pattern are chunked for ``'time'`` access.
+    '''
+
+    ACCESS_PATTERNS = ('time', 'frame', 'series')
+
+    @docval({'name': 'nbytes', 'type': int, 'doc': 'the largest number of bytes to put in a chunk',
+             'default': 1024**2})
+    def __init__(self, **kwargs):
+        self.__nbytes = getargs('nbytes', kwargs)
+        if self.__nbytes < 1:
+            raise ValueError("nbytes must be positive - got %d" % self.__nbytes)
+        self.__access_patterns = dict()
+
+    @property
+    def nbytes(self):
+        return self.__nbytes
+
+    @docval({'name': 'data_type', 'type': str, 'doc': 'the data type of the group containing the dataset'},
+            {'name': 'access', 'type': str, 'doc': 'the access pattern, one of %s' % str(ACCESS_PATTERNS)},
+            {'name': 'dataset', 'type': str, 'doc': 'the name of the dataset', 'default': 'data'})
+    def set_access_pattern(self, **kwargs):
+        '''Set the access pattern of a dataset in groups of the given data type, and of types that extend it'''
+        data_type, access, dataset = getargs('data_type', 'access', 'dataset', kwargs)
+        if access not in self.ACCESS_PATTERNS:
+            raise ValueError("access must be one of %s - got '%s'" % (str(self.ACCESS_PATTERNS), access))
+        self.__access_patterns[(data_type, dataset)] = access
+
+    @docval({'name': 'data_types', 'type': (list, tuple),
+             'doc': 'the type hierarchy of the group containing the dataset, starting with its own data type'},
+            {'name': 'dataset', 'type': str, 'doc': 'the name of the dataset'},
+            returns='the access pattern of the dataset', rtype=str)
+    def get_access_pattern(self, **kwargs):
+        data_types, dataset = getargs('data_types', 'dataset', kwargs)
+        for data_type in data_types:
+            access = self.__access_patterns.get((data_type, dataset))
+            if access is not None:
+                return access
+        return 'time'
+
+    @docval({'name': 'shape', 'type': (list, tuple), 'doc': 'the initial shape of the dataset'},
+            {'name': 'dtype', 'type': None, 'doc': 'the dtype of the dataset'},
+            {'name': 'maxshape', 'type': (list, tuple),
+             'doc': 'the maximum shape of the dataset. Axes that are None can grow without limit', 'default': None},
+            {'name': 'access', 'type': str, 'doc': 'the access pattern, one of %s' % str(ACCESS_PATTERNS),
+             'default': 'time'},
+            returns='the chunk shape, or None if the dataset should not be chunked', rtype=tuple)
+    def get_chunk_shape(self, **kwargs):
+        shape, dtype, maxshape, access = getargs('shape', 'dtype', 'maxshape', 'access', kwargs)
+        if access not in self.ACCESS_PATTERNS:
+            raise ValueError("access must be one of %s - got '%s'" % (str(self.ACCESS_PATTERNS), access))
+        if len(shape) == 0:
+            return None
+        if maxshape is None:
+            maxshape = shape
+        if any(n == 0 for n, m in zip(shape, maxshape) if m is not None):
+            return None
+        itemsize = max(np.dtype(dtype).itemsize, 1)
+        if access == 'series':
+            row = [1] * (len(shape) - 1)
+        else:
+            row = [max(n, 1) for n in shape[1:]]
+        # shrink the largest axes until a single row fits in the budget
+        while int(np.prod(row)) * itemsize > self.__nbytes and max(row) > 1:
+            i = row.index(max(row))
+            row[i] = (row[i] + 1) // 2
+        if len(shape) > 1 and access == 'frame':
+            nrows = 1
+        else:
+            nrows = max(self.__nbytes // (int(np.prod(row)) * itemsize), 1)
+        # do not make chunks longer than the data, unless the data can grow. Even then, keep the chunks of small
+        # datasets small, since all of a chunk is stored as soon as any of it is written
+        if maxshape[0] is not None:
+            nrows = min(nrows, max(shape[0], 1))
+        else:
+            nrows = min(nrows, max(shape[0], 1024))
+        return tuple([int(nrows)] + [int(n) for n in row])
+
+
+class H5RepackPolicy(object):
+    '''
+    The storage options to rewrite datasets with when repacking a file with HDF5IO.repack_file. Options are set
+    for the dataset at a given path, or for datasets with a given name in groups of a given data type and of the
+    types that extend it. Options set for a path take precedence over options set for a data type, and options
+    that are not set are kept from the dataset being repacked.
+    '''
+
+    __options = (
+        {'name': 'chunks', 'type': (bool, tuple),
+         'doc': 'the chunk shape, True to choose one with the chunk planner, or False to store the dataset '
+                'contiguously and without filters', 'default': None},
+        {'name': 'access', 'type': str,
+         'doc': 'the access pattern to choose the chunk shape for, one of %s' % str(H5ChunkPlanner.ACCESS_PATTERNS),
+         'default': None},
+        {'name': 'compression', 'type': (str, bool),
+         'doc': 'the compression filter e.g. gzip, True for gzip, or False to store the dataset uncompressed',
+         'default': None},
+        {'name': 'compression_opts', 'type': int, 'doc': 'the compression level', 'default': None},
+        {'name': 'shuffle', 'type': bool, 'doc': 'whether or not to shuffle the bytes of chunks before compressing',
+         'default': None},
+        {'name': 'dtype', 'type': (str, type, np.dtype), 'doc': 'the numeric dtype to convert the data to',
+         'default': None})
+
+    @docval({'name': 'chunk_planner', 'type': H5ChunkPlanner,
+             'doc': 'the planner to choose chunk shapes with, for datasets that need to be rechunked or that have to '
+                    'be chunked to be compressed', 'default': None})
+    def __init__(self, **kwargs):
+        self.__chunk_planner = getargs('chunk_planner', kwargs)
+        if self.__chunk_planner is None:
+            self.__chunk_planner = H5ChunkPlanner()
+        self.__path_options = dict()
+        self.__type_options = dict()
+
+    @property
+    def chunk_planner(self):
+        return self.__chunk_planner
+
+    @classmethod
+    def __get_options(cls, kwargs):
+        access = kwargs.get('access')
+        if access is not None and access not in H5ChunkPlanner.ACCESS_PATTERNS:
+            raise ValueError("access must be one of %s - got '%s'" % (str(H5ChunkPlanner.ACCESS_PATTERNS), access))
+        if kwargs.get('chunks') is False and kwargs.get('compression') not in (None, False):
+            raise ValueError('cannot compress a dataset that is not chunked')
+        return {k: v for k, v in kwargs.items() if v is not None}
+
+    @docval({'name': 'path', 'type': str, 'doc': 'the path of the dataset'},
+            *__options)
+    def set_dataset_options(self, **kwargs):
+        '''Set the storage options of the dataset at the given path'''
+        path = popargs('path', kwargs)
+        self.__path_options[path] = self.__get_options(kwargs)
+
+    @docval({'name': 'data_type', 'type': str, 'doc': 'the data type of the group containing the dataset'},
+            {'name': 'dataset', 'type': str, 'doc': 'the name of the dataset', 'default': 'data'},
+            *__options)
+    def set_type_options(self, **kwargs):
+        '''Set the storage options of a dataset in groups of the given data type, and of types that extend it'''
+        data_type, dataset = popargs('data_type', 'dataset', kwargs)
+        self.__type_options[(data_type, dataset)] = self.__get_options(kwargs)
+
+    @docval({'name': 'dataset', 'type': Dataset, 'doc': 'the dataset to repack'},
+            {'name': 'data_types', 'type': (list, tuple),
+             'doc': 'the type hierarchy of the group containing the dataset, starting with its own data type',
+             'default': tuple()},
+            returns='the keyword arguments to create the repacked dataset with, except its name and shape',
+            rtype=dict)
+    def get_create_options(self, **kwargs):
+        dataset, data_types = getargs('dataset', 'data_types', kwargs)
+        options = dict()
+        # the options for the data type of the group itself override those for the types it extends, and the
+        # options for the path of the dataset override both. A chunk shape and an access pattern replace each other
+        levels = [self.__type_options.get((data_type, posixpath.basename(dataset.name))) for data_type in data_types]
+        levels = [self.__path_options.get(dataset.name)] + levels
+        for level in reversed(levels):
+            if level is None:
+                continue
+            if 'chunks' in level or 'access' in level:
+                options.pop('chunks', None)
+                options.pop('access', None)
+            options.update(level)
+        ret = {'dtype': dataset.dtype}
+        if 'dtype' in options:
+            if dataset.dtype.kind not in 'biuf':
+                raise ValueError("cannot convert dataset '%s' with dtype %s" % (dataset.name, dataset.dtype))
+            ret['dtype'] = np.dtype(options['dtype'])
+        if len(dataset.shape) == 0 or options.get('chunks') is False:
+            return ret
+        compression = options.get('compression', dataset.compression)
+        if compression is True:
+            compression = 'gzip'
+        elif compression is False:
+            compression = None
+        if 'compression_opts' in options:
+            compression_opts = options['compression_opts']
+        else:
+            compression_opts = dataset.compression_opts if compression == dataset.compression else None
+        shuffle = options.get('shuffle', dataset.shuffle)
+        chunks = options.get('chunks')
+        if chunks is None and 'access' not in options:
+            chunks = dataset.chunks
+        if chunks is True or (chunks is None and (compression is not None or shuffle or dataset.fletcher32 or
+                                                  'access' in options or dataset.maxshape != dataset.shape)):
+            chunks = self.__chunk_planner.get_chunk_shape(dataset.shape, ret['dtype'], dataset.maxshape,
+                                                          access=options.get('access', 'time'))
+        if chunks is None:
+            return ret
+        # the same chunk shape may be set for datasets of different shapes, so keep it within each dataset
+        chunks = tuple(c if m is None else min(c, max(m, 1)) for c, m in zip(chunks, dataset.maxshape))
+        ret.update(chunks=chunks, maxshape=dataset.maxshape, compression=compression,
+                   compression_opts=compression_opts, shuffle=shuffle, fletcher32=dataset.fletcher32)
+        return ret
+
+
+class H5ReadAheadDataset(H5Dataset):
+    '''
+    A chunked dataset that keeps the rows of the last read, plus the following chunks along the first axis,
+    in memory, so that reading through the dataset in order reads each chunk from the file only once
+    '''
+
+    @docval({'name': 'dataset', 'type': Dataset, 'doc': 'the chunked HDF5 dataset to read from'},
+            {'name': 'io', 'type': 'HDF5IO', 'doc': 'the IO object that was used to read the underlying dataset'},
+            {'name': 'read_ahead', 'type': int, 'doc': 'the number of chunks to read ahead along the first axis'})
+    def __init__(self, **kwargs):
+        read_ahead = popargs('read_ahead', kwargs)
+        call_docval_func(super(H5ReadAheadDataset, self).__init__, kwargs)
+        self.__read_ahead_rows = read_ahead * self.dataset.chunks[0]
+        self.__start = 0
+        self.__buffer = None
+        self.__hits = 0
+        self.__misses = 0
+
+    @property
+    def hits(self):
+        '''The number of reads that were served from rows already in memory'''
+        return self.__hits
+
+    @property
+    def misses(self):
+        '''The number of reads that had to read from the file'''
+        return self.__misses
+
+    @property
+    def shape(self):
+        return self.dataset.shape
+
+    @property
+    def chunks(self):
+        return self.dataset.chunks
+
+    @property
+    def maxshape(self):
+        return self.dataset.maxshape
+
+    @property
+    def name(self):
+        return self.dataset.name
+
+    @property
+    def file(self):
+        return self.dataset.file
+
+    def __get_rows(self, key):
+        '''Get the range of rows selected by key, or None if key does not select a contiguous range of rows'''
+        nrows = self.dataset.shape[0]
+        if isinstance(key, (int, np.integer)):
+            start = key + nrows if key < 0 else key
+            return (start, start + 1) if 0 <= start < nrows else None
+        if isinstance(key, slice):
+            start, stop, step = key.indices(nrows)
+            if step != 1:
+                return None
+            return start, max(start, stop)
+        return None
+
+    def __getitem__(self, arg):
+        key = arg[0] if isinstance(arg, tuple) and len(arg) > 0 else arg
+        rest = arg[1:] if isinstance(arg, tuple) else ()
+        rows = self.__get_rows(key)
+        if rows is None or any(k is Ellipsis for k in rest):
+            self.__misses += 1
+            return super(H5ReadAheadDataset, self).__getitem__(arg)
+        start, stop = rows
+        if self.__buffer is None or start < self.__start or stop > self.__start + len(self.__buffer):
+            self.__misses += 1
+            # read up to the end of the chunk that is read_ahead chunks past the requested rows
+            chunk_rows = self.dataset.chunks[0]
+            end = -(-(stop + self.__read_ahead_rows) // chunk_rows) * chunk_rows
+            self.__start = start
+            self.__buffer = self.dataset[start:min(end, self.dataset.shape[0])]
+        else:
+            self.__hits += 1
+        if isinstance(key, slice):
+            local = slice(start - self.__start, stop - self.__start)
+        else:
+            local = start - self.__start
+        return self.__buffer[(local,) + rest]
+
+    def read_direct(self, dest, source_sel=None):
+        dest[...] = self[Ellipsis if source_sel is None else source_sel]
+
+    def __iter__(self):
+        for i in range(self.dataset.shape[0]):
+            yield self[i]
+
+
+def _compress_chunk(block, shuffle, level):
+    '''Apply the shuffle and deflate filters to a chunk the same way the HDF5 filter pipeline does'''
+    buf = np.ascontiguousarray(block).view(np.uint8)
+    if shuffle and block.dtype.itemsize > 1:
+        # shuffle puts the first byte of every element first, then the second byte of every element, and so on
+        buf = np.ascontiguousarray(buf.reshape(-1, block.dtype.itemsize).T)
+    return zlib.compress(buf.tobytes(), level)
+
+
+@docval({'name': 'dataset', 'type': Dataset, 'doc': 'the chunked HDF5 dataset to write to'},
+        {'name': 'data', 'type': 'array_data', 'doc': 'the data to write, with the same shape as dataset'},
+        {'name': 'workers', 'type': int, 'doc': 'the number of threads to compress chunks with'},
+        {'name': 'offset', 'type': int,
+         'doc': 'the index along the first axis to write data at. This must be the start of a chunk', 'default': 0},
+        returns='whether the data was written. No data is written if the dataset uses filters other than ' +
+                'shuffle and gzip', rtype=bool,
+        is_method=False)
+def write_direct_chunks(**kwargs):
+    '''
+    Write data to a dataset compressed with gzip, and optionally shuffle, by compressing its chunks in a pool of
+    threads and writing the compressed chunks directly, bypassing the HDF5 filter pipeline. The chunks are
+    compressed exactly as HDF5 would compress them, so the file is read with the standard filters.
+
+    A dataset can be written a block of rows at a time by giving the offset of each block. Since whole chunks are
+    written, each block must span whole chunks along the first axis, unless it ends at the end of the dataset.
+    '''
+    dataset, data, workers, offset = getargs('dataset', 'data', 'workers', 'offset', kwargs)
+    if workers < 1:
+        raise ValueError("'workers' must be at least 1")
+    chunks = dataset.chunks
+    if chunks is None or dataset.dtype.kind not in 'biuf':
+        return False
+    dcpl = dataset.id.get_create_plist()
+    pipeline = [dcpl.get_filter(i)[0:3:2] for i in range(dcpl.get_nfilters())]
+    shuffle = len(pipeline) > 0 and pipeline[0][0] == h5z.FILTER_SHUFFLE
+    if shuffle:
+        pipeline = pipeline[1:]
+    if len(pipeline) != 1 or pipeline[0][0] != h5z.FILTER_DEFLATE:
+        return False
+    level = pipeline[0][1][0] if pipeline[0][1] else 6
+    data = np.asarray(data, dtype=dataset.dtype)
+    if data.ndim != len(dataset.shape) or data.shape[1:] != dataset.shape[1:] or\
+            offset + len(data) > dataset.shape[0]:
+        raise ValueError("cannot write data with shape %s to dataset '%s' with shape %s at offset %d"
+                         % (data.shape, dataset.name, dataset.shape, offset))
+    end = offset + len(data)
+    if offset % chunks[0] != 0 or end % chunks[0] != 0 and end != dataset.shape[0]:
+        raise ValueError("cannot write rows %d to %d of dataset '%s' without splitting chunks of %d rows"
+                         % (offset, end, dataset.name, chunks[0]))
+    fillvalue = dataset.fillvalue
+
+    def _block(offsets):
+        block = data[tuple(slice(o, o + c) for o, c in zip(offsets, chunks))]
+        if block.shape != chunks:
+            # HDF5 stores whole chunks, with the part outside of the dataset set to the fill value
+            full = np.full(chunks, fillvalue, dtype=data.dtype)
+            full[tuple(slice(0, n) for n in block.shape)] = block
+            block = full
+        return _compress_chunk(block, shuffle, level)
+
+    offsets = list(product(*[range(0, n, c) for n, c in zip(data.shape, chunks)]))
+    pool = ThreadPool(workers)
+    try:
+        # compress a few chunks per thread at a time, so that only that many compressed chunks are held in memory
+        step = workers * 4
+        for i in range(0, len(offsets), step):
+            batch = offsets[i:i + step]
+            for chunk_offsets, compressed in zip(batch, pool.map(_block, batch)):
+                dataset.id.write_direct_chunk((chunk_offsets[0] + offset,) + chunk_offsets[1:], compressed)
+    finally:
+        pool.close()
+        pool.join()
+    return True
+
+
 class H5DataIO(DataIO):
     """
     Wrap data arrays for write via HDF5IO to customize I/O behavior, such as compression and chunking
@@ -240,15 +1002,23 @@ class H5DataIO(DataIO):
              'type': bool,
              'doc': 'If data is an h5py.Dataset should it be linked to or copied. NOTE: This parameter is only ' +
                     'allowed if data is an h5py.Dataset',
-             'default': False}
+             'default': False},
+            {'name': 'compression_workers',
+             'type': int,
+             'doc': 'Compress the chunks of gzip compressed array data in this many threads and write the ' +
+                    'compressed chunks directly. The chunks are compressed the same way HDF5 compresses them.',
+             'default': None}
             )
     def __init__(self, **kwargs):
         # Get the list of I/O options that user has passed in
-        ioarg_names = [name for name in kwargs.keys() if name not in['data', 'link_data']]
+        ioarg_names = [name for name in kwargs.keys() if name not in['data', 'link_data', 'compression_workers']]
         # Remove the ioargs from kwargs
         ioarg_values = [popargs(argname, kwargs) for argname in ioarg_names]
         # Consume link_data parameter
         self.__link_data = popargs('link_data', kwargs)
+        self.__compression_workers = popargs('compression_workers', kwargs)
+        if self.__compression_workers is not None and self.__compression_workers < 1:
+            raise ValueError("'compression_workers' must be at least 1")
         # Check for possible collision with other parameters
         if not isinstance(getargs('data', kwargs), Dataset) and self.__link_data:
             self.__link_data = False
@@ -289,6 +1059,10 @@ class H5DataIO(DataIO):
     def link_data(self):
         return self.__link_data
 
+    @property
+    def compression_workers(self):
+        return self.__compression_workers
+
     @property
     def io_settings(self):
         return self.__iosettings
@@ -1,26 +1,41 @@
 from collections import deque
+import hashlib
+import json
+import threading
+import time
 import numpy as np
 import os.path
+import posixpath
+import zlib
 from functools import partial
-from h5py import File, Group, Dataset, special_dtype, SoftLink, ExternalLink, Reference, RegionReference, check_dtype
+from h5py import File, Group, Dataset, Datatype, special_dtype, SoftLink, ExternalLink, Reference, RegionReference,\
+    check_dtype
+from h5py import h5a, h5d, h5f, h5g, h5l, h5o, h5p, h5r, h5s
 from six import raise_from, text_type, string_types, binary_type
+from six.moves.queue import Queue, Empty, Full
 import warnings
 from ...container import Container
 
 from ...utils import docval, getargs, popargs, call_docval_func
-from ...data_utils import AbstractDataChunkIterator, get_shape
+from ...data_utils import AbstractDataChunkIterator, DataIO, get_shape
 from ...build import Builder, GroupBuilder, DatasetBuilder, LinkBuilder, BuildManager,\
-                     RegionBuilder, ReferenceBuilder, TypeMap
+                     RegionBuilder, ReferenceBuilder, TypeMap, LazyGroupBuilder
 from ...spec import RefSpec, DtypeSpec, NamespaceCatalog, GroupSpec
 from ...spec import NamespaceBuilder
 
 from .h5_utils import H5ReferenceDataset, H5RegionDataset, H5TableDataset,\
-                      H5DataIO, H5SpecReader, H5SpecWriter
+                      H5DataIO, H5SpecReader, H5SpecWriter, H5ChunkCache, H5ReadAheadDataset,\
+                      H5ChunkLRUCache, H5Dataset, H5ChunkPlanner, H5RepackPolicy, write_direct_chunks
 
 from ..io import FORMIO
 
 ROOT_NAME = 'root'
 SPEC_LOC_ATTR = '.specloc'
+INDEX_LOC_ATTR = '.indexloc'
+INDEX_NAME = '.index'
+INDEX_VERSION = 1
+INDEX_TOKEN_ATTR = 'token'
+PRODUCER_JOIN_TIMEOUT = 1.0  # the seconds to wait for a DataChunk producer thread to stop once writing has ended
 H5_TEXT = special_dtype(vlen=text_type)
 H5_BINARY = special_dtype(vlen=binary_type)
 H5_REF = special_dtype(ref=Reference)
@@ -35,27 +50,95 @@ class HDF5IO(FORMIO):
              'doc': 'the mode to open the HDF5 file with, one of ("w", "r", "r+", "a", "w-")'},
             {'name': 'comm', 'type': 'Intracom',
              'doc': 'the MPI communicator to use for parallel I/O', 'default': None},
-            {'name': 'file', 'type': File, 'doc': 'a pre-existing h5py.File object', 'default': None})
+            {'name': 'file', 'type': File, 'doc': 'a pre-existing h5py.File object', 'default': None},
+            {'name': 'lazy', 'type': bool,
+             'doc': 'read the contents of each group only when it is first accessed', 'default': False},
+            {'name': 'memmap', 'type': bool,
+             'doc': 'read contiguous, uncompressed numeric datasets as read-only numpy.memmap arrays',
+             'default': False},
+            {'name': 'chunk_cache', 'type': H5ChunkCache,
+             'doc': 'the chunk cache settings to use for all chunked datasets that are read', 'default': None},
+            {'name': 'dataset_chunk_cache', 'type': dict,
+             'doc': 'the chunk cache settings to use for specific datasets, keyed by the path of the dataset',
+             'default': None},
+            {'name': 'chunk_lru_cache', 'type': H5ChunkLRUCache,
+             'doc': 'a cache of decompressed chunks to read all chunked datasets through', 'default': None},
+            {'name': 'chunk_planner', 'type': H5ChunkPlanner,
+             'doc': 'the planner to choose the shape of chunks with, when chunking is needed but no chunk shape '
+                    'is given. The default plans chunks of at most 1 MB for reading windows of rows',
+             'default': None})
     def __init__(self, **kwargs):
         '''Open an HDF5 file for IO
 
         For `mode`, see `h5py.File <http://docs.h5py.org/en/latest/high/file.html#opening-creating-files>_`.
+
+        If `lazy` is True, :py:meth:`read_builder` returns immediately and the subgroups, datasets, links,
+        and attributes of each group are read from the file the first time that group is accessed.
+
+        If `memmap` is True, numeric datasets that are stored contiguously, without chunking or filters,
+        are read as read-only :py:class:`numpy.memmap` arrays of the file instead of :py:class:`h5py.Dataset`
+        objects. Slicing these does not go through the HDF5 library, and the pages are shared by all processes
+        mapping the same file. Note that these datasets are copied rather than linked when written to another file.
+
+        `chunk_cache` and `dataset_chunk_cache` replace the default 1 MB chunk cache of chunked datasets with the given
+        :py:class:`~pynwb.form.backends.hdf5.h5_utils.H5ChunkCache` settings. HDF5 only applies these settings to
+        datasets that are not open yet, so `chunk_cache` cannot be used with `file`. If read-ahead is enabled
+        for a dataset, it is read as a :py:class:`~pynwb.form.backends.hdf5.h5_utils.H5ReadAheadDataset`, which
+        counts how many reads were served from memory. See :py:meth:`get_read_ahead_stats`.
+
+        If `chunk_lru_cache` is given, chunked datasets are read as
+        :py:class:`~pynwb.form.backends.hdf5.h5_utils.H5Dataset` objects that read whole chunks through that
+        :py:class:`~pynwb.form.backends.hdf5.h5_utils.H5ChunkLRUCache`, so that reading overlapping selections
+        decompresses each chunk only once. This takes the place of read-ahead.
+
+        When writing a dataset that is chunked, because it is compressed, resizable or written from a
+        DataChunkIterator, without setting `chunks`, `chunk_planner` chooses the chunk shape from the shape and dtype
+        of the dataset, and the access pattern set for the data type of the group that contains it. With
+        `chunks=True`, h5py chooses the chunk shape as before.
         '''
-        path, manager, mode, comm, file_obj = popargs('path', 'manager', 'mode', 'comm', 'file', kwargs)
+        path, manager, mode, comm, file_obj, lazy, memmap, chunk_cache, dataset_chunk_cache, chunk_lru_cache,\
+            chunk_planner = popargs('path', 'manager', 'mode', 'comm', 'file', 'lazy', 'memmap', 'chunk_cache',
+                                    'dataset_chunk_cache', 'chunk_lru_cache', 'chunk_planner', kwargs)
 
         if file_obj is not None and os.path.abspath(file_obj.filename) != os.path.abspath(path):
             raise ValueError('You argued {} as this object\'s path, but supplied a file with filename: {}'.format())
 
+        if file_obj is not None and chunk_cache is not None:
+            raise ValueError("cannot set the chunk cache of a file that is already open - 'file' and 'chunk_cache' "
+                             "cannot be specified together")
+
         if manager is None:
             manager = BuildManager(TypeMap(NamespaceCatalog()))
         self.__comm = comm
         self.__mode = mode
         self.__path = path
         self.__file = file_obj
+        self.__lazy = lazy
+        self.__memmap = memmap
+        self.__chunk_cache = chunk_cache
+        self.__chunk_lru_cache = chunk_lru_cache
+        self.__chunk_planner = chunk_planner if chunk_planner is not None else H5ChunkPlanner()
+        self.__dataset_chunk_cache = dict()
+        for dset_path, policy in (dataset_chunk_cache or dict()).items():
+            if not isinstance(policy, H5ChunkCache):
+                raise ValueError("dataset_chunk_cache values must be H5ChunkCache objects - got %s for '%s'"
+                                 % (type(policy), dset_path))
+            self.__dataset_chunk_cache['/' + dset_path.lstrip('/')] = policy
+        self.__read_ahead = list()  # the H5ReadAheadDataset objects that have been read
+        self.__cached_dsets = dict()  # datasets opened with their own chunk cache settings, keyed by path
         super(HDF5IO, self).__init__(manager, source=path)
         self.__built = dict()       # keep track of which files have been read
         self.__read = dict()        # keep track of each builder for each dataset/group/link
         self.__ref_queue = deque()  # a queue of the references that need to be added
+        self.__paths = dict()       # the builder and its path in the file, keyed by the id of the builder, during write
+        self.__h5objs = dict()      # the HDF5 objects that references have been made to, keyed by path, during write
+        self.__obj_refs = dict()    # the object reference to each HDF5 object, keyed by path, during write
+        self.__scanned = None       # the links, objects and attributes in the file, collected by __scan_file
+        self.__ref_targets = dict()  # the Container for each object address that references have pointed to
+        self.__write_queue_size = 0  # the number of DataChunks to produce ahead of writing them, during write
+        self.__resizable = False     # whether to write array datasets with an unlimited first axis, during write
+        self.__stream = False        # whether groups are built as they are written, during write
+        self.__index_stamp = None    # the modification time to give the file when it is closed after writing an index
 
     @property
     def comm(self):
@@ -65,6 +148,33 @@ class HDF5IO(FORMIO):
     def _file(self):
         return self.__file
 
+    @property
+    def lazy(self):
+        return self.__lazy
+
+    @property
+    def memmap(self):
+        return self.__memmap
+
+    @property
+    def chunk_lru_cache(self):
+        return self.__chunk_lru_cache
+
+    @property
+    def chunk_planner(self):
+        return self.__chunk_planner
+
+    @docval(returns='the number of hits and misses of each dataset that reads ahead, keyed by path', rtype=dict)
+    def get_read_ahead_stats(self):
+        '''
+        Get how many reads of each dataset read with read-ahead were served from memory (hits) and how many
+        had to read from the file (misses)
+        '''
+        ret = dict()
+        for dset in self.__read_ahead:
+            ret[dset.name] = {'hits': dset.hits, 'misses': dset.misses}
+        return ret
+
     @classmethod
     @docval({'name': 'namespace_catalog',
              'type': (NamespaceCatalog, TypeMap),
@@ -186,13 +296,221 @@ class HDF5IO(FORMIO):
         source_file.close()
         dest_file.close()
 
+    @classmethod
+    @docval({'name': 'source_filename', 'type': str, 'doc': 'the path to the HDF5 file to repack'},
+            {'name': 'dest_filename', 'type': str, 'doc': 'the name of the destination file'},
+            {'name': 'policy', 'type': H5RepackPolicy,
+             'doc': 'the storage options to rewrite datasets with. Datasets without options keep their layout',
+             'default': None},
+            {'name': 'manager', 'type': BuildManager,
+             'doc': 'the BuildManager to look up the data type of each group, and the types it extends, with. '
+                    'If not given, only the options set for the paths of datasets are used',
+             'default': None},
+            {'name': 'workers', 'type': int,
+             'doc': 'the number of threads to compress the chunks of gzip compressed datasets with', 'default': 1},
+            {'name': 'buffer_size', 'type': int, 'doc': 'the number of bytes of a dataset to copy at a time',
+             'default': 64 * 1024**2})
+    def repack_file(cls, **kwargs):
+        """
+        Copy an HDF5 file, rewriting each dataset with the chunk shape, compression, shuffle and dtype that
+        `policy` gives it, e.g. to rechunk a file written during acquisition for analysis.
+
+        Each dataset is copied a block of rows at a time, so no dataset is read into memory as a whole. When
+        `workers` is greater than 1, the chunks of gzip compressed datasets are compressed in that many threads,
+        since HDF5 itself reads and writes one dataset at a time. Soft links, external links and hard links are
+        kept, and references are rewritten to point to the same objects in the new file. The index written with
+        `cache_index` is not copied, since it describes the storage of the datasets in the source file.
+        """
+        source_filename, dest_filename, policy, manager, workers, buffer_size = getargs(
+            'source_filename', 'dest_filename', 'policy', 'manager', 'workers', 'buffer_size', kwargs)
+        if workers < 1:
+            raise ValueError("'workers' must be at least 1")
+        if buffer_size < 1:
+            raise ValueError("'buffer_size' must be positive")
+        if policy is None:
+            policy = H5RepackPolicy()
+        source_file = File(source_filename, 'r')
+        dest_file = File(dest_filename, 'w')
+        try:
+            # references can only be rewritten once the objects they point to have been copied
+            ref_queue = list()
+            copied = dict()
+            index_loc = source_file.attrs.get(INDEX_LOC_ATTR)
+            if index_loc is not None:
+                copied[h5o.get_info(source_file[index_loc].id).addr] = None
+            cls.__repack_attrs(source_file, dest_file, ref_queue, skip=(INDEX_LOC_ATTR,))
+            cls.__repack_group(source_file, dest_file, policy, manager, workers, buffer_size, copied, ref_queue)
+            for call in ref_queue:
+                call()
+        finally:
+            source_file.close()
+            dest_file.close()
+
+    @classmethod
+    def __repack_group(cls, src_group, dest_group, policy, manager, workers, buffer_size, copied, ref_queue):
+        data_types = cls.__get_repack_types(src_group, manager)
+        for name in src_group:
+            link = src_group.get(name, getlink=True)
+            if isinstance(link, SoftLink):
+                dest_group[name] = SoftLink(link.path)
+                continue
+            elif isinstance(link, ExternalLink):
+                dest_group[name] = ExternalLink(link.filename, link.path)
+                continue
+            src = src_group[name]
+            addr = h5o.get_info(src.id).addr
+            if addr in copied:
+                # a hard link to an object that has been copied already, or to the index, which is not copied
+                if copied[addr] is not None:
+                    dest_group[name] = dest_group.file[copied[addr]]
+                continue
+            copied[addr] = posixpath.join(dest_group.name, name)
+            if isinstance(src, Group):
+                dest = dest_group.create_group(name)
+                cls.__repack_group(src, dest, policy, manager, workers, buffer_size, copied, ref_queue)
+            else:
+                dest = cls.__repack_dataset(src, dest_group, name, policy.get_create_options(src, data_types),
+                                            workers, buffer_size, ref_queue)
+            cls.__repack_attrs(src, dest, ref_queue)
+
+    @classmethod
+    def __get_repack_types(cls, group, manager):
+        if manager is None:
+            return tuple()
+        data_type = group.attrs.get(manager.namespace_catalog.group_spec_cls.type_key())
+        namespace = group.attrs.get('namespace')
+        if data_type is None or namespace is None:
+            return tuple()
+        data_type = cls.__decode(data_type)
+        try:
+            return manager.namespace_catalog.get_hierarchy(cls.__decode(namespace), data_type)
+        except (KeyError, ValueError):
+            return (data_type,)
+
+    @classmethod
+    def __decode(cls, value):
+        return value.decode('UTF-8') if isinstance(value, bytes) else value
+
+    @classmethod
+    def __repack_dataset(cls, src, dest_group, name, options, workers, buffer_size, ref_queue):
+        dest = dest_group.create_dataset(name, shape=src.shape, **options)
+        if cls.__has_refs(src.dtype):
+            ref_queue.append(partial(cls.__repack_refs, src, dest))
+            return dest
+        if len(src.shape) == 0:
+            dest[()] = src[()]
+            return dest
+        row_nbytes = max(int(np.prod(src.shape[1:])) * max(src.dtype.itemsize, dest.dtype.itemsize), 1)
+        nrows = max(buffer_size // row_nbytes, 1)
+        if dest.chunks is not None:
+            # copy whole chunks of the new dataset at a time, so that each chunk is compressed and written once
+            nrows = max(nrows // dest.chunks[0], 1) * dest.chunks[0]
+        for start in range(0, src.shape[0], nrows):
+            block = src[start:start + nrows]
+            if workers == 1 or not write_direct_chunks(dest, block, workers, offset=start):
+                dest[start:start + len(block)] = block
+        return dest
+
+    @classmethod
+    def __has_refs(cls, dtype):
+        if dtype.names is not None:
+            return any(cls.__has_refs(dtype.fields[n][0]) for n in dtype.names)
+        return check_dtype(ref=dtype) is not None
+
+    @classmethod
+    def __repack_refs(cls, src, dest):
+        data = src[()]
+        if src.dtype.names is None:
+            data = np.asarray(data, dtype=object)
+            data.flat[:] = [cls.__repack_ref(ref, src.file, dest.file) for ref in data.flat]
+        else:
+            for field in src.dtype.names:
+                if check_dtype(ref=src.dtype.fields[field][0]) is not None:
+                    data[field] = [cls.__repack_ref(ref, src.file, dest.file) for ref in data[field]]
+        dest[()] = data
+
+    @classmethod
+    def __repack_attrs(cls, src, dest, ref_queue, skip=tuple()):
+        for name in src.attrs:
+            if name in skip:
+                continue
+            value = src.attrs[name]
+            dtype = h5a.open(src.id, name.encode('UTF-8')).dtype
+            if check_dtype(ref=dtype) is not None:
+                ref_queue.append(partial(cls.__repack_ref_attr, src, dest, name, dtype))
+            else:
+                dest.attrs.create(name, value, dtype=dtype)
+
+    @classmethod
+    def __repack_ref_attr(cls, src, dest, name, dtype):
+        value = src.attrs[name]
+        if isinstance(value, np.ndarray):
+            value = np.array([cls.__repack_ref(ref, src.file, dest.file) for ref in value.flat],
+                             dtype=dtype).reshape(value.shape)
+        else:
+            value = cls.__repack_ref(value, src.file, dest.file)
+        dest.attrs.create(name, value, dtype=dtype)
+
+    @classmethod
+    def __repack_ref(cls, ref, src_file, dest_file):
+        if not ref:
+            return ref
+        path = src_file[ref].name
+        if isinstance(ref, RegionReference):
+            space = h5r.get_region(ref, src_file.id)
+            return h5r.create(dest_file.id, path.encode('UTF-8'), h5r.DATASET_REGION, space)
+        return dest_file[path].ref
+
     @docval({'name': 'container', 'type': Container, 'doc': 'the Container object to write'},
             {'name': 'cache_spec', 'type': bool, 'doc': 'cache specification to file', 'default': False},
             {'name': 'link_data', 'type': bool,
-             'doc': 'If not specified otherwise link (True) or copy (False) HDF5 Datasets', 'default': True})
+             'doc': 'If not specified otherwise link (True) or copy (False) HDF5 Datasets', 'default': True},
+            {'name': 'cache_index', 'type': bool,
+             'doc': 'store an index of all objects in the file, so it can be read without walking the file. '
+                    'The index is only used if the file was last written by this HDF5IO, i.e. if it still has the '
+                    'modification time it was given when it was closed',
+             'default': False},
+            {'name': 'write_queue_size', 'type': int,
+             'doc': 'the number of DataChunks to let a background thread produce ahead of writing them. '
+                    'If 0, DataChunkIterators are iterated over and written in turn', 'default': 0},
+            {'name': 'resizable', 'type': bool,
+             'doc': 'write array datasets without a maxshape with an unlimited first axis, so that they can be '
+                    'appended to', 'default': False},
+            {'name': 'stream', 'type': bool,
+             'doc': 'build the group of each Container only when it is written, and let go of the data of each '
+                    'dataset once it is written', 'default': False})
     def write(self, **kwargs):
-        cache_spec = popargs('cache_spec', kwargs)
-        call_docval_func(super(HDF5IO, self).write, kwargs)
+        """Write a Container to the file
+
+        If `write_queue_size` is greater than 0, each DataChunkIterator is iterated over in a background thread
+        while the chunks it has already produced are written, so that producing the data overlaps with compressing
+        and writing it. The background thread waits once `write_queue_size` chunks are waiting to be written.
+
+        Only the objects that have not been written yet are written, so a file opened in 'a' or 'r+' mode can be
+        added to by reading it, adding Containers, and writing it again. Datasets written with `resizable` can also
+        be appended to after reading them, e.g. with :py:meth:`~pynwb.base.TimeSeries.append_data` or by adding
+        rows to a DynamicTable, which resizes them in the file. Builders that were read or written are marked as
+        modified when something is added to them or one of their attributes changes, so writing again only visits
+        the groups on the way to a change and only sets the attributes that changed.
+
+        If `stream` is True, the group of each Container is built when it is written, rather than building the
+        whole file before writing any of it. Once a dataset is written, its builder holds the HDF5 dataset in place
+        of the data, so that data converted while building, e.g. tables of references, can be freed. Memory use
+        is then bounded by the datasets of one group at a time, rather than by all of them.
+        """
+        cache_spec, cache_index, write_queue_size, resizable = popargs('cache_spec', 'cache_index',
+                                                                       'write_queue_size', 'resizable', kwargs)
+        if write_queue_size < 0:
+            raise ValueError("'write_queue_size' must not be negative")
+        self.__write_queue_size = write_queue_size
+        self.__resizable = resizable
+        self.__stream = getargs('stream', kwargs)
+        try:
+            call_docval_func(super(HDF5IO, self).write, kwargs)
+        finally:
+            self.__write_queue_size = 0
+            self.__resizable = False
+            self.__stream = False
         if cache_spec:
             ref = self.__file.attrs.get(SPEC_LOC_ATTR)
             spec_group = None
@@ -213,20 +531,354 @@ class HDF5IO(FORMIO):
                 ns_group = spec_group.require_group(group_name)
                 writer = H5SpecWriter(ns_group)
                 ns_builder.export('namespace', writer=writer)
+        if cache_index:
+            self.__write_index()
+
+    def __get_ignored(self):
+        '''Get the paths of the cached specs and the index, which are not part of the data'''
+        ignore = set()
+        for attr in (SPEC_LOC_ATTR, INDEX_LOC_ATTR):
+            loc = self.__file.attrs.get(attr)
+            if loc is not None:
+                ignore.add(self.__file[loc].name)
+        return ignore
 
     @docval(returns='a GroupBuilder representing the NWB Dataset', rtype='GroupBuilder')
     def read_builder(self):
         f_builder = self.__read.get(self.__file)
         # ignore cached specs when reading builder
-        ignore = set()
-        specloc = self.__file.attrs.get(SPEC_LOC_ATTR)
-        if specloc is not None:
-            ignore.add(self.__file[specloc].name)
+        ignore = self.__get_ignored()
+        if f_builder is None and not self.__lazy:
+            f_builder = self.__read_index()
+            if f_builder is not None:
+                self.__read[self.__file] = f_builder
         if f_builder is None:
-            f_builder = self.__read_group(self.__file, ROOT_NAME, ignore=ignore)
+            if not self.__lazy:
+                # everything is going to be read, so get the layout and attributes of the file in one pass
+                self.__scanned = self.__scan_file(self.__file)
+            try:
+                f_builder = self.__read_group(self.__file, ROOT_NAME, ignore=ignore)
+            finally:
+                self.__scanned = None
             self.__read[self.__file] = f_builder
         return f_builder
 
+    def __remove_index(self):
+        loc = self.__file.attrs.get(INDEX_LOC_ATTR)
+        if loc is not None:
+            del self.__file[self.__file[loc].name]
+            del self.__file.attrs[INDEX_LOC_ATTR]
+        self.__index_stamp = None
+
+    def __write_index(self):
+        '''
+        Write a compressed JSON index of every group, dataset and link in the file, along with their
+        attributes, shapes and dtypes, so that read_builder can rebuild the builder tree from a single read
+        '''
+        self.__remove_index()
+        children, scanned = self.__scan_file(self.__file)
+        ignore = self.__get_ignored()
+        objects = list()
+        stack = ['/']
+        while len(stack) > 0:
+            path = stack.pop()
+            h5obj, attrs = scanned[path]
+            entry = {'attrs': self.__index_attrs(attrs)}
+            if isinstance(h5obj, Dataset):
+                entry.update(self.__index_dataset(h5obj))
+            else:
+                entry['type'] = 'group'
+            objects.append((path, entry))
+            sub_paths = list()
+            for name, link in children.get(path, list()) if isinstance(h5obj, Group) else list():
+                sub_path = posixpath.join(path, name)
+                if isinstance(link, SoftLink):
+                    if link.path not in ignore:
+                        objects.append((sub_path, {'type': 'soft', 'target': link.path}))
+                elif isinstance(link, ExternalLink):
+                    objects.append((sub_path, {'type': 'external', 'file': link.filename, 'target': link.path}))
+                elif sub_path not in ignore:
+                    sub_paths.append(sub_path)
+            stack.extend(reversed(sub_paths))
+        index = json.dumps({'version': INDEX_VERSION, 'objects': objects}, separators=(',', ':'))
+        data = np.frombuffer(zlib.compress(index.encode('UTF-8')), dtype=np.uint8)
+        dset = self.__file.create_dataset(INDEX_NAME, data=data)
+        self.__file.attrs[INDEX_LOC_ATTR] = dset.ref
+        # the token describes the file with the index in it, so it is written in place of a placeholder of the
+        # same size, which does not change the file
+        # the size of the file is only settled once everything written so far has been flushed
+        dset.attrs.create(INDEX_TOKEN_ATTR, np.string_('0' * 2 * hashlib.sha1().digest_size))
+        self.__file.flush()
+        # a whole, even number of seconds in the past, which file systems with coarse timestamps can store
+        self.__index_stamp = (int(time.time()) // 2 - 1) * 2
+        dset.attrs.modify(INDEX_TOKEN_ATTR, np.string_(self.__get_index_token(self.__index_stamp)))
+
+    def __get_index_token(self, mtime):
+        '''
+        Get a token that changes when the file is changed after its index was written. The file is given the
+        modification time mtime, which is in the past, when it is closed after writing the index, so any later
+        change to the file, however small, gives it a different modification time. The token also covers the
+        size of the file, and the location and object header of the root group and every object in it.
+        '''
+        fid = self.__file.id
+        state = [fid.get_filesize(), float(mtime)]
+        for name in [b'.'] + sorted(n.encode('UTF-8') for n in self.__file):
+            if name != b'.' and fid.links.get_info(name).type != h5l.TYPE_HARD:
+                state.append((name, None))
+                continue
+            info = h5o.get_info(fid, name)
+            state.append((name, info.addr, info.hdr.nmesgs, info.hdr.space.total))
+        return hashlib.sha1(repr(state).encode('UTF-8')).hexdigest()
+
+    @classmethod
+    def __index_attrs(cls, attrs):
+        '''Get the attributes in attrs in a form that can be stored as JSON, or None if that is not possible'''
+        ret = dict()
+        for k, v in attrs.items():
+            if k in (SPEC_LOC_ATTR, INDEX_LOC_ATTR):
+                continue
+            if isinstance(v, binary_type):
+                try:
+                    v = v.decode('UTF-8')
+                except UnicodeDecodeError:
+                    return None
+            if isinstance(v, string_types):
+                ret[k] = ['str', None, v]
+            elif isinstance(v, np.generic) and v.dtype.kind in 'biuf':
+                ret[k] = ['scalar', v.dtype.str, v.item()]
+            elif isinstance(v, np.ndarray) and v.dtype.kind in 'biuf':
+                ret[k] = ['array', v.dtype.str, v.tolist(), v.shape]
+            elif isinstance(v, np.ndarray) and v.dtype.kind == 'O' and all(isinstance(x, text_type) for x in v.flat):
+                ret[k] = ['array', 'O', v.tolist(), v.shape]
+            else:
+                # e.g. references, which are resolved when reading
+                return None
+        return ret
+
+    @classmethod
+    def __index_dataset(cls, h5obj):
+        vlen = check_dtype(vlen=h5obj.dtype)
+        if vlen is text_type:
+            dtype = 'text'
+        elif vlen is binary_type:
+            dtype = 'binary'
+        elif h5obj.dtype.fields is None and h5obj.dtype.kind in 'biufS':
+            dtype = h5obj.dtype.str
+        else:
+            dtype = None
+        ret = {'type': 'dataset', 'dtype': dtype, 'shape': h5obj.shape, 'maxshape': h5obj.maxshape}
+        if len(h5obj.shape) == 0 and dtype is not None:
+            value = h5obj[()]
+            if isinstance(value, binary_type):
+                try:
+                    value = value.decode('UTF-8')
+                except UnicodeDecodeError:
+                    return ret
+            ret['value'] = value if isinstance(value, string_types) else value.item()
+        return ret
+
+    def __read_index(self):
+        '''Rebuild the builder tree from the index written with cache_index=True, or return None if there is
+        no usable index in the file'''
+        loc = self.__file.attrs.get(INDEX_LOC_ATTR)
+        if loc is None:
+            return None
+        try:
+            index = json.loads(zlib.decompress(self.__file[loc][()].tobytes()).decode('UTF-8'))
+            if index.get('version') != INDEX_VERSION:
+                warnings.warn('unknown index version %s in %s - ignoring index' % (index.get('version'), self.__path))
+                return None
+            token = self.__file[loc].attrs.get(INDEX_TOKEN_ATTR)
+            mtime = os.stat(self.__path).st_mtime
+            if token is None or token.decode('UTF-8') != self.__get_index_token(mtime):
+                warnings.warn('the file %s was changed after its index was written - ignoring index' % self.__path)
+                return None
+            return self.__read_indexed_objects(index['objects'])
+        except (KeyError, ValueError, TypeError, OSError, zlib.error) as e:
+            warnings.warn('could not read index in %s - ignoring index: %s' % (self.__path, str(e)))
+            self.__built.pop(self.__file.filename, None)
+            return None
+
+    def __read_indexed_objects(self, objects):
+        fpath = self.__file.filename
+        builders = dict()
+        links = list()
+        done = set()    # objects that were read in full while resolving references
+        for path, entry in objects:
+            parent_path, name = posixpath.split(path)
+            if parent_path in done:
+                done.add(path)
+                continue
+            if entry['type'] in ('soft', 'external'):
+                # read links after all other objects, so their targets have been read
+                links.append((path, entry))
+                continue
+            builder = self.__get_built(fpath, path)
+            if builder is None:
+                builder = self.__read_indexed_object(path, name, entry)
+            else:
+                done.add(path)
+            builders[path] = builder
+            if path != '/':
+                self.__set_built(fpath, path, builder)
+                if isinstance(builder, DatasetBuilder):
+                    builders[parent_path].set_dataset(builder)
+                else:
+                    builders[parent_path].set_group(builder)
+        for path, entry in links:
+            parent_path, name = posixpath.split(path)
+            target_builder = builders.get(entry['target']) if entry['type'] == 'soft' else None
+            if target_builder is None:
+                target = self.__file.get(path)
+                if target is None:
+                    warnings.warn('Broken Link: %s' % path)
+                    continue
+                target_builder = self.__read_ref(target, path=entry['target'])
+            link_builder = LinkBuilder(target_builder, name, source=self.__path)
+            link_builder.written = True
+            builders[parent_path].set_link(link_builder)
+        return builders['/']
+
+    def __read_indexed_object(self, path, name, entry):
+        attributes = entry['attrs']
+        if attributes is None:
+            attributes = self.__read_attrs(self.__file[path])
+        else:
+            attributes = self.__decode_index_attrs(attributes)
+        if entry['type'] == 'group':
+            ret = GroupBuilder(ROOT_NAME if path == '/' else name, source=self.__path)
+            for key, val in attributes.items():
+                if isinstance(val, bytes):
+                    val = val.decode('UTF-8')
+                ret.set_attribute(key, val)
+            ret.written = True
+        elif 'value' in entry:
+            ret = DatasetBuilder(name, self.__decode_index_value(entry['value'], entry['dtype']),
+                                 dtype=self.__decode_index_dtype(entry['dtype']),
+                                 maxshape=tuple(entry['maxshape']),
+                                 attributes=attributes, source=self.__path)
+            ret.written = True
+        else:
+            ret = self.__read_dataset(self.__file[path], name, attributes=attributes)
+        return ret
+
+    @classmethod
+    def __decode_index_attrs(cls, attributes):
+        ret = dict()
+        for key, val in attributes.items():
+            kind, dtype, value = val[:3]
+            if kind == 'str':
+                ret[key] = value
+            elif kind == 'scalar':
+                ret[key] = np.dtype(dtype).type(value)
+            else:
+                ret[key] = np.array(value, dtype=dtype).reshape(val[3])
+        return ret
+
+    @classmethod
+    def __decode_index_dtype(cls, dtype):
+        if dtype == 'text':
+            return H5_TEXT
+        elif dtype == 'binary':
+            return H5_BINARY
+        return np.dtype(dtype)
+
+    @classmethod
+    def __decode_index_value(cls, value, dtype):
+        if dtype in ('text', 'binary') or np.dtype(dtype).kind == 'S':
+            return value
+        return np.dtype(dtype).type(value)
+
+    @classmethod
+    def __scan_file(cls, h5obj):
+        '''
+        Visit every link below h5obj in a single pass, opening the object behind each hard link and reading its
+        attributes as it is visited. Return a tuple of a dict mapping the path of each group to a list of
+        (name, link) pairs for its children, where link is None for hard links and a SoftLink or ExternalLink
+        otherwise, and a dict mapping the path of h5obj and of each hard link to a tuple of the HDF5 object
+        and a dict of its attributes.
+        '''
+        children = {h5obj.name: list()}
+        objects = {h5obj.name: (h5obj, cls.__get_attrs(h5obj))}
+        prefix = h5obj.name.rstrip('/')
+
+        def _visit(name, info):
+            if not isinstance(name, binary_type):
+                name = name.encode('UTF-8')
+            link = None
+            if info.type == h5l.TYPE_SOFT:
+                link = SoftLink(h5obj.id.links.get_val(name).decode('UTF-8'))
+            elif info.type == h5l.TYPE_EXTERNAL:
+                filename, path = h5obj.id.links.get_val(name)
+                link = ExternalLink(filename.decode('UTF-8'), path.decode('UTF-8'))
+            path = '%s/%s' % (prefix, name.decode('UTF-8'))
+            if link is None:
+                oid = h5o.open(h5obj.id, name)
+                if isinstance(oid, h5d.DatasetID):
+                    sub_h5obj = Dataset(oid)
+                elif isinstance(oid, h5g.GroupID):
+                    sub_h5obj = Group(oid)
+                else:
+                    sub_h5obj = Datatype(oid)
+                objects[path] = (sub_h5obj, cls.__get_attrs(sub_h5obj))
+            parent, name = posixpath.split(path)
+            children.setdefault(parent, list()).append((name, link))
+
+        h5obj.id.links.visit(_visit, info=True)
+        return children, objects
+
+    @classmethod
+    def __get_attrs(cls, h5obj):
+        '''
+        Get the attributes of h5obj as a dict, without resolving references. The attributes are opened by
+        their index rather than looked up by name.
+        '''
+        ret = dict()
+        oid = h5obj['/'].id if isinstance(h5obj, File) else h5obj.id
+        for i in range(h5a.get_num_attrs(oid)):
+            attr = h5a.open(oid, index=i)
+            name = attr.name.decode('UTF-8') if isinstance(attr.name, binary_type) else attr.name
+            dtype = attr.dtype
+            if attr.get_space().get_simple_extent_type() == h5s.NULL or dtype.subdtype is not None:
+                # empty and array typed attributes, which h5py has its own conversions for
+                ret[name] = h5obj.attrs[name]
+                continue
+            value = np.ndarray(attr.shape, dtype=dtype)
+            attr.read(value)
+            ret[name] = value[()] if value.ndim == 0 else value
+        return ret
+
+    def __iter_children(self, h5obj, path=None):
+        '''
+        Iterate over the children of h5obj as (name, HDF5 object, link, path, attributes) tuples, where link is
+        None for hard links. The HDF5 object is None for broken links. If h5obj was scanned, path is the path of
+        h5obj in this file, and the path and attributes of each child come from the scan, and are None otherwise.
+        '''
+        children = None
+        if self.__scanned is not None and path is not None:
+            children, objects = self.__scanned
+            children = children.get(path)
+        if children is None:
+            # not scanned, so look up the type of each link
+            for k in h5obj:
+                sub_h5obj = h5obj.get(k)
+                link = None
+                if sub_h5obj is not None:
+                    link = h5obj.get(k, getlink=True)
+                    if not isinstance(link, (SoftLink, ExternalLink)):
+                        link = None
+                yield k, sub_h5obj, link, None, None
+        else:
+            prefix = path.rstrip('/')
+            for k, link in children:
+                sub_path = link.path if isinstance(link, SoftLink) else '%s/%s' % (prefix, k)
+                if sub_path in objects and not isinstance(link, ExternalLink):
+                    sub_h5obj, attrs = objects[sub_path]
+                    yield k, sub_h5obj, link, sub_path, attrs
+                else:
+                    # external links, and soft links to other links or to nothing
+                    yield k, h5obj.get(k), link, None, None
+
     def __set_built(self, fpath, path, builder):
         self.__built.setdefault(fpath, dict()).setdefault(path, builder)
 
@@ -250,69 +902,91 @@ class HDF5IO(FORMIO):
         container = self.manager.construct(builder)
         return container
 
-    def __read_group(self, h5obj, name=None, ignore=set()):
-        kwargs = {
-            "attributes": self.__read_attrs(h5obj),
-            "groups": dict(),
-            "datasets": dict(),
-            "links": dict()
-        }
-
-        for key, val in kwargs['attributes'].items():
-            if isinstance(val, bytes):
-                kwargs['attributes'][key] = val.decode('UTF-8')
-
+    def _get_ref_containers(self, h5file, refs, addresses):
+        '''
+        Get the Containers for an array of object references, given the addresses of the objects they
+        point to. Each object is dereferenced only once, no matter how many references point to it.
+        '''
+        targets, first, inverse = np.unique(addresses, return_index=True, return_inverse=True)
+        containers = np.empty(len(targets), dtype=object)
+        memo = self.__ref_targets.setdefault(h5file.filename, dict())
+        for i in range(len(targets)):
+            container = memo.get(targets[i])
+            if container is None:
+                container = self.get_container(h5file[refs[first[i]]])
+                memo[targets[i]] = container
+            containers[i] = container
+        return containers[inverse].reshape(np.shape(addresses))
+
+    def __read_group(self, h5obj, name=None, ignore=set(), attributes=None, path=None):
         if name is None:
             name = str(os.path.basename(h5obj.name))
-        for k in h5obj:
-            sub_h5obj = h5obj.get(k)
-            if sub_h5obj.name in ignore:
-                continue
+        if self.__scanned is not None and h5obj is self.__file:
+            path = h5obj.name
+            attributes = self.__scanned[1][path][1]
+        loader = partial(self.__populate_group, h5obj, ignore=ignore, attributes=attributes, path=path)
+        if self.__lazy:
+            ret = LazyGroupBuilder(name, loader, source=self.__path, attributes=self.__read_type_attrs(h5obj))
+        else:
+            ret = GroupBuilder(name, source=self.__path)
+            loader(ret)
+        ret.written = True
+        return ret
+
+    def __read_type_attrs(self, h5obj):
+        '''Read the data type and namespace of h5obj, so that it can be told apart without reading all of it'''
+        ret = dict()
+        for k in (self.manager.namespace_catalog.group_spec_cls.type_key(), 'namespace'):
+            v = h5obj.attrs.get(k)
+            if v is not None:
+                ret[k] = v.decode('UTF-8') if isinstance(v, bytes) else v
+        return ret
+
+    def __populate_group(self, h5obj, builder, ignore=set(), attributes=None, path=None):
+        '''Read the attributes and children of h5obj into builder. path is the path of h5obj if it was scanned'''
+        for key, val in self.__read_attrs(h5obj, attributes).items():
+            if isinstance(val, bytes):
+                val = val.decode('UTF-8')
+            builder.set_attribute(key, val)
+        links = list()
+        for k, sub_h5obj, link_type, sub_path, attrs in self.__iter_children(h5obj, path):
             if not (sub_h5obj is None):
-                link_type = h5obj.get(k, getlink=True)
-                if isinstance(link_type, SoftLink) or isinstance(link_type, ExternalLink):
-                    # Reading links might be better suited in its own function
-                    # get path of link (the key used for tracking what's been built)
-                    target_path = link_type.path
-                    builder_name = os.path.basename(target_path)
-                    # get builder if already read, else build it
-                    builder = self.__get_built(sub_h5obj.file.filename, target_path)
-                    if builder is None:
-                        # NOTE: all links must have absolute paths
+                if sub_path is None:
+                    fpath, sub_path = sub_h5obj.file.filename, sub_h5obj.name
+                else:
+                    fpath = self.__file.filename
+                if sub_path in ignore:
+                    continue
+                if link_type is not None:
+                    # read links after all other objects in this group, so links to
+                    # objects in this group can be resolved when reading lazily
+                    links.append((k, sub_h5obj, link_type))
+                else:
+                    sub_builder = self.__get_built(fpath, sub_path)
+                    if sub_builder is None:
                         if isinstance(sub_h5obj, Dataset):
-                            builder = self.__read_dataset(sub_h5obj, builder_name)
+                            sub_builder = self.__read_dataset(sub_h5obj, k, self.__read_attrs(sub_h5obj, attrs))
                         else:
-                            builder = self.__read_group(sub_h5obj, builder_name, ignore=ignore)
-                        self.__set_built(sub_h5obj.file.filename, target_path, builder)
-                    link_builder = LinkBuilder(builder, k, source=self.__path)
-                    link_builder.written = True
-                    kwargs['links'][builder_name] = link_builder
-                else:
-                    builder = self.__get_built(sub_h5obj.file.filename, sub_h5obj.name)
-                    obj_type = None
-                    read_method = None
-                    if isinstance(sub_h5obj, Dataset):
-                        read_method = self.__read_dataset
-                        obj_type = kwargs['datasets']
+                            sub_builder = self.__read_group(sub_h5obj, k, ignore=ignore, attributes=attrs,
+                                                            path=None if attrs is None else sub_path)
+                        self.__set_built(fpath, sub_path, sub_builder)
+                    if isinstance(sub_builder, DatasetBuilder):
+                        builder.set_dataset(sub_builder)
                     else:
-                        read_method = partial(self.__read_group, ignore=ignore)
-                        obj_type = kwargs['groups']
-                    if builder is None:
-                        builder = read_method(sub_h5obj)
-                        self.__set_built(sub_h5obj.file.filename, sub_h5obj.name, builder)
-                    obj_type[builder.name] = builder
+                        builder.set_group(sub_builder)
             else:
                 warnings.warn('Broken Link: %s' % os.path.join(h5obj.name, k))
-                kwargs['datasets'][k] = None
-                continue
-        kwargs['source'] = self.__path
-        ret = GroupBuilder(name, **kwargs)
-        ret.written = True
-        return ret
-
-    def __read_dataset(self, h5obj, name=None):
+        for k, sub_h5obj, link_type in links:
+            # get path of link (the key used for tracking what's been built)
+            # NOTE: all links must have absolute paths
+            target_builder = self.__read_ref(sub_h5obj, path=link_type.path, ignore=ignore)
+            link_builder = LinkBuilder(target_builder, k, source=self.__path)
+            link_builder.written = True
+            builder.set_link(link_builder)
+
+    def __read_dataset(self, h5obj, name=None, attributes=None):
         kwargs = {
-            "attributes": self.__read_attrs(h5obj),
+            "attributes": self.__read_attrs(h5obj) if attributes is None else attributes,
             "dtype": h5obj.dtype,
             "maxshape": h5obj.maxshape
         }
@@ -355,18 +1029,61 @@ class HDF5IO(FORMIO):
                 ref_cols = [check_dtype(ref=cpd_dt[i]) for i in range(len(cpd_dt))]
                 d = H5TableDataset(h5obj, self, ref_cols)
             else:
-                d = h5obj
+                d = self.__get_data(h5obj)
             kwargs["data"] = d
         else:
-            kwargs["data"] = h5obj
+            kwargs["data"] = self.__get_data(h5obj)
         ret = DatasetBuilder(name, **kwargs)
         ret.written = True
         return ret
 
-    def __read_attrs(self, h5obj):
+    def __get_data(self, h5obj):
+        '''Get the object to read the data of h5obj through'''
+        ret = self.__get_memmap(h5obj)
+        if ret is h5obj:
+            ret = self.__get_chunk_cached(h5obj)
+        return ret
+
+    def __open_chunk_cached(self):
+        '''
+        Open the datasets that have their own chunk cache settings. Other handles to the same dataset share
+        the chunk cache of the first one, so this needs to happen before anything else opens them.
+        '''
+        for path, policy in self.__dataset_chunk_cache.items():
+            if path in self.__cached_dsets or path not in self.__file:
+                continue
+            dapl = h5p.create(h5p.DATASET_ACCESS)
+            dapl.set_chunk_cache(policy.nslots, policy.nbytes, policy.w0)
+            self.__cached_dsets[path] = Dataset(h5d.open(self.__file.id, path.encode('UTF-8'), dapl))
+
+    def __get_chunk_cached(self, h5obj):
+        '''Get h5obj to read through the chunk LRU cache or with read-ahead, if either applies to it'''
+        if self.__chunk_lru_cache is not None and h5obj.chunks is not None:
+            return H5Dataset(self.__cached_dsets.get(h5obj.name, h5obj), self)
+        policy = self.__dataset_chunk_cache.get(h5obj.name, self.__chunk_cache)
+        if policy is None or policy.read_ahead == 0 or h5obj.chunks is None:
+            return h5obj
+        ret = H5ReadAheadDataset(self.__cached_dsets.get(h5obj.name, h5obj), self, policy.read_ahead)
+        self.__read_ahead.append(ret)
+        return ret
+
+    def __get_memmap(self, h5obj):
+        '''Get a read-only memmap of h5obj if memmap is enabled and h5obj is stored as one contiguous block of the
+        file that numpy can read, else return h5obj'''
+        if not self.__memmap or h5obj.size == 0 or h5obj.chunks is not None or h5obj.dtype.kind not in 'biuf':
+            return h5obj
+        if h5obj.file.driver != 'sec2' or h5obj.id.get_create_plist().get_nfilters() > 0:
+            return h5obj
+        offset = h5obj.id.get_offset()
+        if offset is None:      # storage has not been allocated, or is external
+            return h5obj
+        return np.memmap(h5obj.file.filename, dtype=h5obj.dtype, mode='r', offset=offset, shape=h5obj.shape)
+
+    def __read_attrs(self, h5obj, attrs=None):
+        '''Read the attributes of h5obj, or resolve the references in attrs if they have been read already'''
         ret = dict()
-        for k, v in h5obj.attrs.items():
-            if k == SPEC_LOC_ATTR:     # ignore cached spec
+        for k, v in (h5obj.attrs if attrs is None else attrs).items():
+            if k in (SPEC_LOC_ATTR, INDEX_LOC_ATTR):     # ignore cached spec and index
                 continue
             if isinstance(v, RegionReference):
                 raise ValueError("cannot read region reference attributes yet")
@@ -376,40 +1093,109 @@ class HDF5IO(FORMIO):
                 ret[k] = v
         return ret
 
-    def __read_ref(self, h5obj):
-        ret = None
-        ret = self.__get_built(h5obj.file.filename, h5obj.name)
+    def __read_ref(self, h5obj, path=None, ignore=set()):
+        if path is None:
+            path = h5obj.name
+        fpath = h5obj.file.filename
+        ret = self.__get_built(fpath, path)
+        if ret is None and self.__lazy and fpath == self.__file.filename:
+            # walk down from the root so the parents of the target get read too
+            ret = self.__find_lazy(path)
         if ret is None:
+            name = str(os.path.basename(path))
             if isinstance(h5obj, Dataset):
-                ret = self.__read_dataset(h5obj)
+                ret = self.__read_dataset(h5obj, name)
             elif isinstance(h5obj, Group):
-                ret = self.__read_group(h5obj)
+                ret = self.__read_group(h5obj, name, ignore=ignore)
             else:
                 raise ValueError("h5obj must be a Dataset or a Group - got %s" % str(h5obj))
-            self.__set_built(h5obj.file.filename, h5obj.name, ret)
+            self.__set_built(fpath, path, ret)
+        return ret
+
+    def __find_lazy(self, path):
+        """Find the builder for path by reading each group on the way down from the root, or None if not found"""
+        ret = self.__read.get(self.__file)
+        for name in path.split('/'):
+            if not name:
+                continue
+            if isinstance(ret, LinkBuilder):
+                ret = ret.builder
+            if not isinstance(ret, GroupBuilder):
+                return None
+            ret = ret.get(name)
+        if isinstance(ret, LinkBuilder):
+            ret = ret.builder
+        if not isinstance(ret, (GroupBuilder, DatasetBuilder)):
+            return None
         return ret
 
     def open(self):
         if self.__file is None:
             open_flag = self.__mode
-            self.__file = File(self.__path, open_flag)
+            if self.__chunk_cache is None:
+                self.__file = File(self.__path, open_flag)
+            else:
+                self.__file = File(self.__open_fid(open_flag))
+        self.__open_chunk_cached()
+
+    def __open_fid(self, mode):
+        '''Open the file with the chunk cache settings given by chunk_cache as the default for all datasets'''
+        fapl = h5p.create(h5p.FILE_ACCESS)
+        fapl.set_fclose_degree(h5f.CLOSE_STRONG)
+        mdc_nelmts = fapl.get_cache()[0]
+        fapl.set_cache(mdc_nelmts, self.__chunk_cache.nslots, self.__chunk_cache.nbytes, self.__chunk_cache.w0)
+        path = self.__path.encode('UTF-8')
+        if mode == 'r':
+            return h5f.open(path, h5f.ACC_RDONLY, fapl=fapl)
+        elif mode == 'r+':
+            return h5f.open(path, h5f.ACC_RDWR, fapl=fapl)
+        elif mode == 'w':
+            return h5f.create(path, h5f.ACC_TRUNC, fapl=fapl)
+        elif mode in ('w-', 'x'):
+            return h5f.create(path, h5f.ACC_EXCL, fapl=fapl)
+        elif mode == 'a':
+            if os.path.exists(self.__path):
+                return h5f.open(path, h5f.ACC_RDWR, fapl=fapl)
+            return h5f.create(path, h5f.ACC_EXCL, fapl=fapl)
+        raise ValueError("invalid mode '%s' - must be one of r, r+, w, w-, x, a" % mode)
 
     def close(self):
+        self.__cached_dsets.clear()
         if self.__file is not None:
+            if self.__chunk_lru_cache is not None:
+                self.__chunk_lru_cache.clear(self.__file.filename)
             self.__file.close()
+            if self.__index_stamp is not None:
+                # mark the file as last written by this HDF5IO, see __get_index_token
+                os.utime(self.__path, (os.stat(self.__path).st_atime, self.__index_stamp))
+            self.__index_stamp = None
+        self.__ref_targets.clear()
 
     @docval({'name': 'builder', 'type': GroupBuilder, 'doc': 'the GroupBuilder object representing the NWBFile'},
             {'name': 'link_data', 'type': bool,
              'doc': 'If not specified otherwise link (True) or copy (False) HDF5 Datasets', 'default': True})
     def write_builder(self, **kwargs):
         f_builder, link_data = getargs('builder', 'link_data', kwargs)
-        for name, gbldr in f_builder.groups.items():
-            self.write_group(self.__file, gbldr)
-        for name, dbldr in f_builder.datasets.items():
-            self.write_dataset(self.__file, dbldr, link_data)
-        self.set_attributes(self.__file, f_builder.attributes)
+        # an index from an earlier write would not describe what is written now
+        self.__remove_index()
+        if not f_builder.written or f_builder.modified:
+            for name, dbldr in f_builder.datasets.items():
+                self.write_dataset(self.__file, dbldr, link_data)
+                self.__release_data(self.__file, dbldr)
+            for name, gbldr in f_builder.groups.items():
+                self.write_group(self.__file, gbldr)
+            self.set_attributes(self.__file, self.__get_attributes_to_write(f_builder))
+            f_builder.written = True
+            f_builder.set_modified(False)
         self.__add_refs()
 
+    @classmethod
+    def __get_attributes_to_write(cls, builder):
+        '''Get all attributes of a Builder that has not been written, or only those that changed since it was'''
+        if not builder.written:
+            return builder.attributes
+        return {name: builder.attributes[name] for name in builder.modified_attributes}
+
     def __add_refs(self):
         '''
         Add all references in the file.
@@ -419,16 +1205,26 @@ class HDF5IO(FORMIO):
         does not happen in a guaranteed order. We need to figure out what objects
         will be references, and then write them after we write everything else.
         '''
-        failed = set()
-        while len(self.__ref_queue) > 0:
-            call = self.__ref_queue.popleft()
-            try:
-                call()
-            except KeyError:
-                if id(call) in failed:
-                    raise RuntimeError('Unable to resolve reference')
-                failed.add(id(call))
-                self.__ref_queue.append(call)
+        # Every object that is written has been created by now, so references can be resolved in the order they
+        # were queued. Those that point to objects that do not exist yet are retried once, after all others.
+        deferred = list()
+        try:
+            while len(self.__ref_queue) > 0:
+                call = self.__ref_queue.popleft()
+                try:
+                    call()
+                except KeyError:
+                    deferred.append(call)
+            for call in deferred:
+                try:
+                    call()
+                except KeyError as exc:
+                    raise_from(RuntimeError('Unable to resolve reference'), exc)
+        finally:
+            self.__ref_queue.clear()
+            self.__paths.clear()
+            self.__h5objs.clear()
+            self.__obj_refs.clear()
 
     @classmethod
     def get_type(cls, data):
@@ -525,11 +1321,11 @@ class HDF5IO(FORMIO):
             def _filler():
                 ret = list()
                 for item in value:
-                    ret.append(self.__get_ref(item))
+                    ret.append(self.__resolve_ref(item))
                 obj.attrs[key] = ret
         else:
             def _filler():
-                obj.attrs[key] = self.__get_ref(value)
+                obj.attrs[key] = self.__resolve_ref(value)
         return _filler
 
     @docval({'name': 'parent', 'type': Group, 'doc': 'the parent HDF5 object'},
@@ -539,38 +1335,54 @@ class HDF5IO(FORMIO):
 
         parent, builder = getargs('parent', 'builder', kwargs)
         if builder.written:
+            # nothing below a Builder that has not changed since it was written needs to be visited
+            if not builder.modified:
+                return None
             group = parent[builder.name]
         else:
             group = parent.create_group(builder.name)
+        # write all datasets first, so that the data of this group can be freed before its subgroups are built
+        # when streaming
+        datasets = builder.datasets
+        if datasets:
+            for dset_name, sub_builder in datasets.items():
+                self.write_dataset(group, sub_builder)
+                self.__release_data(group, sub_builder)
         # write all groups
         subgroups = builder.groups
         if subgroups:
             for subgroup_name, sub_builder in subgroups.items():
                 # do not create an empty group without attributes or links
                 self.write_group(group, sub_builder)
-        # write all datasets
-        datasets = builder.datasets
-        if datasets:
-            for dset_name, sub_builder in datasets.items():
-                self.write_dataset(group, sub_builder)
         # write all links
         links = builder.links
         if links:
             for link_name, sub_builder in links.items():
                 self.write_link(group, sub_builder)
-        attributes = builder.attributes
-        self.set_attributes(group, attributes)
+        self.set_attributes(group, self.__get_attributes_to_write(builder))
         builder.written = True
+        builder.set_modified(False)
         return group
 
+    def __release_data(self, parent, builder):
+        '''When streaming, replace the data of a written DatasetBuilder with the dataset it was written to'''
+        if not self.__stream or not builder.written:
+            return
+        dset = parent.get(builder.name)
+        if isinstance(dset, Dataset) and builder.data is not dset:
+            # the data setter only sets data that is missing
+            builder['data'] = dset
+
     def __get_path(self, builder):
-        curr = builder
-        names = list()
-        while curr is not None and curr.name != ROOT_NAME:
-            names.append(curr.name)
-            curr = curr.parent
-        delim = "/"
-        path = "%s%s" % (delim, delim.join(reversed(names)))
+        if builder is None or builder.name == ROOT_NAME:
+            return "/"
+        # the path of each builder is built from the cached path of its parent, so every builder is visited once
+        cached = self.__paths.get(id(builder))
+        if cached is not None:
+            return cached[1]
+        path = posixpath.join(self.__get_path(builder.parent), builder.name)
+        # keep the builder, so that its id is not reused while the path is cached
+        self.__paths[id(builder)] = (builder, path)
         return path
 
     @docval({'name': 'parent', 'type': Group, 'doc': 'the parent HDF5 object'},
@@ -608,18 +1420,31 @@ class HDF5IO(FORMIO):
         """
         parent, builder, link_data = getargs('parent', 'builder', 'link_data', kwargs)
         if builder.written:
+            if builder.modified:
+                dset = parent[builder.name]
+                self.__append_rows(dset, builder)
+                self.set_attributes(dset, self.__get_attributes_to_write(builder))
+                builder.set_modified(False)
             return None
         name = builder.name
         data = builder.data
         options = dict()   # dict with additional
         if isinstance(data, H5DataIO):
             options['io_settings'] = data.io_settings
+            options['compression_workers'] = data.compression_workers
             link_data = data.link_data
             data = data.data
         else:
             options['io_settings'] = {}
         attributes = builder.attributes
         options['dtype'] = builder.dtype
+        options['write_queue_size'] = self.__write_queue_size
+        if self.__resizable and 'maxshape' not in options['io_settings']:
+            maxshape = self.__get_resizable_maxshape(data, options['dtype'])
+            if maxshape is not None:
+                options['io_settings'] = dict(options['io_settings'], maxshape=maxshape)
+        options['chunk_planner'] = self.__chunk_planner
+        options['access'] = self.__get_access_pattern(builder)
         dset = None
         link = None
 
@@ -663,14 +1488,13 @@ class HDF5IO(FORMIO):
 
                 @self.__queue_ref
                 def _filler():
-                    ret = list()
-                    for item in data:
-                        new_item = list(item)
-                        for i in refs:
-                            new_item[i] = self.__get_ref(item[i])
-                        ret.append(tuple(new_item))
+                    # fill a structured array a column at a time, and write it in one go
+                    ret = np.empty(len(data), dtype=_dtype)
+                    if len(data) > 0:
+                        for i, (field, column) in enumerate(zip(_dtype.names, zip(*data))):
+                            ret[field] = self.__resolve_ref_column(column) if i in refs else column
                     dset = parent[name]
-                    dset[:] = ret
+                    dset[...] = ret
                     self.set_attributes(dset, attributes)
                 return
             # If the compound data type contains only regular data (i.e., no references) then we can write it as usual
@@ -687,7 +1511,7 @@ class HDF5IO(FORMIO):
 
                 @self.__queue_ref
                 def _filler():
-                    ref = self.__get_ref(data.builder, data.region)
+                    ref = self.__resolve_ref(data.builder, data.region)
                     dset = parent[name]
                     dset[()] = ref
                     self.set_attributes(dset, attributes)
@@ -698,7 +1522,7 @@ class HDF5IO(FORMIO):
 
                 @self.__queue_ref
                 def _filler():
-                    ref = self.__get_ref(data.builder)
+                    ref = self.__resolve_ref(data.builder)
                     dset = parent[name]
                     dset[()] = ref
                     self.set_attributes(dset, attributes)
@@ -713,7 +1537,7 @@ class HDF5IO(FORMIO):
                     def _filler():
                         refs = list()
                         for item in data:
-                            refs.append(self.__get_ref(item.builder, item.region))
+                            refs.append(self.__resolve_ref(item.builder, item.region))
                         dset = parent[name]
                         dset[()] = refs
                         self.set_attributes(dset, attributes)
@@ -724,11 +1548,9 @@ class HDF5IO(FORMIO):
 
                     @self.__queue_ref
                     def _filler():
-                        refs = list()
-                        for item in data:
-                            refs.append(self.__get_ref(item))
                         dset = parent[name]
-                        dset[()] = refs
+                        if len(data) > 0:
+                            dset[()] = self.__resolve_ref_column(data)
                         self.set_attributes(dset, attributes)
             return
         # write a "regular" dataset
@@ -754,6 +1576,80 @@ class HDF5IO(FORMIO):
         builder.written = True
         return
 
+    def __append_rows(self, dset, builder):
+        '''Write the rows of builder that come after the rows already in dset, growing dset to hold them'''
+        data = builder.data
+        if isinstance(data, DataIO):
+            data = data.data
+        if isinstance(data, (Dataset, AbstractDataChunkIterator, text_type, binary_type)) or \
+           isinstance(getattr(data, 'dataset', None), Dataset) or not hasattr(data, '__len__'):
+            return
+        start = dset.shape[0] if dset.shape else 0
+        if len(data) <= start:
+            return
+        if dset.maxshape[0] is not None and len(data) > dset.maxshape[0]:
+            raise ValueError("cannot extend dataset '%s' with shape %s past its maxshape %s - write it with an "
+                             "unlimited first axis to append to it" % (dset.name, dset.shape, dset.maxshape))
+        dset.resize(len(data), axis=0)
+        rows = data[start:]
+        names = dset.dtype.names
+        refs = list() if names is None else \
+            [i for i, field in enumerate(names) if check_dtype(ref=dset.dtype.fields[field][0]) is not None]
+        if len(refs) > 0:
+            @self.__queue_ref
+            def _filler():
+                # fill a structured array a column at a time, and write it in one go
+                ret = np.empty(len(rows), dtype=dset.dtype)
+                for i, (field, column) in enumerate(zip(names, zip(*rows))):
+                    ret[field] = self.__resolve_ref_column(column) if i in refs else column
+                dset[start:] = ret
+        elif check_dtype(ref=dset.dtype) is not None:
+            @self.__queue_ref
+            def _filler():
+                dset[start:] = self.__resolve_ref_column(rows)
+        else:
+            dset[start:] = rows
+
+    def __get_resizable_maxshape(self, data, dtype):
+        '''Get the maxshape that lets data grow along its first axis, or None if data is not an array'''
+        if isinstance(data, (Dataset, AbstractDataChunkIterator, text_type, binary_type)) or \
+           not hasattr(data, '__len__'):
+            return None
+        # the rows of compound data and the references of a reference column are single elements
+        if isinstance(dtype, list) or getattr(getattr(data, 'dtype', None), 'names', None) or self.__is_ref(dtype):
+            return (None,)
+        shape = get_shape(data)
+        if not shape:
+            return None
+        return (None,) + tuple(shape[1:])
+
+    def __get_access_pattern(self, builder):
+        '''Get the access pattern of a dataset from the data type of the group that contains it'''
+        data_types = tuple()
+        if builder.parent is not None:
+            try:
+                data_type = self.manager.get_builder_dt(builder.parent)
+                namespace = self.manager.get_builder_ns(builder.parent)
+                data_types = self.manager.namespace_catalog.get_hierarchy(namespace, data_type)
+            except (ValueError, KeyError):
+                pass
+        return self.__chunk_planner.get_access_pattern(data_types, builder.name)
+
+    @classmethod
+    def __plan_chunks(cls, options, shape, dtype, maxshape):
+        '''
+        Get the chunk shape to use for a dataset from the chunk planner in options, or True to let h5py guess it
+        '''
+        planner = options.get('chunk_planner') if options is not None else None
+        if planner is None:
+            return True
+        try:
+            chunks = planner.get_chunk_shape(shape, dtype, maxshape, options.get('access', 'time'))
+        except TypeError:
+            # the dtype is not one numpy understands
+            chunks = None
+        return True if chunks is None else chunks
+
     @classmethod
     def __selection_max_bounds__(cls, selection):
         """Determine the bounds of a numpy selection index tuple"""
@@ -797,46 +1693,138 @@ class HDF5IO(FORMIO):
         :type name: str
         :param data: The data to be written.
         :type data: DataChunkIterator
-        :param options: Dict with options for creating a dataset. available options are 'dtype' and 'io_settings'
+        :param options: Dict with options for creating a dataset. available options are 'dtype', 'io_settings'
+                        and 'write_queue_size', the number of chunks to produce ahead in a background thread
         :type data: dict
 
         """
         io_settings = {}
+        write_queue_size = 0
         if options is not None:
             if 'io_settings' in options:
                 io_settings = options.get('io_settings')
-        # Define the chunking options if the user has not set them explicitly. We need chunking for the iterative write.
-        if 'chunks' not in io_settings:
-            recommended_chunks = data.recommended_chunk_shape()
-            io_settings['chunks'] = True if recommended_chunks is None else recommended_chunks
-        # Define the shape of the data if not provided by the user
-        if 'shape' not in io_settings:
-            io_settings['shape'] = data.recommended_data_shape()
+            write_queue_size = options.get('write_queue_size', 0)
         # Define the maxshape of the data if not provided by the user
         if 'maxshape' not in io_settings:
             io_settings['maxshape'] = data.maxshape
+        maxshape = io_settings['maxshape']
+        # Define the shape of the data if not provided by the user
+        if 'shape' not in io_settings:
+            io_settings['shape'] = data.recommended_data_shape()
+        # Define the chunking options if the user has not set them explicitly. We need chunking for the iterative write.
+        # chunks=True is left to h5py to guess
+        if io_settings.get('chunks') is None:
+            recommended_chunks = data.recommended_chunk_shape()
+            if recommended_chunks is None:
+                recommended_chunks = cls.__plan_chunks(options, io_settings['shape'],
+                                                       io_settings.get('dtype', data.dtype), maxshape)
+            io_settings['chunks'] = recommended_chunks
+        # the final shape is the initial shape, expanded to fit every chunk that is written
+        final_shape = list(io_settings['shape'])
+        # If the full shape is known, allocate it all up front. Otherwise grow the dataset geometrically, so that
+        # it is resized only a logarithmic number of times. Either way, trim it to its final shape at the end.
+        if maxshape is not None and None not in maxshape:
+            io_settings['shape'] = tuple(maxshape)
         if 'dtype' not in io_settings:
             io_settings['dtype'] = data.dtype
         try:
             dset = parent.create_dataset(name, **io_settings)
         except Exception as exc:
             raise_from(Exception("Could not create dataset %s in %s" % (name, parent.name)), exc)
-        for chunk_i in data:
-            # Determine the minimum array dimensions to fit the chunk selection
-            max_bounds = cls.__selection_max_bounds__(chunk_i.selection)
-            if not hasattr(max_bounds, '__len__'):
-                max_bounds = (max_bounds,)
-            # Determine if we need to expand any of the data dimensions
-            expand_dims = [i for i, v in enumerate(max_bounds) if v is not None and v > dset.shape[i]]
-            # Expand the dataset if needed
-            if len(expand_dims) > 0:
-                new_shape = np.asarray(dset.shape)
-                new_shape[expand_dims] = np.asarray(max_bounds)[expand_dims]
-                dset.resize(new_shape)
-            # Process and write the data
-            dset[chunk_i.selection] = chunk_i.data
+        chunks = data if not write_queue_size else cls.__produce_chunks(data, write_queue_size)
+        try:
+            for chunk_i in chunks:
+                # Determine the minimum array dimensions to fit the chunk selection
+                max_bounds = cls.__selection_max_bounds__(chunk_i.selection)
+                if not hasattr(max_bounds, '__len__'):
+                    max_bounds = (max_bounds,)
+                for i, v in enumerate(max_bounds):
+                    if v is not None:
+                        final_shape[i] = max(final_shape[i], v)
+                # Expand the dataset if needed
+                new_shape = cls.__grown_shape(dset.shape, max_bounds, maxshape)
+                if new_shape is not None:
+                    dset.resize(new_shape)
+                # Process and write the data
+                dset[chunk_i.selection] = chunk_i.data
+        finally:
+            if write_queue_size:
+                # stop the producer now, rather than when the traceback of a failed write lets go of it
+                chunks.close()
+        if tuple(final_shape) != dset.shape:
+            dset.resize(final_shape)
         return dset
 
+    @classmethod
+    def __grown_shape(cls, shape, max_bounds, maxshape):
+        """
+        Get the shape to resize a dataset to so that it fits max_bounds, growing each axis that is too small to at
+        least twice its size, up to maxshape. Return None if the dataset is big enough.
+        """
+        expand_dims = [i for i, v in enumerate(max_bounds) if v is not None and v > shape[i]]
+        if len(expand_dims) == 0:
+            return None
+        new_shape = list(shape)
+        for i in expand_dims:
+            new_shape[i] = max(max_bounds[i], 2 * new_shape[i])
+            if maxshape is not None and maxshape[i] is not None:
+                new_shape[i] = min(new_shape[i], maxshape[i])
+        return new_shape
+
+    @classmethod
+    def __produce_chunks(cls, data, queue_size):
+        """
+        Iterate over the DataChunks of data, produced by a background thread that waits while queue_size
+        chunks have not been taken yet. Errors raised by data are raised here.
+        """
+        chunks = Queue(maxsize=queue_size)
+        stop = threading.Event()
+        done = object()
+
+        def _put(item):
+            # give up if the consumer has stopped, rather than waiting forever for space
+            while not stop.is_set():
+                try:
+                    chunks.put(item, timeout=0.1)
+                    return True
+                except Full:
+                    pass
+            return False
+
+        def _produce():
+            try:
+                for chunk in data:
+                    if stop.is_set() or not _put((chunk, None)):
+                        return
+            except Exception as exc:
+                _put((None, exc))
+            else:
+                _put((done, None))
+
+        thread = threading.Thread(target=_produce, name='DataChunk producer')
+        thread.daemon = True
+        thread.start()
+        try:
+            while True:
+                chunk, exc = chunks.get()
+                if exc is not None:
+                    raise exc
+                if chunk is done:
+                    break
+                yield chunk
+        finally:
+            stop.set()
+            # free the chunks that were not written, and let a producer waiting for space see the stop
+            try:
+                while True:
+                    chunks.get_nowait()
+            except Empty:
+                pass
+            # a producer stuck in the iterator cannot be stopped, and is left to finish as a daemon thread
+            thread.join(PRODUCER_JOIN_TIMEOUT)
+            if thread.is_alive():
+                warnings.warn('the DataChunk producer thread did not stop within %s seconds' % PRODUCER_JOIN_TIMEOUT)
+
     @classmethod
     def __list_fill__(cls, parent, name, data, options=None):
         # define the io settings and data type if necessary
@@ -858,6 +1846,11 @@ class HDF5IO(FORMIO):
             data_shape = (len(data),)
         else:
             data_shape = get_shape(data)
+        # Plan the chunk shape if the dataset needs to be chunked and the user has not set chunks. chunks=True is
+        # left to h5py to guess
+        if io_settings.get('chunks') is None and data_shape is not None and \
+                any(k in io_settings for k in ('maxshape', 'compression', 'shuffle', 'fletcher32')):
+            io_settings['chunks'] = cls.__plan_chunks(options, data_shape, dtype, io_settings.get('maxshape'))
         # Create the dataset
         try:
             dset = parent.create_dataset(name, shape=data_shape, dtype=dtype, **io_settings)
@@ -869,6 +1862,10 @@ class HDF5IO(FORMIO):
             new_shape = list(dset.shape)
             new_shape[0] = len(data)
             dset.resize(new_shape)
+        # compress the chunks outside of HDF5 if asked to, unless the dataset has filters we cannot apply
+        workers = options.get('compression_workers') if options is not None else None
+        if workers and write_direct_chunks(dset, data, workers):
+            return dset
         try:
             dset[:] = data
         except Exception as e:
@@ -881,6 +1878,10 @@ class HDF5IO(FORMIO):
             returns='the reference', rtype=Reference)
     def __get_ref(self, **kwargs):
         container, region = getargs('container', 'region', kwargs)
+        return self.__resolve_ref(container, region)
+
+    def __resolve_ref(self, container, region=None):
+        '''Get a reference to container, without checking arguments, to resolve many references in a loop'''
         if isinstance(container, Builder):
             if isinstance(container, LinkBuilder):
                 builder = container.target_builder
@@ -893,13 +1894,27 @@ class HDF5IO(FORMIO):
         path = self.__get_path(builder)
         if isinstance(container, RegionBuilder):
             region = container.region
+        obj = self.__h5objs.get(path)
+        if obj is None:
+            obj = self.__file[path]
+            self.__h5objs[path] = obj
         if region is not None:
-            dset = self.__file[path]
-            if not isinstance(dset, Dataset):
+            if not isinstance(obj, Dataset):
                 raise ValueError('cannot create region reference without Dataset')
-            return self.__file[path].regionref[region]
-        else:
-            return self.__file[path].ref
+            return obj.regionref[region]
+        ref = self.__obj_refs.get(path)
+        if ref is None:
+            ref = obj.ref
+            self.__obj_refs[path] = ref
+        return ref
+
+    def __resolve_ref_column(self, items):
+        '''Get an object array of the references to items, resolving the reference to each distinct item once'''
+        ids = np.fromiter((id(item) for item in items), dtype=np.uint64, count=len(items))
+        unique, first, inverse = np.unique(ids, return_index=True, return_inverse=True)
+        refs = np.empty(len(unique), dtype=object)
+        refs[:] = [self.__resolve_ref(items[i]) for i in first]
+        return refs[inverse]
 
     def __is_ref(self, dtype):
         if isinstance(dtype, DtypeSpec):
@@ -931,7 +1946,7 @@ class HDF5IO(FORMIO):
             if isinstance(elem, (list, tuple)):
                 ret.append(self.__rec_get_ref(elem))
             elif isinstance(elem, (Builder, Container)):
-                ret.append(self.__get_ref(elem))
+                ret.append(self.__resolve_ref(elem))
             else:
                 ret.append(elem)
         return ret
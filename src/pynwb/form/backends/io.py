@@ -1,8 +1,10 @@
 from abc import ABCMeta, abstractmethod
+import posixpath
 from ..build import BuildManager
-from ..build import GroupBuilder
+from ..build import GroupBuilder, DatasetBuilder, LinkBuilder, LazyGroupBuilder
 from ..utils import docval, getargs, popargs
 from ..container import Container
+from ..spec import GroupSpec
 from six import with_metaclass
 
 
@@ -14,6 +16,8 @@ class FORMIO(with_metaclass(ABCMeta, object)):
     def __init__(self, **kwargs):
         self.__manager = getargs('manager', kwargs)
         self.__built = dict()
+        self.__contained_types = dict()   # the data types that can be found inside each data type, by namespace
+        self.__subtypes = None            # the subtypes of each data type in all namespaces
         self.__source = getargs('source', kwargs)
         self.open()
 
@@ -33,10 +37,169 @@ class FORMIO(with_metaclass(ABCMeta, object)):
         container = self.__manager.construct(f_builder)
         return container
 
-    @docval({'name': 'container', 'type': Container, 'doc': 'the Container object to write'})
+    @docval({'name': 'paths', 'type': (str, list, tuple),
+             'doc': 'the path(s) of the objects to read e.g. /acquisition/ElectricalSeries', 'default': None},
+            {'name': 'data_types', 'type': (str, list, tuple),
+             'doc': 'the data_type(s) of the objects to read. Objects of a subtype are read as well', 'default': None},
+            returns='the Container objects that were read in, indexed by path', rtype=dict)
+    def read_containers(self, **kwargs):
+        '''Read only the objects at the given paths and/or with the given data_types
+
+        Only the requested objects, and the objects they link to or reference, are constructed. The
+        parent of a requested object is left as a Proxy unless that parent was also requested.
+
+        When reading lazily, the search for data_types does not load the groups whose specification says
+        they cannot hold any of the data_types, so it relies on the specifications of all the types in the
+        file being loaded. Objects whose namespace is not loaded are skipped.
+        '''
+        paths, data_types = getargs('paths', 'data_types', kwargs)
+        if isinstance(paths, str):
+            paths = [paths]
+        if isinstance(data_types, str):
+            data_types = [data_types]
+        f_builder = self.read_builder()
+        builders = dict()
+        for path in paths or ():
+            builder = self.__find_path(f_builder, path)
+            if builder is None:
+                raise ValueError("'%s' not found in %s" % (path, self.__source))
+            builders[self.__get_path(builder)] = builder
+        if data_types:
+            self.__find_data_types(f_builder, set(data_types), builders)
+        ret = dict()
+        for path, builder in builders.items():
+            try:
+                self.__manager.get_builder_dt(builder)
+            except ValueError:
+                raise ValueError("'%s' does not have a data_type - cannot construct a Container" % path)
+            ret[path] = self.__manager.construct(builder)
+        return ret
+
+    @staticmethod
+    def __find_path(f_builder, path):
+        builder = f_builder
+        for name in path.split('/'):
+            if not name:
+                continue
+            if isinstance(builder, LinkBuilder):
+                builder = builder.builder
+            if not isinstance(builder, GroupBuilder):
+                return None
+            builder = builder.get(name)
+        if isinstance(builder, LinkBuilder):
+            builder = builder.builder
+        if not isinstance(builder, (GroupBuilder, DatasetBuilder)):
+            return None
+        return builder
+
+    @staticmethod
+    def __get_path(builder):
+        names = list()
+        while builder.parent is not None:
+            names.append(builder.name)
+            builder = builder.parent
+        return '/' + '/'.join(reversed(names))
+
+    def __find_data_types(self, f_builder, data_types, ret):
+        ns_catalog = self.__manager.namespace_catalog
+        type_key = ns_catalog.group_spec_cls.type_key()
+        stack = [('/', f_builder)]
+        while len(stack) > 0:
+            path, builder = stack.pop()
+            for name, sub_builder in list(builder.groups.items()) + list(builder.datasets.items()):
+                sub_path = posixpath.join(path, name)
+                # the data type of a group that has not been loaded yet is read without loading it
+                attrs = sub_builder.known_attributes if isinstance(sub_builder, LazyGroupBuilder) else \
+                    sub_builder.attributes
+                dt, ns = attrs.get(type_key), attrs.get('namespace')
+                if isinstance(dt, bytes):
+                    dt = dt.decode('UTF-8')
+                if dt is not None and ns is not None:
+                    try:
+                        if data_types.intersection(ns_catalog.get_hierarchy(ns, dt)):
+                            ret[sub_path] = sub_builder
+                    except KeyError:
+                        # the namespace is not loaded e.g. an extension whose specification is not cached
+                        pass
+                if isinstance(sub_builder, GroupBuilder) and \
+                   (dt is None or ns is None or self.__may_contain(ns, dt, data_types)):
+                    stack.append((sub_path, sub_builder))
+
+    def __may_contain(self, ns, dt, data_types):
+        '''Check whether an object of data_type dt can hold an object of one of data_types, or a subtype of one'''
+        if (ns, dt) not in self.__contained_types:
+            self.__contained_types[(ns, dt)] = self.__get_contained_types(ns, dt)
+        contained = self.__contained_types[(ns, dt)]
+        return contained is None or len(data_types.intersection(contained)) > 0
+
+    def __get_contained_types(self, ns, dt):
+        '''
+        Get the data types, and the types they extend, of the objects that the specifications allow to be found
+        at any depth inside an object of data_type dt, or None if that cannot be told from the loaded specifications
+        '''
+        ns_catalog = self.__manager.namespace_catalog
+        if self.__subtypes is None:
+            self.__subtypes = dict()
+            for name in ns_catalog.namespaces:
+                for t in ns_catalog.get_namespace(name).get_registered_types():
+                    for parent in ns_catalog.get_hierarchy(name, t)[1:]:
+                        self.__subtypes.setdefault(parent, set()).add(t)
+        seen = {dt}
+        todo = [dt]
+        while len(todo) > 0:
+            spec = self.__get_spec(ns, todo.pop())
+            if spec is None:
+                return None
+            for t in self.__get_nested_types(spec):
+                for sub_t in {t} | self.__subtypes.get(t, set()):
+                    if sub_t not in seen:
+                        seen.add(sub_t)
+                        todo.append(sub_t)
+        ret = set()
+        for t in seen - {dt}:
+            spec_ns = self.__get_spec_namespace(ns, t)
+            if spec_ns is None:
+                return None
+            ret.update(ns_catalog.get_hierarchy(spec_ns, t))
+        return ret
+
+    def __get_spec_namespace(self, ns, dt):
+        '''Get the namespace that has the specification of dt, trying ns before the other namespaces'''
+        ns_catalog = self.__manager.namespace_catalog
+        for name in [ns] + [n for n in ns_catalog.namespaces if n != ns]:
+            try:
+                ns_catalog.get_spec(name, dt)
+                return name
+            except (KeyError, ValueError):
+                continue
+        return None
+
+    def __get_spec(self, ns, dt):
+        spec_ns = self.__get_spec_namespace(ns, dt)
+        return None if spec_ns is None else self.__manager.namespace_catalog.get_spec(spec_ns, dt)
+
+    @staticmethod
+    def __get_nested_types(spec):
+        '''Get the data types of the groups and datasets at any depth in spec, up to the next typed one'''
+        ret = set()
+        stack = [spec] if isinstance(spec, GroupSpec) else []
+        while len(stack) > 0:
+            s = stack.pop()
+            for sub in list(s.datasets) + list(s.groups):
+                t = sub.data_type_def or sub.data_type_inc
+                if t is not None:
+                    ret.add(t)
+                elif isinstance(sub, GroupSpec):
+                    stack.append(sub)
+        return ret
+
+    @docval({'name': 'container', 'type': Container, 'doc': 'the Container object to write'},
+            {'name': 'stream', 'type': bool,
+             'doc': 'build the group of each Container only when it is written, instead of building all of them first',
+             'default': False})
     def write(self, **kwargs):
-        container = popargs('container', kwargs)
-        f_builder = self.__manager.build(container, source=self.__source)
+        container, stream = popargs('container', 'stream', kwargs)
+        f_builder = self.__manager.build(container, source=self.__source, lazy=stream)
         self.write_builder(f_builder, **kwargs)
 
     @abstractmethod
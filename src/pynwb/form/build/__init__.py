@@ -1,6 +1,7 @@
 # flake8: noqa: F401
 from .builders import Builder
 from .builders import GroupBuilder
+from .builders import LazyGroupBuilder
 from .builders import DatasetBuilder
 from .builders import ReferenceBuilder
 from .builders import RegionBuilder
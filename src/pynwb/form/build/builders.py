@@ -6,9 +6,10 @@ import posixpath as _posixpath
 from abc import ABCMeta
 import warnings
 from collections import Iterable
+from numbers import Number
 
-from ..utils import docval, getargs, popargs, call_docval_func, fmt_docval_args
-from six import with_metaclass
+from ..utils import docval, getargs, popargs, call_docval_func, fmt_docval_args, get_docval
+from six import with_metaclass, string_types, binary_type
 
 
 class Builder(with_metaclass(ABCMeta, dict)):
@@ -29,6 +30,7 @@ class Builder(with_metaclass(ABCMeta, dict)):
         else:
             self.__source = None
         self.__written = False
+        self.__modified = False
 
     @property
     def written(self):
@@ -41,6 +43,23 @@ class Builder(with_metaclass(ABCMeta, dict)):
             raise ValueError("cannot change written to not written")
         self.__written = s
 
+    @property
+    def modified(self):
+        ''' Whether or not this Builder, or a Builder within it, has changed since it was written '''
+        return self.__modified
+
+    @docval({'name': 'modified', 'type': bool,
+             'doc': 'whether or not this Builder has been modified', 'default': True})
+    def set_modified(self, **kwargs):
+        '''
+        Mark this Builder as modified, along with every Builder above it, so that writing it again only
+        visits the Builders that changed. Marking a Builder as not modified does not change its parent.
+        '''
+        modified = getargs('modified', kwargs)
+        self.__modified = modified
+        if modified and self.__parent is not None and not self.__parent.modified:
+            self.__parent.set_modified()
+
     @property
     def name(self):
         ''' The name of this Builder '''
@@ -86,6 +105,7 @@ class BaseBuilder(Builder):
         name, attributes, parent, source = getargs('name', 'attributes', 'parent', 'source', kwargs)
         super(BaseBuilder, self).__init__(name, parent, source)
         super(BaseBuilder, self).__setitem__(BaseBuilder.__attribute, dict())
+        self.__modified_attributes = set()
         for name, val in attributes.items():
             self.set_attribute(name, val)
 
@@ -94,14 +114,43 @@ class BaseBuilder(Builder):
         ''' The attributes stored in this Builder object '''
         return super(BaseBuilder, self).__getitem__(BaseBuilder.__attribute)
 
+    @property
+    def modified_attributes(self):
+        ''' The names of the attributes that have changed since this Builder was written '''
+        return frozenset(self.__modified_attributes)
+
+    @docval({'name': 'modified', 'type': bool,
+             'doc': 'whether or not this Builder has been modified', 'default': True})
+    def set_modified(self, **kwargs):
+        ''' Mark this Builder as modified. Marking it as not modified also forgets which attributes changed '''
+        if not getargs('modified', kwargs):
+            self.__modified_attributes.clear()
+        call_docval_func(super(BaseBuilder, self).set_modified, kwargs)
+
     @docval({'name': 'name', 'type': str, 'doc': 'the name of the attribute'},
             {'name': 'value', 'type': None, 'doc': 'the attribute value'})
     def set_attribute(self, **kwargs):
         ''' Set an attribute for this group. '''
         name, value = getargs('name', 'value', kwargs)
-        super(BaseBuilder, self).__getitem__(BaseBuilder.__attribute)[name] = value
+        attributes = super(BaseBuilder, self).__getitem__(BaseBuilder.__attribute)
+        if self.written and (name not in attributes or not self.__same_value(attributes[name], value)):
+            self.__modified_attributes.add(name)
+            self.set_modified()
+        attributes[name] = value
         # self.obj_type[name] = BaseBuilder.__attribute
 
+    @staticmethod
+    def __same_value(old, new):
+        # only values that are cheap to compare count as unchanged, anything else is written again
+        if old is new:
+            return True
+        if isinstance(old, ReferenceBuilder) and isinstance(new, ReferenceBuilder):
+            return old.builder is new.builder
+        scalar_types = (string_types, binary_type, Number, np.generic)
+        if isinstance(old, scalar_types) and isinstance(new, scalar_types):
+            return bool(old == new)
+        return False
+
     @docval({'name': 'builder', 'type': 'BaseBuilder', 'doc': 'the BaseBuilder to merge attributes from '})
     def deep_update(self, **kwargs):
         ''' Merge attributes from the given BaseBuilder into this builder '''
@@ -216,6 +265,8 @@ class GroupBuilder(BaseBuilder):
                                    (name, self.obj_type[name], self.name, obj_type))
         super(GroupBuilder, self).__getitem__(obj_type)[name] = builder
         self.obj_type[name] = obj_type
+        if self.written and (not builder.written or builder.modified):
+            self.set_modified()
         if builder.parent is None:
             builder.parent = self
 
@@ -348,8 +399,9 @@ class GroupBuilder(BaseBuilder):
         if len(key_ar) == 1:
             return super(GroupBuilder, self).__getitem__(self.obj_type[key_ar[0]])[key_ar[0]]
         else:
-            if key_ar[0] in super(GroupBuilder, self).__getitem__(GroupBuilder.__group):
-                return super(GroupBuilder, self).__getitem__(GroupBuilder.__group)[key_ar[0]].__get_rec(key_ar[1:])
+            groups = self.groups
+            if key_ar[0] in groups:
+                return groups[key_ar[0]].__get_rec(key_ar[1:])
         raise KeyError(key_ar[0])
 
     def __setitem__(self, args, val):
@@ -386,6 +438,135 @@ class GroupBuilder(BaseBuilder):
                                 super(GroupBuilder, self).__getitem__(GroupBuilder.__link).values())
 
 
+class LazyGroupBuilder(GroupBuilder):
+    '''
+    A GroupBuilder that populates its subgroups, datasets, links, and attributes on first access
+
+    The loader is called once, with this builder as its only argument, the first time the contents of
+    this group are needed. It should add the contents using the usual setters e.g. *set_group* or *set_attribute*.
+    '''
+
+    @docval({'name': 'name', 'type': str, 'doc': 'the name of the group'},
+            {'name': 'loader', 'type': None, 'doc': 'a callable that takes this builder and populates it'},
+            {'name': 'parent', 'type': 'GroupBuilder', 'doc': 'the parent builder of this Builder', 'default': None},
+            {'name': 'source', 'type': str,
+             'doc': 'the source of the data represented in this Builder', 'default': None},
+            {'name': 'attributes', 'type': dict,
+             'doc': 'the attributes that are known before loading e.g. the data type', 'default': dict()})
+    def __init__(self, **kwargs):
+        name, loader, parent, source, attributes = getargs('name', 'loader', 'parent', 'source', 'attributes', kwargs)
+        self.__loader = None
+        self.__loading = False
+        super(LazyGroupBuilder, self).__init__(name, parent=parent, source=source, attributes=attributes)
+        self.__loader = loader
+
+    @property
+    def written(self):
+        ''' Whether or not this Builder has been written. The contents added by the loader are not changes '''
+        return super(LazyGroupBuilder, self).written and not self.__loading
+
+    @written.setter
+    def written(self, s):
+        super(LazyGroupBuilder, self.__class__).written.fset(self, s)
+
+    @property
+    def source(self):
+        ''' The source of this Builder '''
+        return super(LazyGroupBuilder, self).source
+
+    @source.setter
+    def source(self, s):
+        if self.loaded:
+            super(LazyGroupBuilder, self.__class__).source.fset(self, s)
+        else:
+            # the contents added by the loader take the source of this group when they are added to it
+            Builder.source.fset(self, s)
+
+    @property
+    def loaded(self):
+        ''' Whether or not the contents of this group have been loaded '''
+        return self.__loader is None
+
+    def load(self):
+        ''' Populate this group if it has not been populated yet '''
+        if self.__loader is not None:
+            loader = self.__loader
+            self.__loader = None
+            self.__loading = True
+            try:
+                loader(self)
+            finally:
+                self.__loading = False
+
+    @property
+    def known_attributes(self):
+        ''' The attributes known without loading this group e.g. the data type, or all of them once it is loaded '''
+        return super(LazyGroupBuilder, self).attributes
+
+    @property
+    def obj_type(self):
+        self.load()
+        return self.__obj_type
+
+    @obj_type.setter
+    def obj_type(self, val):
+        self.__obj_type = val
+
+    @property
+    def attributes(self):
+        ''' The attributes stored in this Builder object '''
+        self.load()
+        return super(LazyGroupBuilder, self).attributes
+
+    @property
+    def groups(self):
+        ''' The subgroups contained in this GroupBuilder '''
+        self.load()
+        return super(LazyGroupBuilder, self).groups
+
+    @property
+    def datasets(self):
+        ''' The datasets contained in this GroupBuilder '''
+        self.load()
+        return super(LazyGroupBuilder, self).datasets
+
+    @property
+    def links(self):
+        ''' The links contained in this GroupBuilder '''
+        self.load()
+        return super(LazyGroupBuilder, self).links
+
+    @docval(*get_docval(GroupBuilder.set_attribute))
+    def set_attribute(self, **kwargs):
+        ''' Set an attribute for this group '''
+        self.load()
+        call_docval_func(super(LazyGroupBuilder, self).set_attribute, kwargs)
+
+    def deep_update(self, builder):
+        ''' Recursively update subgroups in this group '''
+        self.load()
+        super(LazyGroupBuilder, self).deep_update(builder)
+
+    def is_empty(self):
+        # a group with attributes is not empty, whatever loading it would add
+        if not self.loaded and len(super(LazyGroupBuilder, self).attributes) > 0:
+            return False
+        self.load()
+        return super(LazyGroupBuilder, self).is_empty()
+
+    def items(self):
+        self.load()
+        return super(LazyGroupBuilder, self).items()
+
+    def keys(self):
+        self.load()
+        return super(LazyGroupBuilder, self).keys()
+
+    def values(self):
+        self.load()
+        return super(LazyGroupBuilder, self).values()
+
+
 class DatasetBuilder(BaseBuilder):
     OBJECT_REF_TYPE = 'object'
     REGION_REF_TYPE = 'region'
@@ -6,13 +6,14 @@ from copy import copy
 from datetime import datetime
 from six import with_metaclass, raise_from, text_type, binary_type, integer_types
 
-from ..utils import docval, getargs, ExtenderMeta, get_docval, fmt_docval_args, call_docval_func
+from ..utils import docval, getargs, ExtenderMeta, get_docval, fmt_docval_args, call_docval_func, trusted_docval
 from ..container import Container, Data, DataRegion
 from ..spec import Spec, AttributeSpec, DatasetSpec, GroupSpec, LinkSpec, NAME_WILDCARD, NamespaceCatalog, RefSpec,\
                    SpecReader
 from ..data_utils import DataIO, AbstractDataChunkIterator
 from ..spec.spec import BaseStorageSpec
 from .builders import DatasetBuilder, GroupBuilder, LinkBuilder, Builder, ReferenceBuilder, RegionBuilder, BaseBuilder
+from .builders import LazyGroupBuilder
 from .warnings import OrphanContainerWarning, MissingRequiredWarning
 
 
@@ -96,6 +97,7 @@ class BuildManager(object):
         self.__builders = dict()
         self.__containers = dict()
         self.__type_map = type_map
+        self.__lazy = False
 
     @property
     def namespace_catalog(self):
@@ -138,28 +140,66 @@ class BuildManager(object):
 
     @docval({"name": "container", "type": Container, "doc": "the container to convert to a Builder"},
             {"name": "source", "type": str,
-             "doc": "the source of container being built i.e. file path", 'default': None})
+             "doc": "the source of container being built i.e. file path", 'default': None},
+            {"name": "lazy", "type": bool,
+             "doc": "build the group of each Container only when the contents of the group are first accessed",
+             'default': False})
     def build(self, **kwargs):
         """ Build the GroupBuilder for the given Container"""
-        container = getargs('container', kwargs)
+        container, source, lazy = getargs('container', 'source', 'lazy', kwargs)
+        if lazy and not self.__lazy:
+            self.__lazy = True
+            try:
+                return self.build(container, source=source)
+            finally:
+                self.__lazy = False
         container_id = self.__conthash__(container)
         result = self.__builders.get(container_id)
-        source = getargs('source', kwargs)
         if result is None:
             if container.container_source is None:
                 container.container_source = source
             else:
                 if container.container_source != source:
                     raise ValueError("Can't change container_source once set")
-            result = self.__type_map.build(container, self, source=source)
+            if self.__lazy and not isinstance(container, Data):
+                result = self.__get_lazy_builder(container, source)
+            else:
+                result = self.__type_map.build(container, self, source=source)
             self.prebuilt(container, result)
+        elif isinstance(result, LazyGroupBuilder) and not result.loaded:
+            # the group is built from the current state of the Container when it is loaded
+            pass
         elif container.modified:
             if isinstance(result, GroupBuilder):
                 # TODO: if Datasets attributes are allowed to be modified, we need to
                 # figure out how to handle that starting here.
                 result = self.__type_map.build(container, self, builder=result, source=source)
+            elif result.written and isinstance(container, Data):
+                # rows added to data that could not grow in the file are written after the rows already in it
+                data = self.__type_map.build(container, self, source=source).data
+                if hasattr(data, '__len__') and hasattr(result.data, '__len__') and len(data) > len(result.data):
+                    result['data'] = data
+                    result.set_modified()
         return result
 
+    def __get_lazy_builder(self, container, source):
+        '''
+        Get a GroupBuilder that builds the given Container the first time its contents are accessed. The Containers
+        within it are built lazily in turn, so that a tree of groups is built one group at a time as it is written
+        '''
+        namespace, data_type = self.__type_map.get_container_ns_dt(container)
+        type_key = self.__type_map.get_map(container).spec.type_key()
+
+        def _loader(builder):
+            lazy = self.__lazy
+            self.__lazy = True
+            try:
+                self.__type_map.build(container, self, source=source, builder=builder)
+            finally:
+                self.__lazy = lazy
+        return LazyGroupBuilder(self.get_builder_name(container), _loader, source=source,
+                                attributes={'namespace': namespace, type_key: data_type})
+
     @docval({"name": "container", "type": Container, "doc": "the Container to save as prebuilt"},
             {'name': 'builder', 'type': (DatasetBuilder, GroupBuilder),
              'doc': 'the Builder representation of the given container'})
@@ -618,9 +658,12 @@ class ObjectMapper(with_metaclass(ExtenderMeta, object)):
         container, manager, parent, source = getargs('container', 'manager', 'parent', 'source', kwargs)
         builder = getargs('builder', kwargs)
         name = manager.get_builder_name(container)
+        # the Builders are made and filled in trusted mode, since their arguments come from the spec and from the
+        # ObjectMapper methods that get them, which are checked as usual
         if isinstance(self.__spec, GroupSpec):
             if builder is None:
-                builder = GroupBuilder(name, parent=parent, source=source)
+                with trusted_docval():
+                    builder = GroupBuilder(name, parent=parent, source=source)
             self.__add_datasets(builder, self.__spec.datasets, container, manager, source)
             self.__add_groups(builder, self.__spec.groups, container, manager, source)
             self.__add_links(builder, self.__spec.links, container, manager, source)
@@ -630,29 +673,41 @@ class ObjectMapper(with_metaclass(ExtenderMeta, object)):
                 raise ValueError(msg)
             if isinstance(self.spec.dtype, RefSpec):
                 bldr_data = self.__get_ref_builder(self.spec.dtype, self.spec.shape, container, manager)
-                builder = DatasetBuilder(name, bldr_data, parent=parent, source=source,
-                                         dtype=self.convert_dtype(self.__spec.dtype))
+                with trusted_docval():
+                    builder = DatasetBuilder(name, bldr_data, parent=parent, source=source,
+                                             dtype=self.convert_dtype(self.__spec.dtype))
             elif isinstance(self.spec.dtype, list):
                 refs = [(i, subt) for i, subt in enumerate(self.spec.dtype) if isinstance(subt.dtype, RefSpec)]
-                bldr_data = copy(container.data)
-                bldr_data = list()
-                for i, row in enumerate(container.data):
-                    tmp = list(row)
-                    for j, subt in refs:
-                        tmp[j] = self.__get_ref_builder(subt.dtype, None, row[j], manager)
-                    bldr_data.append(tuple(tmp))
-                builder = DatasetBuilder(name, bldr_data, parent=parent, source=source,
-                                         dtype=self.convert_dtype(self.__spec.dtype))
+                # swap in the reference columns a column at a time, building one reference per distinct target
+                columns = list(zip(*container.data))
+                for j, subt in refs:
+                    if len(columns) == 0:
+                        break
+                    ref_builders = dict()
+                    column = list()
+                    for target in columns[j]:
+                        ref = ref_builders.get(id(target))
+                        if ref is None:
+                            ref = self.__get_ref_builder(subt.dtype, None, target, manager)
+                            ref_builders[id(target)] = ref
+                        column.append(ref)
+                    columns[j] = column
+                bldr_data = list(zip(*columns))
+                with trusted_docval():
+                    builder = DatasetBuilder(name, bldr_data, parent=parent, source=source,
+                                             dtype=self.convert_dtype(self.__spec.dtype))
             else:
                 if self.__spec.dtype is None and self.__is_reftype(container.data):
                     bldr_data = list()
                     for d in container.data:
                         bldr_data.append(ReferenceBuilder(manager.build(d)))
-                    builder = DatasetBuilder(name, bldr_data, parent=parent, source=source,
-                                             dtype='object')
+                    with trusted_docval():
+                        builder = DatasetBuilder(name, bldr_data, parent=parent, source=source,
+                                                 dtype='object')
                 else:
-                    builder = DatasetBuilder(name, container.data, parent=parent, source=source,
-                                             dtype=self.convert_dtype(self.__spec.dtype))
+                    with trusted_docval():
+                        builder = DatasetBuilder(name, container.data, parent=parent, source=source,
+                                                 dtype=self.convert_dtype(self.__spec.dtype))
         self.__add_attributes(builder, self.__spec.attributes, container, manager, source)
         return builder
 
@@ -732,7 +787,8 @@ class ObjectMapper(with_metaclass(ExtenderMeta, object)):
                     warnings.warn(msg, MissingRequiredWarning)
                 continue
 
-            builder.set_attribute(spec.name, attr_value)
+            with trusted_docval():
+                builder.set_attribute(spec.name, attr_value)
 
     def __add_links(self, builder, links, container, build_manager, source):
         for spec in links:
@@ -768,7 +824,8 @@ class ObjectMapper(with_metaclass(ExtenderMeta, object)):
                 if spec.name in builder.datasets:
                     sub_builder = builder.datasets[spec.name]
                 else:
-                    sub_builder = builder.add_dataset(spec.name, attr_value, dtype=self.convert_dtype(spec.dtype))
+                    with trusted_docval():
+                        sub_builder = builder.add_dataset(spec.name, attr_value, dtype=self.convert_dtype(spec.dtype))
                 self.__add_attributes(sub_builder, spec.attributes, container, build_manager, source)
             else:
                 self.__add_containers(builder, spec, attr_value, build_manager, source, container)
@@ -780,7 +837,8 @@ class ObjectMapper(with_metaclass(ExtenderMeta, object)):
                 # group does not have the concept of value
                 sub_builder = builder.groups.get(spec.name)
                 if sub_builder is None:
-                    sub_builder = GroupBuilder(spec.name, source=source)
+                    with trusted_docval():
+                        sub_builder = GroupBuilder(spec.name, source=source)
                 self.__add_attributes(sub_builder, spec.attributes, container, build_manager, source)
                 self.__add_datasets(sub_builder, spec.datasets, container, build_manager, source)
 
@@ -800,7 +858,8 @@ class ObjectMapper(with_metaclass(ExtenderMeta, object)):
                 empty = sub_builder.is_empty()
                 if not empty or (empty and isinstance(spec.quantity, int)):
                     if sub_builder.name not in builder.groups:
-                        builder.set_group(sub_builder)
+                        with trusted_docval():
+                            builder.set_group(sub_builder)
             else:
                 if spec.data_type_def is not None:
                     attr_name = self.get_attribute(spec)
@@ -827,18 +886,22 @@ class ObjectMapper(with_metaclass(ExtenderMeta, object)):
                 # object this Container corresponds to
                 if isinstance(spec, LinkSpec) or value.parent is not parent_container:
                     name = spec.name
-                    builder.set_link(LinkBuilder(rendered_obj, name, builder))
+                    with trusted_docval():
+                        builder.set_link(LinkBuilder(rendered_obj, name, builder))
                 elif isinstance(spec, DatasetSpec):
                     if rendered_obj.dtype is None and spec.dtype is not None:
                         rendered_obj.dtype = self.convert_dtype(spec.dtype)
-                    builder.set_dataset(rendered_obj)
+                    with trusted_docval():
+                        builder.set_dataset(rendered_obj)
                 else:
-                    builder.set_group(rendered_obj)
+                    with trusted_docval():
+                        builder.set_group(rendered_obj)
             elif value.container_source:        # make a link to an existing container
                 if value.container_source != parent_container.container_source or\
                    value.parent is not parent_container:
                     rendered_obj = build_manager.build(value, source=source)
-                    builder.set_link(LinkBuilder(rendered_obj, name=spec.name, parent=builder))
+                    with trusted_docval():
+                        builder.set_link(LinkBuilder(rendered_obj, name=spec.name, parent=builder))
             else:
                 raise ValueError("Found unmodified Container with no source - '%s' with parent '%s'" %
                                  (value.name, parent_container.name))
@@ -1042,6 +1105,8 @@ class TypeMap(object):
         self.__container_types = OrderedDict()
         self.__data_types = dict()
         self.__default_mapper_cls = getargs('mapper_cls', kwargs)
+        # whether the registrations above are shared with a copy of this TypeMap
+        self.__shared = False
 
     @property
     def namespace_catalog(self):
@@ -1049,9 +1114,21 @@ class TypeMap(object):
 
     def __copy__(self):
         ret = TypeMap(copy(self.__ns_catalog), self.__default_mapper_cls)
-        ret.merge(self)
+        # the registrations are shared until either TypeMap registers a type or a map, see __unshare
+        ret.__container_types = self.__container_types
+        ret.__data_types = self.__data_types
+        ret.__mapper_cls = self.__mapper_cls
+        ret.__shared = self.__shared = True
         return ret
 
+    def __unshare(self):
+        '''Copy the registrations shared with copies of this TypeMap before changing them'''
+        if self.__shared:
+            self.__container_types = OrderedDict((ns, dict(types)) for ns, types in self.__container_types.items())
+            self.__data_types = dict(self.__data_types)
+            self.__mapper_cls = dict(self.__mapper_cls)
+            self.__shared = False
+
     def __deepcopy__(self, memo):
         # XXX: From @nicain: All of a sudden legacy tests started
         #      needing this argument in deepcopy. Doesn't hurt anything, though.
@@ -1085,6 +1162,9 @@ class TypeMap(object):
             {'name': 'reader',
              'type': SpecReader,
              'doc': 'the class to user for reading specifications', 'default': None},
+            {'name': 'cache_dir', 'type': str,
+             'doc': 'a directory to cache the loaded specifications in, for loading the same specification files '
+                    'into an empty catalog without parsing them', 'default': None},
             returns="the namespaces loaded from the given file", rtype=tuple)
     def load_namespaces(self, **kwargs):
         '''Load namespaces from a namespace file.
@@ -1351,6 +1431,7 @@ class TypeMap(object):
         ''' Map a container class to a data_type '''
         namespace, data_type, container_cls = getargs('namespace', 'data_type', 'container_cls', kwargs)
         spec = self.__ns_catalog.get_spec(namespace, data_type)    # make sure the spec exists
+        self.__unshare()
         self.__container_types.setdefault(namespace, dict())
         self.__container_types[namespace][data_type] = container_cls
         self.__data_types.setdefault(container_cls, (namespace, data_type))
@@ -1365,6 +1446,7 @@ class TypeMap(object):
         container_cls, mapper_cls = getargs('container_cls', 'mapper_cls', kwargs)
         if self.get_container_cls_dt(container_cls) == (None, None):
             raise ValueError('cannot register map for type %s - no data_type found' % container_cls)
+        self.__unshare()
         self.__mapper_cls[container_cls] = mapper_cls
 
     @docval({"name": "container", "type": Container, "doc": "the container to convert to a Builder"},
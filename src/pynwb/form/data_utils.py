@@ -3,6 +3,7 @@ from collections import Iterable
 from operator import itemgetter
 
 import numpy as np
+from h5py import Dataset, Reference, check_dtype
 from six import with_metaclass, text_type, binary_type
 
 from .container import Data, DataRegion
@@ -557,3 +558,194 @@ class ListSlicer(RegionSlicer):
 
     def __len__(self):
         return self.__len
+
+
+class BufferPool(object):
+    """
+    A pool of preallocated NumPy arrays, handed out by shape and dtype, for reading data into without allocating
+    a new array for every read
+    """
+
+    @docval({'name': 'nbuffers', 'type': int,
+             'doc': 'the number of buffers to cycle through for each shape and dtype. Use more than one to keep ' +
+                    'the results of earlier reads valid while reading the next ones', 'default': 1})
+    def __init__(self, **kwargs):
+        nbuffers = getargs('nbuffers', kwargs)
+        if nbuffers < 1:
+            raise ValueError("'nbuffers' must be at least 1")
+        self.__nbuffers = nbuffers
+        self.__buffers = dict()
+
+    @property
+    def nbuffers(self):
+        return self.__nbuffers
+
+    @docval({'name': 'shape', 'type': tuple, 'doc': 'the shape of the buffer'},
+            {'name': 'dtype', 'type': None, 'doc': 'the dtype of the buffer'},
+            returns='a buffer with the given shape and dtype', rtype=np.ndarray)
+    def get(self, **kwargs):
+        """
+        Get a buffer with the given shape and dtype, reusing the buffers already allocated for them in turn
+        """
+        shape, dtype = getargs('shape', 'dtype', kwargs)
+        key = (tuple(int(n) for n in shape), np.dtype(dtype))
+        entry = self.__buffers.get(key)
+        if entry is None:
+            entry = [list(), 0]
+            self.__buffers[key] = entry
+        buffers, i = entry
+        if i == len(buffers):
+            buffers.append(np.empty(key[0], dtype=key[1]))
+        entry[1] = (i + 1) % self.__nbuffers
+        return buffers[i]
+
+    def clear(self):
+        """Release all buffers in this pool"""
+        self.__buffers = dict()
+
+    def __len__(self):
+        return sum(len(buffers) for buffers, i in self.__buffers.values())
+
+
+def get_selection_shape(shape, selection):
+    """
+    Get the shape of the array that selecting selection from data with the given shape returns
+
+    :param shape: The shape of the data to select from
+    :param selection: An int, slice, Ellipsis, 1D list or array of indices, or a tuple of these
+    :raises ValueError: if the selection is not one of the above
+    """
+    key = selection if isinstance(selection, tuple) else (selection,)
+    ellipses = [i for i, k in enumerate(key) if k is Ellipsis]
+    if len(ellipses) > 1:
+        raise ValueError("a selection can only have a single Ellipsis")
+    if ellipses:
+        i = ellipses[0]
+        key = key[:i] + (slice(None),) * (len(shape) - len(key) + 1) + key[i + 1:]
+    if len(key) > len(shape):
+        raise ValueError("too many indices for data with shape %s" % (shape,))
+    key = key + (slice(None),) * (len(shape) - len(key))
+    ret = list()
+    for k, n in zip(key, shape):
+        if isinstance(k, (int, np.integer)) and not isinstance(k, (bool, np.bool_)):
+            continue
+        elif isinstance(k, slice):
+            ret.append(len(range(*k.indices(n))))
+        elif isinstance(k, (list, np.ndarray)) and np.ndim(k) == 1:
+            ret.append(int(np.count_nonzero(k)) if np.asarray(k).dtype == np.bool_ else len(k))
+        else:
+            raise ValueError("cannot get the shape of selection %s" % (selection,))
+    return tuple(ret)
+
+
+@docval({'name': 'data', 'type': None, 'doc': 'the data to read from'},
+        {'name': 'selection', 'type': None, 'doc': 'the selection to read. Read all data if None', 'default': None},
+        {'name': 'out', 'type': np.ndarray, 'doc': 'the array to read into', 'default': None},
+        {'name': 'pool', 'type': BufferPool, 'doc': 'the pool to get the array to read into from, if out is None',
+         'default': None},
+        returns='the array that was read into', rtype=np.ndarray, is_method=False)
+def read_into(**kwargs):
+    """
+    Read a selection of data into a preallocated array. Data that has a *read_direct* method, such as
+    h5py.Dataset and H5Dataset, is read straight into the array without an intermediate copy.
+    """
+    data, selection, out, pool = getargs('data', 'selection', 'out', 'pool', kwargs)
+    if isinstance(data, DataIO):
+        data = data.data
+    if not hasattr(data, 'read_direct') and not isinstance(data, np.ndarray):
+        data = np.asarray(data)
+    if out is None:
+        shape = get_selection_shape(data.shape, Ellipsis if selection is None else selection)
+        if pool is not None:
+            out = pool.get(shape, data.dtype)
+        else:
+            out = np.empty(shape, dtype=data.dtype)
+    if hasattr(data, 'read_direct'):
+        data.read_direct(out, source_sel=selection)
+    else:
+        out[...] = data if selection is None else data[selection]
+    return out
+
+
+def extend_data(data, arg):
+    """
+    Add the elements of arg to the end of data. Lists are extended in place, numpy arrays are copied, and
+    HDF5 datasets are resized in the file, which must be open for writing. The references held by a dataset
+    read from a file can only be made once the objects they point to are written, so the rows of such a
+    dataset are read into a list that is extended instead.
+
+    Data that is copied rather than extended in place, e.g. a numpy array read from a file, is not changed in
+    the file. Its Container needs to be written again to add the new rows to the file.
+
+    :param data: The data to extend
+    :type data: list, np.ndarray, h5py.Dataset, or a DataIO or FORMDataset wrapping one of these
+    :param arg: The elements to add
+    :returns: data, or the new array or list if data is a numpy array or a dataset of references
+    :raises ValueError: if data cannot be extended, e.g. an HDF5 dataset that cannot grow along its first axis
+    """
+    if isinstance(data, DataIO) or isinstance(getattr(data, 'dataset', None), Dataset):
+        # extend the wrapped data, which must not need to be replaced
+        inner = data.data if isinstance(data, DataIO) else data.dataset
+        if not isinstance(data, DataIO) and __has_object_refs(inner.dtype) and __needs_refs(inner, arg):
+            return extend_data(list(data[:]), arg)
+        if extend_data(inner, arg) is not inner:
+            raise ValueError("cannot extend %s wrapped in %s" % (type(inner), type(data)))
+        return data
+    if isinstance(data, list):
+        data.extend(arg)
+        return data
+    elif isinstance(data, np.ndarray):
+        arg = np.asarray(arg)
+        if arg.size == 0:
+            return data.copy()
+        # concatenate upcasts to np.result_type(data, arg) like np.append, e.g. for longer strings or floats
+        return np.concatenate([data, arg.reshape((-1,) + data.shape[1:])])
+    elif isinstance(data, Dataset):
+        nrows = len(arg)
+        if nrows == 0:
+            return data
+        if data.maxshape[0] is not None and data.shape[0] + nrows > data.maxshape[0]:
+            raise ValueError("cannot extend dataset '%s' with shape %s past its maxshape %s - write it with an "
+                             "unlimited first axis to append to it" % (data.name, data.shape, data.maxshape))
+        # check the new rows before the dataset grows, so that a failed append does not leave empty rows behind
+        if __needs_refs(data, arg):
+            raise ValueError("cannot extend dataset '%s' of references with %s" % (data.name, type(arg[0])))
+        data.resize(data.shape[0] + nrows, axis=0)
+        data[data.shape[0] - nrows:] = arg
+        return data
+    else:
+        raise ValueError("cannot extend object of type '%s'" % type(data))
+
+
+def __ref_fields(dtype):
+    '''Get the indices of the fields of the compound dtype that hold references'''
+    return [i for i, name in enumerate(dtype.names) if check_dtype(ref=dtype.fields[name][0]) is not None]
+
+
+def __has_object_refs(dtype):
+    '''Check whether dtype, or a field of it if it is compound, is an object reference'''
+    if dtype.names is None:
+        return check_dtype(ref=dtype) is Reference
+    return any(check_dtype(ref=dtype.fields[name][0]) is Reference for name in dtype.names)
+
+
+def __needs_refs(dset, arg):
+    '''Check whether arg needs to be converted to references before it can be added to the HDF5 dataset dset'''
+    if dset.dtype.names is not None:
+        fields = __ref_fields(dset.dtype)
+        return not all(isinstance(row[i], Reference) for row in arg for i in fields)
+    if check_dtype(ref=dset.dtype) is None:
+        return False
+    return not all(isinstance(a, Reference) for a in arg)
+
+
+def append_data(data, arg):
+    """
+    Add a single element to the end of data. See :py:func:`extend_data`.
+
+    :returns: data, or the new array if data is a numpy array
+    """
+    if isinstance(data, list):
+        data.append(arg)
+        return data
+    return extend_data(data, [arg])
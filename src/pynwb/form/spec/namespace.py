@@ -4,10 +4,13 @@ from copy import deepcopy, copy
 import ruamel.yaml as yaml
 import os.path
 import string
+import sys
+import hashlib
 from warnings import warn
 from itertools import chain
 from abc import ABCMeta, abstractmethod
 from six import with_metaclass, raise_from
+from six.moves import cPickle as pickle
 
 
 from ..utils import docval, getargs, popargs, get_docval, call_docval_func
@@ -401,16 +404,23 @@ class NamespaceCatalog(object):
             {'name': 'reader',
              'type': SpecReader,
              'doc': 'the class to user for reading specifications', 'default': None},
+            {'name': 'cache_dir', 'type': str,
+             'doc': 'a directory to cache the loaded specifications in, for loading the same specification files '
+                    'into an empty catalog without parsing them', 'default': None},
             returns='a dictionary describing the dependencies of loaded namespaces', rtype=dict)
     def load_namespaces(self, **kwargs):
         """Load the namespaces in the given file"""
-        namespace_path, resolve, reader = getargs('namespace_path', 'resolve', 'reader', kwargs)
+        namespace_path, resolve, reader, cache_dir = getargs('namespace_path', 'resolve', 'reader', 'cache_dir',
+                                                             kwargs)
         if reader is None:
             # load namespace definition from file
             if not os.path.exists(namespace_path):
                 msg = "namespace file '%s' not found" % namespace_path
                 raise IOError(msg)
             reader = YAMLSpecReader(indir=os.path.dirname(namespace_path))
+        elif cache_dir is not None:
+            # only the files read by a YAMLSpecReader can be checked for changes
+            cache_dir = None
         ns_path_key = os.path.join(reader.source, os.path.basename(namespace_path))
         ret = self.__included_specs.get(ns_path_key)
         if ret is None:
@@ -418,6 +428,12 @@ class NamespaceCatalog(object):
         else:
             return ret
         namespaces = reader.read_namespace(namespace_path)
+        cache_path = None
+        if cache_dir is not None and not (self.__namespaces or self.__loaded_specs):
+            # the result of loading into an empty catalog only depends on the specification files
+            cache_path = self.__get_cache_path(cache_dir, reader, namespace_path, namespaces, resolve)
+            if cache_path is not None and self.__read_cache(cache_path, ns_path_key):
+                return self.__included_specs[ns_path_key]
         types_key = self.__spec_namespace_cls.types_key()
         to_load = list()
         for ns in namespaces:
@@ -429,4 +445,65 @@ class NamespaceCatalog(object):
         for ns in to_load:
             ret[ns['name']] = self.__load_namespace(ns, reader, types_key, resolve=resolve)
         self.__included_specs[ns_path_key] = ret
+        if cache_path is not None:
+            self.__write_cache(cache_path)
         return ret
+
+    def __get_cache_path(self, cache_dir, reader, namespace_path, namespaces, resolve):
+        '''
+        Get the path of the cache file for loading the given namespaces. The name of the file is a hash of the
+        location and contents of the namespace and specification files, including those of included namespaces,
+        and of the modules that define the spec classes. Returns None if a namespace includes a namespace from
+        another namespace file, whose specification files are not known here
+        '''
+        # the loaded state refers to the namespace file by its location, so copies of the same files are cached apart
+        location = os.path.abspath(os.path.join(reader.source, os.path.basename(namespace_path)))
+        key = hashlib.sha1(repr((sys.version_info[:2], pickle.HIGHEST_PROTOCOL, resolve, location)).encode('utf-8'))
+        paths = [namespace_path]
+        names = set(ns['name'] for ns in namespaces)
+        for ns in namespaces:
+            # the specification files of an included namespace in this file are added along with its namespace
+            if any(s['namespace'] not in names for s in ns['schema'] if 'namespace' in s):
+                return None
+            paths.extend(os.path.join(reader.source, s['source']) for s in ns['schema'] if 'source' in s)
+        classes = (self.__group_spec_cls, self.__dataset_spec_cls, self.__spec_namespace_cls)
+        modules = set()
+        for cls in classes:
+            key.update(('%s.%s' % (cls.__module__, cls.__name__)).encode('utf-8'))
+            modules.update(c.__module__ for c in cls.__mro__)
+        for name in sorted(modules):
+            path = getattr(sys.modules.get(name), '__file__', None)
+            if path is not None:
+                paths.append(path)
+        for path in paths:
+            with open(path, 'rb') as f:
+                key.update(f.read())
+        return os.path.join(cache_dir, 'namespace-%s.pickle' % key.hexdigest())
+
+    def __read_cache(self, cache_path, ns_path_key):
+        try:
+            with open(cache_path, 'rb') as f:
+                namespaces, loaded_specs, included_specs, included_sources = pickle.load(f)
+            included_specs[ns_path_key]
+        except Exception:
+            # a missing, partially written, unreadable or mismatched cache is a miss, so the namespaces are
+            # loaded from the specification files instead
+            return False
+        self.__namespaces, self.__loaded_specs, self.__included_specs, self.__included_sources = \
+            namespaces, loaded_specs, included_specs, included_sources
+        return True
+
+    def __write_cache(self, cache_path):
+        state = (self.__namespaces, self.__loaded_specs, self.__included_specs, self.__included_sources)
+        tmp_path = '%s.%d' % (cache_path, os.getpid())
+        try:
+            if not os.path.isdir(os.path.dirname(cache_path)):
+                os.makedirs(os.path.dirname(cache_path))
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
+            # move the finished file into place, so that other processes never read a partially written cache
+            os.rename(tmp_path, cache_path)
+        except Exception:
+            # caching is best effort, e.g. the cache directory may not be writable
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
@@ -1,6 +1,9 @@
 import copy as _copy
 import itertools as _itertools
+import threading
 from abc import ABCMeta
+from contextlib import contextmanager
+from weakref import WeakKeyDictionary
 
 import h5py
 import numpy as np
@@ -23,46 +26,68 @@ def docval_macro(macro):
     return _dec
 
 
-def __type_okay(value, argtype, allow_none=False):
-    """Check a value against a type
+__int_types = (int, np.int8, np.int16, np.int32, np.int64)
+__float_types = (float, np.float16, np.float32, np.float64) + ((np.float128,) if hasattr(np, "float128") else tuple())
+__immutable_types = (type(None), bool, float, complex, text_type, binary_type, frozenset, type, np.generic)
+__immutable_types += six.integer_types
 
-       The difference between this function and :py:func:`isinstance` is that
-       it allows specifying a type as a string. Furthermore, strings allow for specifying more general
-       types, such as a simple numeric type (i.e. ``argtype``="num").
 
-       Args:
-           value (any): the value to check
-           argtype (type, str): the type to check for
-           allow_none (bool): whether or not to allow None as a valid value
+def __compile_type(argtype):
+    """Compile a docval type into a predicate for checking values that are not None
+
+       Strings that name a macro are expanded, the builtin string, int and float types (and their string
+       equivalents) are replaced with the set of types they stand for, and any other string is matched against
+       the names of the classes in the MRO of the value. The result of matching a class against these names
+       is cached, so that checking a value costs at most one :py:func:`isinstance` call and one dict lookup.
 
+       Args:
+           argtype (type, str, tuple, list): the type to check for
 
        Returns:
-           bool: True if value is a valid instance of argtype
+           function: a function that returns True if a value is a valid instance of argtype, or None if any
+           value is valid
     """
-    if value is None:
-        return allow_none
-    if isinstance(argtype, str):
-        if argtype in __macros:
-            return __type_okay(value, __macros[argtype], allow_none=allow_none)
-        elif argtype is 'int':
-            return __is_int(value)
-        elif argtype is 'float':
-            return __is_float(value)
-        return argtype in [cls.__name__ for cls in value.__class__.__mro__]
-    elif isinstance(argtype, type):
-        if argtype == six.text_type:
-            return isinstance(value, six.text_type) or isinstance(value, six.string_types)
-        elif argtype == str:
-            return isinstance(value, six.string_types)
-        elif argtype is int:
-            return __is_int(value)
-        elif argtype is float:
-            return __is_float(value)
-        return isinstance(value, argtype)
-    elif isinstance(argtype, tuple) or isinstance(argtype, list):
-        return any(__type_okay(value, i) for i in argtype)
-    else:    # argtype is None
-        return True
+    argtype = __resolve_type(argtype)
+    if argtype is None:
+        return None
+    if not isinstance(argtype, tuple):
+        argtype = (argtype,)
+    classes = list()
+    names = set()
+    for t in argtype:
+        if t is None:
+            return None
+        elif t in (str, text_type):
+            classes.extend(six.string_types)
+        elif t is int or t == 'int':
+            classes.extend(__int_types)
+        elif t is float or t == 'float':
+            classes.extend(__float_types)
+        elif isinstance(t, str):
+            names.add(t)
+        else:
+            classes.append(t)
+    classes = tuple(classes)
+    if not names:
+        return lambda value: isinstance(value, classes)
+    matches = dict()
+
+    def type_okay(value):
+        if isinstance(value, classes):
+            return True
+        cls = value.__class__
+        ret = matches.get(cls)
+        if ret is None:
+            ret = any(c.__name__ in names for c in cls.__mro__)
+            matches[cls] = ret
+        return ret
+    return type_okay
+
+
+def __is_immutable(value):
+    if isinstance(value, tuple):
+        return all(__is_immutable(v) for v in value)
+    return isinstance(value, __immutable_types)
 
 
 def __shape_okay_multi(value, argshape):
@@ -82,17 +107,6 @@ def __shape_okay(value, argshape):
     return True
 
 
-def __is_int(value):
-    return any(isinstance(value, i) for i in (int, np.int8, np.int16, np.int32, np.int64))
-
-
-def __is_float(value):
-    SUPPORTED_FLOAT_TYPES = [float, np.float16, np.float32, np.float64]
-    if hasattr(np, "float128"):
-        SUPPORTED_FLOAT_TYPES.append(np.float128)
-    return any(isinstance(value, i) for i in SUPPORTED_FLOAT_TYPES)
-
-
 def __format_type(argtype):
     if isinstance(argtype, str):
         return argtype
@@ -110,11 +124,39 @@ def __format_type(argtype):
         raise ValueError("argtype must be a type, str, list, or tuple")
 
 
-def __parse_args(validator, args, kwargs, enforce_type=True, enforce_shape=True, allow_extra=False):   # noqa: 901
+def __compile_args(validator):
+    """
+    Internal helper function used by the docval decorator to compile the description of the arguments of a
+    function into the form used by :py:func:`__parse_args`
+
+    :param validator: List of dicts from docval with the description of the arguments, with positional
+                      arguments before keyword arguments
+
+    :return: List of tuples with the name, the type, the compiled type check, whether None is a valid value,
+             the shape, whether the argument has a default, the default, and whether the default must be copied
+             on each call
+    """
+    allowable_terms = ('name', 'doc', 'type', 'shape', 'default', 'help')
+    ret = list()
+    for arg in validator:
+        # catch unsupported keys
+        unsupported_terms = set(arg.keys()) - set(allowable_terms)
+        if unsupported_terms:
+            raise ValueError('docval for {}: {} are not supported by docval'.format(arg['name'],
+                                                                                    list(unsupported_terms)))
+        has_default = 'default' in arg
+        default = arg.get('default')
+        allow_none = has_default and default is None
+        ret.append((arg['name'], arg['type'], __compile_type(arg['type']), allow_none, arg.get('shape'),
+                    has_default, default, not __is_immutable(default)))
+    return ret
+
+
+def __parse_args(compiled, args, kwargs, enforce_type=True, enforce_shape=True, allow_extra=False):   # noqa: C901
     """
     Internal helper function used by the docval decorator to parse and validate function arguments
 
-    :param validator: List of dicts from docval with the description of the arguments
+    :param compiled: List of compiled argument descriptions returned by :py:func:`__compile_args`
     :param args: List of the values of positional arguments supplied by the caller
     :param kwargs: Dict keyword arguments supplied by the caller where keys are the argument name and
                    values are the argument value.
@@ -130,78 +172,46 @@ def __parse_args(validator, args, kwargs, enforce_type=True, enforce_shape=True,
     type_errors = list()
     value_errors = list()
     argsi = 0
-    extras = dict(kwargs)
-    try:
-        it = iter(validator)
-        arg = next(it)
-        # catch unsupported keys
-        allowable_terms = ('name', 'doc', 'type', 'shape', 'default', 'help')
-        unsupported_terms = set(arg.keys()) - set(allowable_terms)
-        if unsupported_terms:
-            raise ValueError('docval for {}: {} are not supported by docval'.format(arg['name'],
-                                                                                    list(unsupported_terms)))
-        # process positional arguments
-        while True:
-            #
-            if 'default' in arg:
-                break
-            argname = arg['name']
-            argval_set = False
-            if argname in kwargs:
-                argval = kwargs.get(argname)
-                extras.pop(argname, None)
-                argval_set = True
-            elif argsi < len(args):
-                argval = args[argsi]
-                argval_set = True
-
-            if not argval_set:
-                type_errors.append("missing argument '%s'" % argname)
-            else:
-                if argname in ret:
-                    type_errors.append("'got multiple arguments for '%s" % argname)
-                else:
-                    if enforce_type:
-                        if not __type_okay(argval, arg['type']):
-                            fmt_val = (argname, type(argval).__name__, __format_type(arg['type']))
-                            type_errors.append("incorrect type for '%s' (got '%s', expected '%s')" % fmt_val)
-                    if enforce_shape and 'shape' in arg:
-                        if not __shape_okay_multi(argval, arg['shape']):
-                            fmt_val = (argname, get_data_shape(argval), arg['shape'])
-                            value_errors.append("incorrect shape for '%s' (got '%s, expected '%s')" % fmt_val)
-                    ret[argname] = argval
-            argsi += 1
-            arg = next(it)
-        while True:
-            argname = arg['name']
-            if argname in kwargs:
-                ret[argname] = kwargs.get(argname)
-                extras.pop(argname, None)
-            elif len(args) > argsi:
-                ret[argname] = args[argsi]
+    nargs = len(args)
+    nfound = 0
+    for argname, argtype, type_okay, allow_none, shape, has_default, default, copy_default in compiled:
+        if argname in kwargs:
+            argval = kwargs[argname]
+            nfound += 1
+            if not has_default:
                 argsi += 1
+        elif argsi < nargs:
+            argval = args[argsi]
+            argsi += 1
+        elif has_default:
+            argval = _copy.deepcopy(default) if copy_default else default
+        else:
+            type_errors.append("missing argument '%s'" % argname)
+            argsi += 1
+            continue
+        ret[argname] = argval
+        if enforce_type:
+            if argval is None:
+                if not allow_none:
+                    fmt_val = (argname, __format_type(argtype))
+                    type_errors.append("incorrect type for '%s' (got 'NoneType', expected '%s')" % fmt_val)
+            elif type_okay is not None and not type_okay(argval):
+                fmt_val = (argname, type(argval).__name__, __format_type(argtype))
+                type_errors.append("incorrect type for '%s' (got '%s', expected '%s')" % fmt_val)
+        if enforce_shape and shape is not None and argval is not None:
+            if not __shape_okay_multi(argval, shape):
+                fmt_val = (argname, get_data_shape(argval), shape)
+                value_errors.append("incorrect shape for '%s' (got '%s, expected '%s')" % fmt_val)
+    if nfound < len(kwargs):
+        for key in kwargs:
+            if key in ret:
+                continue
+            if not allow_extra:
+                type_errors.append("unrecognized argument: '%s'" % key)
             else:
-                ret[argname] = arg['default']
-            argval = ret[argname]
-            if enforce_type:
-                if not __type_okay(argval, arg['type'], arg['default'] is None):
-                    fmt_val = (argname, type(argval).__name__, __format_type(arg['type']))
-                    type_errors.append("incorrect type for '%s' (got '%s', expected '%s')" % fmt_val)
-            if enforce_shape and 'shape' in arg and argval is not None:
-                if not __shape_okay_multi(argval, arg['shape']):
-                    fmt_val = (argname, get_data_shape(argval), arg['shape'])
-                    value_errors.append("incorrect shape for '%s' (got '%s, expected '%s')" % fmt_val)
-            arg = next(it)
-    except StopIteration:
-        pass
-    if not allow_extra:
-        for key in extras.keys():
-            type_errors.append("unrecognized argument: '%s'" % key)
-    else:
-        # TODO: Extras get stripped out if function arguments are composed with fmt_docval_args.
-        # allow_extra needs to be tracked on a function so that fmt_docval_args doesn't strip them out
-        for key in extras.keys():
-            ret[key] = extras[key]
+                # TODO: Extras get stripped out if function arguments are composed with fmt_docval_args.
+                # allow_extra needs to be tracked on a function so that fmt_docval_args doesn't strip them out
+                ret[key] = kwargs[key]
     return {'args': ret, 'type_errors': type_errors, 'value_errors': value_errors}
 
 
@@ -298,6 +308,34 @@ def __resolve_type(t):
         raise ValueError(msg)
 
 
+__docval_state = threading.local()
+
+
+@contextmanager
+def trusted_docval():
+    '''trusted_docval()
+    A context manager for skipping the type and shape checks of docval for the calls made within it
+    by the current thread
+
+    Arguments are still matched to the signature of each function, missing and unrecognized arguments are still
+    reported, and defaults are still filled in. This is meant for library-internal call chains where the arguments
+    have already been checked at the entry point, e.g. a method that checks the same arguments as the method it
+    calls
+
+    .. code-block:: python
+
+       @docval(*get_docval(Units.add_unit))
+       def add_unit(self, **kwargs):
+           with trusted_docval():
+               call_docval_func(self.units.add_unit, kwargs)
+    '''
+    __docval_state.trusted = getattr(__docval_state, 'trusted', 0) + 1
+    try:
+        yield
+    finally:
+        __docval_state.trusted -= 1
+
+
 def docval(*validator, **options):
     '''A decorator for documenting and enforcing type for instance method arguments.
 
@@ -343,7 +381,8 @@ def docval(*validator, **options):
     rtype = options.pop('rtype', None)
     is_method = options.pop('is_method', True)
     allow_extra = options.pop('allow_extra', False)
-    val_copy = __sort_args(_copy.deepcopy(validator))
+    # the argument specs are only copied, not deep-copied, since mutable defaults are copied on each call
+    val_copy = __sort_args(dict(a) for a in validator)
 
     def dec(func):
         _docval = _copy.copy(options)
@@ -360,43 +399,38 @@ def docval(*validator, **options):
                 pos.append(a)
         loc_val = pos+kw
         _docval[__docval_args_loc] = loc_val
+        # the arguments are compiled on the first call, once any macros used by the arguments are registered
+        compiled = list()
+
+        def parse(args, kwargs):
+            if not compiled:
+                compiled.append(__compile_args(loc_val))
+            trusted = getattr(__docval_state, 'trusted', 0) > 0
+            parsed = __parse_args(compiled[0],
+                                  args,
+                                  kwargs,
+                                  enforce_type=enforce_type and not trusted,
+                                  enforce_shape=enforce_shape and not trusted,
+                                  allow_extra=allow_extra)
+            for error_type, ExceptionType in (('type_errors', TypeError),
+                                              ('value_errors', ValueError)):
+                parse_err = parsed.get(error_type)
+                if parse_err:
+                    msg = ', '.join(parse_err)
+                    raise_from(ExceptionType(msg), None)
+            return parsed['args']
+
         if is_method:
             def func_call(*args, **kwargs):
-                self = args[0]
-                parsed = __parse_args(
-                            _copy.deepcopy(loc_val),
-                            args[1:],
-                            kwargs,
-                            enforce_type=enforce_type,
-                            enforce_shape=enforce_shape,
-                            allow_extra=allow_extra)
-
-                for error_type, ExceptionType in (('type_errors', TypeError),
-                                                  ('value_errors', ValueError)):
-                    parse_err = parsed.get(error_type)
-                    if parse_err:
-                        msg = ', '.join(parse_err)
-                        raise_from(ExceptionType(msg), None)
-
-                return func(self, **parsed['args'])
+                return func(args[0], **parse(args[1:], kwargs))
         else:
             def func_call(*args, **kwargs):
-                parsed = __parse_args(_copy.deepcopy(loc_val),
-                                      args,
-                                      kwargs,
-                                      enforce_type=enforce_type,
-                                      allow_extra=allow_extra)
-                for error_type, ExceptionType in (('type_errors', TypeError),
-                                                  ('value_errors', ValueError)):
-                    parse_err = parsed.get(error_type)
-                    if parse_err:
-                        msg = ', '.join(parse_err)
-                        raise_from(ExceptionType(msg), None)
-
-                return func(**parsed['args'])
+                return func(**parse(args, kwargs))
         _rtype = rtype
         if isinstance(rtype, type):
             _rtype = rtype.__name__
+        # the docstring is rendered now rather than on access, since the __doc__ of a function is a plain attribute
+        # and a descriptor in its place would slow down every call
         docstring = __googledoc(func, _docval[__docval_args_loc], returns=returns, rtype=_rtype)
         setattr(func_call, '__doc__', docstring)
         setattr(func_call, '__name__', func.__name__)
@@ -524,15 +558,36 @@ class ExtenderMeta(ABCMeta):
         setattr(func, cls.__postinit, True)
         return classmethod(func)
 
+    # the names of the pre- and post-init routines of each class, including those of its bases
+    __hook_names = WeakKeyDictionary()
+
+    @classmethod
+    def __get_hook_names(mcs, cls, flag, cache=True):
+        ret = mcs.__hook_names.get(cls) if cache else None
+        if ret is None:
+            ret = {mcs.__preinit: set(), mcs.__postinit: set()}
+            for base in cls.__bases__:
+                for f in ret:
+                    ret[f].update(mcs.__get_hook_names(base, f))
+            for n, a in list(vars(cls).items()):
+                a = getattr(a, '__func__', a)
+                for f in ret:
+                    if hasattr(a, f):
+                        ret[f].add(n)
+            if cache:
+                mcs.__hook_names[cls] = ret
+        return ret[flag]
+
+    def __get_hooks(cls, flag):
+        # only the attributes defined on the class itself are scanned, since the routines of the bases are cached
+        it = (getattr(cls, n) for n in sorted(cls.__get_hook_names(cls, flag, cache=False)))
+        return [a for a in it if hasattr(a, flag)]
+
     def __init__(cls, name, bases, classdict):
-        it = (getattr(cls, n) for n in dir(cls))
-        it = (a for a in it if hasattr(a, cls.__preinit))
-        for func in it:
+        for func in cls.__get_hooks(cls.__preinit):
             func(name, bases, classdict)
         super(ExtenderMeta, cls).__init__(name, bases, classdict)
-        it = (getattr(cls, n) for n in dir(cls))
-        it = (a for a in it if hasattr(a, cls.__postinit))
-        for func in it:
+        for func in cls.__get_hooks(cls.__postinit):
             func(name, bases, classdict)
 
 
@@ -2,28 +2,33 @@
 from ..form.spec import NamespaceCatalog
 from ..form.utils import docval, getargs
 from ..spec import NWBDatasetSpec, NWBGroupSpec, NWBNamespace
-from .. import _get_resources, get_type_map, NWBContainer
+from .. import _get_resources, get_type_map as _get_core_type_map, NWBContainer
 
 from .map import ObjectMapperLegacy as ObjectMapper
 from .map import TypeMapLegacy as TypeMap
 
 
-__NS_CATALOG = NamespaceCatalog(NWBGroupSpec, NWBDatasetSpec, NWBNamespace)
-__TYPE_MAP = TypeMap(__NS_CATALOG)
-
-# load the core namespace i.e. base NWB specification
-__resources = _get_resources()
-__TYPE_MAP.load_namespaces(__resources['namespace_path'])
-__TYPE_MAP.merge(get_type_map())
-
-# Register new ObjectMapper with the new TypeMap:
-__TYPE_MAP.register_map(NWBContainer, ObjectMapper)
+# the TypeMap is built on first use, since it loads the core namespace and merges in the TypeMap of pynwb
+__TYPE_MAP = None
+# the ObjectMappers registered with register_map, in order of registration
+__MAPPERS = [(NWBContainer, ObjectMapper)]
 
 
 def get_type_map(**kwargs):
     """
     Get a TypeMap to use for I/O for Allen Institute Brain Observatory files (NWB v1.0.6)
     """
+    global __TYPE_MAP
+    if __TYPE_MAP is None:
+        type_map = TypeMap(NamespaceCatalog(NWBGroupSpec, NWBDatasetSpec, NWBNamespace))
+        # load the core namespace i.e. base NWB specification
+        resources = _get_resources()
+        type_map.load_namespaces(resources['namespace_path'], cache_dir=resources['cache_dir'])
+        type_map.merge(_get_core_type_map())
+        # Register new ObjectMappers with the new TypeMap:
+        for container_cls, mapper_cls in __MAPPERS:
+            type_map.register_map(container_cls, mapper_cls)
+        __TYPE_MAP = type_map
     return __TYPE_MAP
 
 
@@ -41,7 +46,9 @@ def register_map(**kwargs):
     container_cls, mapper_cls = getargs('container_cls', 'mapper_cls', kwargs)
 
     def _dec(cls):
-        __TYPE_MAP.register_map(container_cls, cls)
+        __MAPPERS.append((container_cls, cls))
+        if __TYPE_MAP is not None:
+            __TYPE_MAP.register_map(container_cls, cls)
         return cls
     if mapper_cls is None:
         return _dec
@@ -12,6 +12,7 @@ from pynwb.form.build import GroupBuilder, DatasetBuilder
 from pynwb.form.spec import NamespaceCatalog
 from pynwb.spec import NWBGroupSpec, NWBDatasetSpec, NWBNamespace
 from pynwb.ecephys import ElectricalSeries, LFP
+from pynwb.core import DynamicTable
 
 import numpy as np
 
@@ -275,3 +276,148 @@ class TestAppend(unittest.TestCase):
         with NWBHDF5IO(FILENAME, mode='r') as io:
             nwb = io.read()
             np.testing.assert_equal(nwb.acquisition['timeseries2'].data[:], ts2.data)
+
+    def test_append_only_modified(self):
+        path = 'test_append_only_modified.nwb'
+        nwb = NWBFile(session_description='hi', identifier='hi', session_start_time=datetime(1970, 1, 1, 12,
+                                                                                             tzinfo=tzutc()))
+        nwb.add_acquisition(TimeSeries(name='ts', data=[1., 2., 3.], unit='unit', rate=1.0))
+        try:
+            with NWBHDF5IO(path, mode='w') as io:
+                io.write(nwb)
+
+            with NWBHDF5IO(path, mode='a') as io:
+                nwb = io.read()
+                # objects that did not change are not written again, so this change made behind its back remains
+                io._file['acquisition/ts'].attrs['comments'] = 'changed in the file'
+                nwb.add_acquisition(TimeSeries(name='ts2', data=[6., 7.], unit='unit', rate=1.0))
+                io.write(nwb)
+
+            with NWBHDF5IO(path, mode='r') as io:
+                nwb = io.read()
+                self.assertEqual(nwb.acquisition['ts'].comments, 'changed in the file')
+                np.testing.assert_equal(nwb.acquisition['ts2'].data[:], [6., 7.])
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_append_resizable(self):
+        path = 'test_append_resizable.nwb'
+        nwb = NWBFile(session_description='hi', identifier='hi', session_start_time=datetime(1970, 1, 1, 12,
+                                                                                             tzinfo=tzutc()))
+        nwb.add_acquisition(TimeSeries(name='ts', data=[1., 2., 3.], unit='unit', timestamps=[0., 1., 2.]))
+        nwb.add_trial(start_time=0.0, stop_time=1.0)
+        try:
+            with NWBHDF5IO(path, mode='w') as io:
+                io.write(nwb, resizable=True)
+
+            with NWBHDF5IO(path, mode='a') as io:
+                nwb = io.read()
+                nwb.acquisition['ts'].append_data([4., 5.], timestamps=[3., 4.])
+                nwb.add_trial(start_time=2.0, stop_time=3.0)
+                nwb.add_acquisition(TimeSeries(name='ts2', data=[6., 7.], unit='unit', rate=1.0))
+                io.write(nwb)
+
+            with NWBHDF5IO(path, mode='r') as io:
+                nwb = io.read()
+                ts = nwb.acquisition['ts']
+                np.testing.assert_equal(ts.data[:], [1., 2., 3., 4., 5.])
+                np.testing.assert_equal(ts.timestamps[:], [0., 1., 2., 3., 4.])
+                np.testing.assert_equal(nwb.trials['start_time'].data[:], [0., 2.])
+                np.testing.assert_equal(nwb.trials.id.data[:], [0, 1])
+                np.testing.assert_equal(nwb.acquisition['ts2'].data[:], [6., 7.])
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_append_table_resizable(self):
+        path = 'test_append_table_resizable.nwb'
+        nwb = NWBFile(session_description='hi', identifier='hi', session_start_time=datetime(1970, 1, 1, 12,
+                                                                                             tzinfo=tzutc()))
+        device = nwb.create_device(name='test_device')
+        group1 = nwb.create_electrode_group(name='group1', description='', location='', device=device)
+        nwb.add_electrode(x=0.0, y=0.0, z=0.0, imp=np.nan, location='CA1', filtering='', group=group1)
+        # a table with a text column, an object reference column and a region column
+        table = DynamicTable('test_table', 'a test table')
+        table.add_column('label', 'a text column')
+        table.add_column('group', 'an object reference column')
+        table.add_column('electrode', 'a region column', table=nwb.electrodes)
+        table.add_row(label='a', group=group1, electrode=0)
+        nwb.create_processing_module(name='test_proc_mod', description='').add_data_interface(table)
+        try:
+            with NWBHDF5IO(path, mode='w') as io:
+                io.write(nwb, resizable=True)
+
+            with NWBHDF5IO(path, mode='a') as io:
+                nwb = io.read()
+                group2 = nwb.create_electrode_group(name='group2', description='', location='',
+                                                    device=nwb.devices['test_device'])
+                nwb.add_electrode(x=1.0, y=1.0, z=1.0, imp=np.nan, location='CA3', filtering='', group=group2)
+                table = nwb.modules['test_proc_mod']['test_table']
+                table.add_row(label='b', group=nwb.electrode_groups['group1'], electrode=1)
+                table.add_row(label='c', group=group2, electrode=0)
+                io.write(nwb)
+
+            with NWBHDF5IO(path, mode='r') as io:
+                nwb = io.read()
+                electrodes = nwb.electrodes
+                np.testing.assert_equal(electrodes.id.data[:], [0, 1])
+                np.testing.assert_equal(electrodes['x'].data[:], [0., 1.])
+                self.assertEqual(list(electrodes['location'].data[:]), ['CA1', 'CA3'])
+                self.assertEqual([g.name for g in electrodes['group'].data[:]], ['group1', 'group2'])
+                table = nwb.modules['test_proc_mod']['test_table']
+                np.testing.assert_equal(table.id.data[:], [0, 1, 2])
+                self.assertEqual(list(table['label'].data[:]), ['a', 'b', 'c'])
+                self.assertEqual([g.name for g in table['group'].data[:]], ['group1', 'group1', 'group2'])
+                np.testing.assert_equal(table['electrode'].data[:], [0, 1, 0])
+                self.assertIs(table['electrode'].table, electrodes)
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_append_intervals_resizable(self):
+        path = 'test_append_intervals_resizable.nwb'
+        nwb = NWBFile(session_description='hi', identifier='hi', session_start_time=datetime(1970, 1, 1, 12,
+                                                                                             tzinfo=tzutc()))
+        nwb.add_acquisition(TimeSeries(name='ts1', data=[1., 2., 3.], unit='unit', timestamps=[0., 1., 2.]))
+        nwb.add_acquisition(TimeSeries(name='ts2', data=[4., 5., 6.], unit='unit', timestamps=[0., 1., 2.]))
+        # the timeseries column is a compound dataset with a reference field
+        nwb.add_epoch(start_time=0.0, stop_time=1.0, timeseries=nwb.acquisition['ts1'])
+        try:
+            with NWBHDF5IO(path, mode='w') as io:
+                io.write(nwb, resizable=True)
+
+            with NWBHDF5IO(path, mode='a') as io:
+                nwb = io.read()
+                nwb.add_epoch(start_time=1.0, stop_time=2.0, timeseries=[nwb.acquisition['ts1'],
+                                                                         nwb.acquisition['ts2']])
+                nwb.add_epoch(start_time=2.0, stop_time=3.0, timeseries=nwb.acquisition['ts2'])
+                io.write(nwb)
+
+            with NWBHDF5IO(path, mode='r') as io:
+                nwb = io.read()
+                epochs = nwb.epochs
+                np.testing.assert_equal(epochs['start_time'].data[:], [0., 1., 2.])
+                np.testing.assert_equal(epochs['timeseries'].data[:], [1, 3, 4])
+                timeseries = epochs['timeseries'].target.data[:]
+                self.assertEqual([row[2].name for row in timeseries], ['ts1', 'ts1', 'ts2', 'ts2'])
+                self.assertEqual([(row[0], row[1]) for row in timeseries], [(0, 1), (1, 1), (1, 1), (2, 1)])
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_append_not_resizable(self):
+        path = 'test_append_not_resizable.nwb'
+        nwb = NWBFile(session_description='hi', identifier='hi', session_start_time=datetime(1970, 1, 1, 12,
+                                                                                             tzinfo=tzutc()))
+        nwb.add_acquisition(TimeSeries(name='ts', data=[1., 2., 3.], unit='unit', rate=1.0))
+        try:
+            with NWBHDF5IO(path, mode='w') as io:
+                io.write(nwb)
+            with NWBHDF5IO(path, mode='a') as io:
+                nwb = io.read()
+                with self.assertRaisesRegex(ValueError, 'unlimited first axis'):
+                    nwb.acquisition['ts'].append_data([4.])
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
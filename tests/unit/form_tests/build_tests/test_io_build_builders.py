@@ -1,6 +1,7 @@
 import unittest2 as unittest
+import numpy as np
 
-from pynwb.form.build import GroupBuilder, DatasetBuilder, LinkBuilder
+from pynwb.form.build import GroupBuilder, DatasetBuilder, LinkBuilder, LazyGroupBuilder
 
 
 class GroupBuilderSetterTests(unittest.TestCase):
@@ -286,6 +287,100 @@ class GroupBuilderDeepUpdateTests(unittest.TestCase):
         self.assertEqual(gb1['link2'], gb2['link2'])
 
 
+class LazyGroupBuilderTests(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = 0
+
+        def loader(builder):
+            self.calls += 1
+            builder.set_attribute('attr1', 'value1')
+            builder.set_dataset(DatasetBuilder('dataset1', [1, 2, 3]))
+            subgroup = LazyGroupBuilder('subgroup1', loader=lambda b: b.set_group(GroupBuilder('subgroup2')))
+            builder.set_group(subgroup)
+        self.gb = LazyGroupBuilder('gb', loader=loader)
+
+    def test_not_loaded(self):
+        self.assertFalse(self.gb.loaded)
+        self.assertEqual(self.calls, 0)
+
+    def test_load_on_access(self):
+        self.assertEqual(self.gb.attributes, {'attr1': 'value1'})
+        self.assertTrue(self.gb.loaded)
+        self.assertIn('dataset1', self.gb.datasets)
+        self.assertIn('subgroup1', self.gb)
+        self.assertEqual(self.calls, 1)
+
+    def test_getitem_path(self):
+        sub = self.gb['subgroup1/subgroup2']
+        self.assertIsInstance(sub, GroupBuilder)
+        self.assertIs(sub.parent, self.gb['subgroup1'])
+
+    def test_set_attribute_loads_first(self):
+        self.gb.set_attribute('attr1', 'value2')
+        self.assertEqual(self.gb['attr1'], 'value2')
+        self.assertEqual(self.calls, 1)
+
+    def test_keys(self):
+        self.assertSetEqual(set(self.gb.keys()), {'attr1', 'dataset1', 'subgroup1'})
+
+
+class BuilderModifiedTests(unittest.TestCase):
+
+    def setUp(self):
+        self.dataset = DatasetBuilder('dataset1', [1, 2, 3], attributes={'attr1': 'value1'})
+        self.subgroup = GroupBuilder('subgroup1', datasets={'dataset1': self.dataset})
+        self.other = GroupBuilder('subgroup2')
+        self.root = GroupBuilder('root', groups={'subgroup1': self.subgroup, 'subgroup2': self.other},
+                                 attributes={'attr1': 1.0})
+        for builder in (self.dataset, self.subgroup, self.other, self.root):
+            builder.written = True
+
+    def test_unwritten_not_modified(self):
+        gb = GroupBuilder('gb')
+        gb.set_attribute('attr1', 'value1')
+        gb.set_group(GroupBuilder('subgroup1'))
+        self.assertFalse(gb.modified)
+        self.assertSetEqual(gb.modified_attributes, set())
+
+    def test_set_attribute(self):
+        self.dataset.set_attribute('attr1', 'value2')
+        self.assertSetEqual(self.dataset.modified_attributes, {'attr1'})
+        self.assertTrue(self.dataset.modified)
+        self.assertTrue(self.subgroup.modified)
+        self.assertTrue(self.root.modified)
+        self.assertFalse(self.other.modified)
+
+    def test_set_same_attribute(self):
+        self.dataset.set_attribute('attr1', 'value1')
+        self.root.set_attribute('attr1', np.float64(1.0))
+        self.assertFalse(self.root.modified)
+
+    def test_add_group(self):
+        self.other.add_group('subgroup3')
+        self.assertTrue(self.other.modified)
+        self.assertTrue(self.root.modified)
+        self.assertFalse(self.subgroup.modified)
+
+    def test_set_written_group(self):
+        self.other.set_group(self.subgroup)
+        self.assertFalse(self.other.modified)
+
+    def test_reset(self):
+        self.dataset.set_attribute('attr2', 'value2')
+        self.dataset.set_modified(False)
+        self.assertFalse(self.dataset.modified)
+        self.assertSetEqual(self.dataset.modified_attributes, set())
+        self.assertTrue(self.root.modified)
+
+    def test_lazy_load(self):
+        gb = LazyGroupBuilder('gb', loader=lambda b: b.set_attribute('attr1', 'value1'), parent=self.root)
+        gb.written = True
+        self.assertEqual(gb.attributes, {'attr1': 'value1'})
+        self.assertFalse(gb.modified)
+        self.assertFalse(self.root.modified)
+
+
 class DatasetBuilderDeepUpdateTests(unittest.TestCase):
 
     def test_overwrite(self):
@@ -3,7 +3,7 @@ import unittest2 as unittest
 from pynwb.form import Container
 from pynwb.form.spec import GroupSpec, AttributeSpec, DatasetSpec, SpecCatalog, SpecNamespace, NamespaceCatalog
 from pynwb.form.spec.spec import ZERO_OR_MANY
-from pynwb.form.build import GroupBuilder, DatasetBuilder
+from pynwb.form.build import GroupBuilder, DatasetBuilder, LazyGroupBuilder
 from pynwb.form.utils import docval, getargs
 from pynwb.form.build import ObjectMapper, BuildManager, TypeMap
 
@@ -208,6 +208,25 @@ class TestNestedBase(with_metaclass(ABCMeta, TestBase)):
         builder = self.manager.build(self.foo_bucket)
         self.assertDictEqual(builder, self.bucket_builder)
 
+    def test_build_lazy(self):
+        ''' Test that a lazy build builds the group of each Container when its contents are first accessed '''
+        builder = self.manager.build(self.foo_bucket, lazy=True)
+        self.assertIsInstance(builder, LazyGroupBuilder)
+        self.assertFalse(builder.loaded)
+        self.assertFalse(builder.is_empty())
+        self.assertFalse(builder.loaded)
+        builder.load()
+        foo_builder = self.manager.build(self.foo_bucket.foos[0])
+        self.assertIsInstance(foo_builder, LazyGroupBuilder)
+        self.assertFalse(foo_builder.loaded)
+
+        def _load(b):
+            for g in b.groups.values():
+                _load(g)
+        _load(builder)
+        self.assertTrue(foo_builder.loaded)
+        self.assertDictEqual(builder, self.bucket_builder)
+
     def test_construct(self):
         container = self.manager.construct(self.bucket_builder)
         self.assertEqual(container, self.foo_bucket)
@@ -6,6 +6,7 @@ from pynwb.form import Container
 from pynwb.form.utils import docval, getargs, get_docval
 
 from abc import ABCMeta
+from copy import copy
 from six import with_metaclass
 
 CORE_NAMESPACE = 'test_core'
@@ -132,6 +133,29 @@ class TestTypeMap(unittest.TestCase):
         self.assertIs(mapper.spec, self.bar_spec)
         self.assertIsInstance(mapper, MyMap)
 
+    def test_copy(self):
+        self.type_map.register_map(Bar, ObjectMapper)
+        type_map_copy = copy(self.type_map)
+        self.assertIs(type_map_copy.get_container_cls(CORE_NAMESPACE, 'Bar'), Bar)
+        self.assertEqual(type_map_copy.get_container_cls_dt(Foo), (CORE_NAMESPACE, 'Foo'))
+
+        class MyMap(ObjectMapper):
+            pass
+
+        # registering with either TypeMap does not change the other
+        type_map_copy.register_map(Bar, MyMap)
+        container_inst = Bar('my_bar', list(range(10)), 'value1', 10)
+        self.assertIsInstance(type_map_copy.get_map(container_inst), MyMap)
+        self.assertNotIsInstance(self.type_map.get_map(container_inst), MyMap)
+
+        class Baz(Foo):
+            pass
+
+        self.type_map.register_container_type(CORE_NAMESPACE, 'Foo', Baz)
+        self.assertIs(self.type_map.get_container_cls(CORE_NAMESPACE, 'Foo'), Baz)
+        self.assertIs(type_map_copy.get_container_cls(CORE_NAMESPACE, 'Foo'), Foo)
+        self.assertEqual(type_map_copy.get_container_cls_dt(Baz), (None, None))
+
 
 class TestDynamicContainer(unittest.TestCase):
 
@@ -283,6 +307,23 @@ class TestObjectMapperNoNesting(TestObjectMapper):
                                 attributes={'attr1': 'value1', 'attr2': 10})
         self.assertDictEqual(builder, expected)
 
+    def test_build_checks_mapper(self):
+        ''' Test that docval still checks the calls made by ObjectMapper methods during a build '''
+        class BadMap(ObjectMapper):
+
+            @docval({'name': 'value', 'type': int, 'doc': 'an integer'})
+            def to_int(self, **kwargs):
+                return getargs('value', kwargs)
+
+            @ObjectMapper.object_attr('attr2')
+            def attr2(self, container, manager):
+                return self.to_int(str(container.attr2))
+
+        self.type_map.register_map(Bar, BadMap)
+        container = Bar('my_bar', list(range(10)), 'value1', 10)
+        with self.assertRaisesRegex(TypeError, 'incorrect type for \'value\''):
+            BuildManager(self.type_map).build(container)
+
     def test_construct(self):
         builder = GroupBuilder('my_bar', datasets={'data': DatasetBuilder('data', list(range(10)))},
                                attributes={'attr1': 'value1', 'attr2': 10, 'data_type': 'Bar',
@@ -2,8 +2,12 @@ import unittest2 as unittest
 import ruamel.yaml as yaml
 import json
 import os
+import shutil
+import tempfile
+from six.moves import cPickle as pickle
 
 from pynwb.form.spec import AttributeSpec, DatasetSpec, GroupSpec, SpecNamespace, NamespaceCatalog
+from pynwb.form.spec.namespace import YAMLSpecReader
 
 
 class TestSpecLoad(unittest.TestCase):
@@ -112,3 +116,107 @@ class TestSpecLoad(unittest.TestCase):
         src_dsets = {s.name for s in self.ext_datasets}
         ext_dsets = {s.name for s in es_spec.datasets}
         self.assertSetEqual(src_dsets, ext_dsets)
+
+    def test_cache(self):
+        cache_dir = tempfile.mkdtemp()
+        try:
+            deps = self.ns_catalog.load_namespaces(self.namespace_path, cache_dir=cache_dir)
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+            # the cached catalog is loaded without parsing the specification file
+            read_spec = YAMLSpecReader.read_spec
+
+            def fail(reader, spec_path):
+                self.fail('specification file read instead of cache')
+            YAMLSpecReader.read_spec = fail
+            try:
+                ns_catalog = NamespaceCatalog()
+                self.assertDictEqual(ns_catalog.load_namespaces(self.namespace_path, cache_dir=cache_dir), deps)
+            finally:
+                YAMLSpecReader.read_spec = read_spec
+            self.assertTupleEqual(ns_catalog.namespaces, (self.NS_NAME,))
+            self.assertTupleEqual(ns_catalog.get_hierarchy(self.NS_NAME, 'SpikeData'), ('SpikeData', 'EphysData'))
+            es_spec = ns_catalog.get_spec(self.NS_NAME, 'SpikeData')
+            self.assertIn('attribute1', {s.name for s in es_spec.attributes})
+            # a changed specification file is loaded from the file and cached again
+            with open(self.specs_path) as f:
+                specs = f.read()
+            with open(self.specs_path, 'w') as f:
+                f.write(specs.replace('ext_extra_attribute', 'ext_changed_attribute'))
+            ns_catalog = NamespaceCatalog()
+            ns_catalog.load_namespaces(self.namespace_path, cache_dir=cache_dir)
+            es_spec = ns_catalog.get_spec(self.NS_NAME, 'SpikeData')
+            self.assertIn('ext_changed_attribute', {s.name for s in es_spec.attributes})
+            self.assertEqual(len(os.listdir(cache_dir)), 2)
+        finally:
+            shutil.rmtree(cache_dir)
+
+    def test_cache_not_empty(self):
+        cache_dir = tempfile.mkdtemp()
+        try:
+            ns_catalog = NamespaceCatalog()
+            ns_catalog.add_namespace('other_ns', SpecNamespace('another namespace', 'other_ns', list()))
+            ns_catalog.load_namespaces(self.namespace_path, cache_dir=cache_dir)
+            self.assertListEqual(os.listdir(cache_dir), list())
+            self.assertTupleEqual(ns_catalog.namespaces, ('other_ns', self.NS_NAME))
+        finally:
+            shutil.rmtree(cache_dir)
+
+    def test_cache_copies(self):
+        cache_dir = tempfile.mkdtemp()
+        copy_dirs = [tempfile.mkdtemp(), tempfile.mkdtemp()]
+        try:
+            # identical files in two locations are cached separately and loaded from either location
+            for copy_dir in copy_dirs:
+                shutil.copy(self.namespace_path, copy_dir)
+                shutil.copy(self.specs_path, copy_dir)
+            for i in range(2):
+                for copy_dir in copy_dirs:
+                    ns_catalog = NamespaceCatalog()
+                    ns_catalog.load_namespaces(os.path.join(copy_dir, self.namespace_path), cache_dir=cache_dir)
+                    self.assertTupleEqual(ns_catalog.namespaces, (self.NS_NAME,))
+                    self.assertIsNotNone(ns_catalog.get_spec(self.NS_NAME, 'SpikeData'))
+            self.assertEqual(len(os.listdir(cache_dir)), 2)
+        finally:
+            for d in [cache_dir] + copy_dirs:
+                shutil.rmtree(d)
+
+    def test_cache_mismatch(self):
+        cache_dir = tempfile.mkdtemp()
+        try:
+            self.ns_catalog.load_namespaces(self.namespace_path, cache_dir=cache_dir)
+            # a cache that does not hold the namespace file is a miss
+            cache_path = os.path.join(cache_dir, os.listdir(cache_dir)[0])
+            with open(cache_path, 'wb') as f:
+                pickle.dump((dict(), dict(), {'other.yaml': dict()}, dict()), f)
+            ns_catalog = NamespaceCatalog()
+            ns_catalog.load_namespaces(self.namespace_path, cache_dir=cache_dir)
+            self.assertIsNotNone(ns_catalog.get_spec(self.NS_NAME, 'SpikeData'))
+        finally:
+            shutil.rmtree(cache_dir)
+
+    def write_including_namespace(self, included):
+        '''Write a namespace file with the test namespace and a namespace that includes the given namespace'''
+        ext_ns = SpecNamespace.build_namespace(doc='an including namespace', name='ext_ns',
+                                               schema=[{'namespace': included}])
+        to_dump = {'namespaces': [self.namespace, ext_ns]}
+        with open(self.namespace_path, 'w') as tmp:
+            yaml.safe_dump(json.loads(json.dumps(to_dump)), tmp, default_flow_style=False)
+
+    def test_cache_included_namespace(self):
+        self.write_including_namespace(self.NS_NAME)
+        cache_dir = tempfile.mkdtemp()
+        try:
+            self.ns_catalog.load_namespaces(self.namespace_path, cache_dir=cache_dir)
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+            # changing the specification of the included namespace changes the cache file
+            with open(self.specs_path) as f:
+                specs = f.read()
+            with open(self.specs_path, 'w') as f:
+                f.write(specs.replace('ext_extra_attribute', 'ext_changed_attribute'))
+            ns_catalog = NamespaceCatalog()
+            ns_catalog.load_namespaces(self.namespace_path, cache_dir=cache_dir)
+            es_spec = ns_catalog.get_spec('ext_ns', 'SpikeData')
+            self.assertIn('ext_changed_attribute', {s.name for s in es_spec.attributes})
+            self.assertEqual(len(os.listdir(cache_dir)), 2)
+        finally:
+            shutil.rmtree(cache_dir)
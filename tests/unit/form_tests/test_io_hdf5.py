@@ -2,11 +2,12 @@ import unittest2 as unittest
 from datetime import datetime
 from dateutil.tz import tzlocal
 import os
-from h5py import File, Dataset, Reference
+from h5py import File, Group, Dataset, Reference, SoftLink, ExternalLink
+from h5py._hl.attrs import AttributeManager
 from six import text_type
 
 from pynwb.form.backends.hdf5 import HDF5IO
-from pynwb.form.build import GroupBuilder, DatasetBuilder, LinkBuilder, BuildManager
+from pynwb.form.build import GroupBuilder, DatasetBuilder, LinkBuilder, BuildManager, LazyGroupBuilder
 
 from pynwb import TimeSeries, get_type_map
 
@@ -264,6 +265,77 @@ class TestHDF5Writer(GroupBuilderTestCase):
         self.assertBuilderEqual(builder, self.builder)
         io.close()
 
+    def test_read_builder_scanned(self):
+        self.maxDiff = None
+        io = HDF5IO(self.path, manager=self.manager, mode='a')
+        io.write_builder(self.builder)
+        io.close()
+        # the children and attributes of every object are collected while scanning the file
+        calls = list()
+        get, getattr = Group.get, AttributeManager.__getitem__
+        Group.get = lambda *args, **kwargs: calls.append('get') or get(*args, **kwargs)
+        AttributeManager.__getitem__ = lambda *args: calls.append(args[1]) or getattr(*args)
+        try:
+            io = HDF5IO(self.path, manager=self.manager, mode='r')
+            builder = io.read_builder()
+        finally:
+            Group.get, AttributeManager.__getitem__ = get, getattr
+        # only the file is checked for a cached spec and an index
+        self.assertSetEqual(set(calls), {'.specloc', '.indexloc'})
+        self.assertBuilderEqual(builder, self.builder)
+        io.close()
+
+    def test_read_builder_lazy(self):
+        self.maxDiff = None
+        io = HDF5IO(self.path, manager=self.manager, mode='a')
+        io.write_builder(self.builder)
+        io.close()
+        io = HDF5IO(self.path, manager=self.manager, mode='r', lazy=True)
+        builder = io.read_builder()
+        self.assertIsInstance(builder, LazyGroupBuilder)
+        self.assertFalse(builder.loaded)
+        acquisition = builder['acquisition']
+        self.assertTrue(builder.loaded)
+        self.assertFalse(acquisition.loaded)
+        self.assertFalse(builder['processing'].loaded)
+        self.assertBuilderEqual(builder, self.builder)
+        io.close()
+
+    def test_read_builder_lazy_link(self):
+        io = HDF5IO(self.path, manager=self.manager, mode='a')
+        io.write_builder(self.builder)
+        io.close()
+        io = HDF5IO(self.path, manager=self.manager, mode='r', lazy=True)
+        builder = io.read_builder()
+        link = builder['processing/test_module/test_timeseries_link']
+        self.assertIsInstance(link, LinkBuilder)
+        self.assertIs(link.builder, builder['acquisition/timeseries/test_timeseries'])
+        self.assertIs(link.builder.parent, builder['acquisition/timeseries'])
+        io.close()
+
+    def test_read_builder_links(self):
+        io = HDF5IO(self.path, manager=self.manager, mode='a')
+        io.write_builder(self.builder)
+        io.close()
+        ext_path = 'test_pynwb_io_hdf5_ext.h5'
+        with File(ext_path, 'w') as f:
+            f.create_dataset('ext_data', data=[1, 2, 3])
+        with File(self.path) as f:
+            f['analysis/soft_link'] = SoftLink('/acquisition/timeseries/test_timeseries/data')
+            f['analysis/ext_link'] = ExternalLink(ext_path, '/ext_data')
+            f['analysis/broken_link'] = SoftLink('/does/not/exist')
+        try:
+            io = HDF5IO(self.path, manager=self.manager, mode='r')
+            with self.assertWarnsRegex(UserWarning, 'Broken Link: /analysis/broken_link'):
+                builder = io.read_builder()
+            analysis = builder['analysis']
+            self.assertSetEqual(set(analysis.links.keys()), {'soft_link', 'ext_link'})
+            self.assertIs(analysis['soft_link'].builder, builder['acquisition/timeseries/test_timeseries/data'])
+            self.assertListEqual(list(analysis['ext_link'].builder.data[:]), [1, 2, 3])
+            io.close()
+        finally:
+            os.remove(ext_path)
+
     def test_overwrite_written(self):
         self.maxDiff = None
         io = HDF5IO(self.path, manager=self.manager, mode='a')
@@ -1,22 +1,31 @@
 import os
 import unittest
 
-from pynwb.form.data_utils import DataChunkIterator
+from pynwb.form.data_utils import DataChunkIterator, BufferPool
 from pynwb.form.backends.hdf5.h5tools import HDF5IO
-from pynwb.form.backends.hdf5 import H5DataIO
-from pynwb.form.build import DatasetBuilder
+from pynwb.form.backends.hdf5 import H5DataIO, H5RegionSlicer, H5ChunkCache, H5ChunkLRUCache, H5ChunkPlanner,\
+    H5RepackPolicy
+from pynwb.form.backends.hdf5 import h5_utils, h5tools
+from pynwb.form.backends.hdf5.h5_utils import H5Dataset, H5ReadAheadDataset, read_regions
+from pynwb.form.build import DatasetBuilder, GroupBuilder, LazyGroupBuilder
 from pynwb.form.spec.namespace import NamespaceCatalog
-from h5py import SoftLink, HardLink, ExternalLink, File
+from pynwb.form.spec import DtypeSpec, RefSpec
+from h5py import SoftLink, HardLink, ExternalLink, File, Dataset
 from pynwb.file import NWBFile
 from pynwb.base import TimeSeries
+from pynwb.image import ImageSeries
 from pynwb import NWBHDF5IO
 from pynwb.spec import NWBNamespace, NWBGroupSpec, NWBDatasetSpec
 
 from pynwb.ecephys import ElectricalSeries
 
 
+import gc
 import tempfile
+import threading
+import time
 import warnings
+import weakref
 import numpy as np
 from datetime import datetime
 from dateutil.tz import tzlocal
@@ -211,6 +220,24 @@ class H5IOTest(unittest.TestCase):
         dset = self.f['test_dataset']
         self.assertListEqual(dset[:].tolist(), a.tolist())
 
+    def test_write_dataset_iterable_growth(self):
+        a = np.arange(103).reshape(103, 1) * [1, 2]
+        daiter = DataChunkIterator.from_iterable(iter(a), buffer_size=2)
+        self.io.write_dataset(self.f, DatasetBuilder('test_dataset', daiter, attributes={}))
+        dset = self.f['test_dataset']
+        # the dataset is grown past the data while writing, and trimmed at the end
+        self.assertEqual(dset.shape, (103, 2))
+        self.assertEqual(dset.maxshape, (None, 2))
+        self.assertListEqual(dset[:].tolist(), a.tolist())
+
+    def test_write_dataset_iterable_known_shape(self):
+        a = np.arange(30).reshape(10, 3)
+        daiter = DataChunkIterator(data=a, buffer_size=4)
+        self.io.write_dataset(self.f, DatasetBuilder('test_dataset', daiter, attributes={}))
+        dset = self.f['test_dataset']
+        self.assertEqual(dset.shape, (10, 3))
+        self.assertListEqual(dset[:].tolist(), a.tolist())
+
     def test_write_dataset_iterable_multidimensional_array_compression(self):
         a = np.arange(30).reshape(5, 2, 3)
         aiter = iter(a)
@@ -274,6 +301,27 @@ class H5IOTest(unittest.TestCase):
         self.assertEqual(dset.shuffle, True)
         self.assertEqual(dset.fletcher32, True)
 
+    def test_write_dataset_compression_workers(self):
+        a = (np.arange(3000) % 97).reshape(100, 30).astype('int32')
+        for name, workers in (('hdf5', None), ('direct', 3)):
+            self.io.write_dataset(self.f, DatasetBuilder(name, H5DataIO(a, compression='gzip', compression_opts=4,
+                                                                        shuffle=True, chunks=(16, 7),
+                                                                        compression_workers=workers),
+                                                         attributes={}))
+        dset = self.f['direct']
+        np.testing.assert_array_equal(dset[:], a)
+        self.assertEqual(dset.compression, 'gzip')
+        self.assertTrue(dset.shuffle)
+        # the chunks are compressed exactly as HDF5 compresses them
+        self.assertEqual(dset.id.get_storage_size(), self.f['hdf5'].id.get_storage_size())
+
+    def test_write_dataset_compression_workers_other_filters(self):
+        a = np.arange(100.)
+        self.io.write_dataset(self.f, DatasetBuilder('test_dataset', H5DataIO(a, compression='gzip', fletcher32=True,
+                                                                              compression_workers=2),
+                                                     attributes={}))
+        np.testing.assert_array_equal(self.f['test_dataset'][:], a)
+
     #############################################
     #  H5DataIO general
     #############################################
@@ -354,6 +402,134 @@ class H5IOTest(unittest.TestCase):
         self.assertListEqual(self.f['test_dataset'][:].tolist(),
                              self.f['test_copy'][:].tolist())
 
+    #############################################
+    #  Region references
+    #############################################
+    def test_read_regions(self):
+        dset = self.f.create_dataset('test_dataset', data=np.arange(60).reshape(15, 4))
+        regions = [dset.regionref[2:4], dset.regionref[5], dset.regionref[...], dset.regionref[[1, 3, 5]],
+                   dset.regionref[1:8:2], dset.regionref[12:14], dset.regionref[:, 1], dset.regionref[3:5, 1:3]]
+        for region, data in zip(regions, read_regions(dset, regions)):
+            np.testing.assert_array_equal(data, dset[region])
+
+    def test_read_regions_table(self):
+        dset = self.f.create_dataset('test_dataset', data=np.array([(i, i * 0.5) for i in range(10)],
+                                                                   dtype=[('a', 'i4'), ('b', 'f8')]))
+        regions = [dset.regionref[0:2], dset.regionref[[7, 9]], dset.regionref[2]]
+        for region, data in zip(regions, read_regions(dset, regions)):
+            np.testing.assert_array_equal(data, dset[region])
+
+    def test_read_regions_columns(self):
+        dset = self.f.create_dataset('test_dataset', data=np.arange(1000).reshape(10, 100))
+        reads = list()
+
+        class RecordingDataset(Dataset):
+            def __getitem__(self, args):
+                reads.append(tuple((s.start, s.stop) for s in args[1:]))
+                return super(RecordingDataset, self).__getitem__(args)
+
+        # regions at opposite ends of the columns are read on their own, and regions next to each other together
+        regions = [dset.regionref[0:2, 0:2], dset.regionref[0:2, 98:100], dset.regionref[3:5, 2:4]]
+        for region, data in zip(regions, read_regions(RecordingDataset(dset.id), regions)):
+            np.testing.assert_array_equal(data, dset[region])
+        self.assertListEqual(sorted(set(reads)), [((0, 4),), ((98, 100),)])
+
+    def test_region_slicer_coalesced(self):
+        dset = self.f.create_dataset('test_dataset', data=np.arange(10))
+        h5dset = H5Dataset(dset, self.io)
+        slicer1 = H5RegionSlicer(h5dset, dset.regionref[0:2])
+        slicer2 = H5RegionSlicer(h5dset, dset.regionref[[2, 5]])
+        self.assertEqual(len(slicer2), 2)
+        self.assertListEqual(slicer1[:].tolist(), [0, 1])
+        # the second region was read along with the first one
+        dset[...] = 0
+        self.assertListEqual(slicer2[:].tolist(), [2, 5])
+
+    def test_region_slicer_unread_dropped(self):
+        dset = self.f.create_dataset('test_dataset', data=np.arange(10))
+        h5dset = H5Dataset(dset, self.io)
+        slicer1 = H5RegionSlicer(h5dset, dset.regionref[0:2])
+        unread = weakref.ref(H5RegionSlicer(h5dset, dset.regionref[[2, 5]]))
+        gc.collect()
+        # the queue does not keep a slicer alive
+        self.assertIsNone(unread())
+        regions = list()
+
+        def recording_read_regions(dset, queued):
+            regions.extend(queued)
+            return read_regions(dset, queued)
+
+        h5_utils.read_regions = recording_read_regions
+        try:
+            self.assertListEqual(slicer1[:].tolist(), [0, 1])
+        finally:
+            h5_utils.read_regions = read_regions
+        # the region of the slicer that is gone was not read
+        self.assertEqual(len(regions), 1)
+
+    def test_region_slicer_queue_pruned(self):
+        dset = self.f.create_dataset('test_dataset', data=np.arange(10))
+        max_batch = h5_utils.MAX_REGION_BATCH
+        h5_utils.MAX_REGION_BATCH = 4
+        try:
+            h5dset = H5Dataset(dset, self.io)
+            kept = H5RegionSlicer(h5dset, dset.regionref[0:1])
+            for i in range(100):
+                H5RegionSlicer(h5dset, dset.regionref[i % 10:i % 10 + 1])
+                gc.collect()
+            # the regions of the slicers that are gone were dropped without reading any of them
+            self.assertLessEqual(len(h5dset._H5Dataset__region_queue), 4)
+            self.assertListEqual(kept[:].tolist(), [0])
+        finally:
+            h5_utils.MAX_REGION_BATCH = max_batch
+
+    def test_region_slicer_batch_size(self):
+        dset = self.f.create_dataset('test_dataset', data=np.arange(10))
+        h5dset = H5Dataset(dset, self.io)
+        max_batch = h5_utils.MAX_REGION_BATCH
+        h5_utils.MAX_REGION_BATCH = 2
+        try:
+            slicers = [H5RegionSlicer(h5dset, dset.regionref[i:i + 1]) for i in range(3)]
+            self.assertListEqual(slicers[0][:].tolist(), [0])
+        finally:
+            h5_utils.MAX_REGION_BATCH = max_batch
+        dset[...] = 0
+        # the second region was read with the first one, and the third was left for a later read
+        self.assertListEqual(slicers[1][:].tolist(), [1])
+        self.assertListEqual(slicers[2][:].tolist(), [0])
+
+    #############################################
+    #  Writing references
+    #############################################
+    def test_write_references(self):
+        root = GroupBuilder('root')
+        target = root.add_group('a').add_group('b')
+        values = root.add_dataset('values', np.arange(10))
+        root.add_dataset('refs', [target, values, target], dtype=DatasetBuilder.OBJECT_REF_TYPE)
+        root.set_attribute('target', target)
+        self.io.write_builder(root)
+        self.assertListEqual([self.f[ref].name for ref in self.f['refs'][:]], ['/a/b', '/values', '/a/b'])
+        self.assertEqual(self.f[self.f.attrs['target']].name, '/a/b')
+
+    def test_write_compound_references(self):
+        root = GroupBuilder('root')
+        targets = [root.add_group('a'), root.add_group('b')]
+        dtype = [DtypeSpec('idx', 'an index', 'int32'), DtypeSpec('target', 'a target', RefSpec('Data', 'object')),
+                 DtypeSpec('label', 'a label', 'text')]
+        data = [(i, targets[i % 3 % 2], 'row %d' % i) for i in range(7)]
+        root.add_dataset('table', data, dtype=dtype)
+        self.io.write_builder(root)
+        table = self.f['table'][:]
+        self.assertListEqual(table['idx'].tolist(), list(range(7)))
+        self.assertListEqual([self.f[ref].name for ref in table['target']], ['/a', '/b', '/a', '/a', '/b', '/a', '/a'])
+        self.assertListEqual(list(table['label']), ['row %d' % i for i in range(7)])
+
+    def test_write_unresolved_reference(self):
+        root = GroupBuilder('root')
+        root.add_dataset('refs', [GroupBuilder('missing')], dtype=DatasetBuilder.OBJECT_REF_TYPE)
+        with self.assertRaisesRegex(RuntimeError, 'Unable to resolve reference'):
+            self.io.write_builder(root)
+
 
 class TestCacheSpec(unittest.TestCase):
 
@@ -401,6 +577,495 @@ class TestCacheSpec(unittest.TestCase):
         return types
 
 
+class TestCacheIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.path = "test_cache_index.nwb"
+        nwbfile = NWBFile("a file with header data", "NB123A", datetime(2018, 6, 1, tzinfo=tzlocal()))
+        device = nwbfile.create_device('device_name')
+        electrode_group = nwbfile.create_electrode_group(
+            name='electrode_group_name',
+            description='desc',
+            device=device,
+            location='unknown')
+        nwbfile.add_electrode(id=0,
+                              x=1.0, y=2.0, z=3.0,
+                              imp=2.718,
+                              location='unknown',
+                              filtering='unknown',
+                              group=electrode_group)
+        etr = nwbfile.create_electrode_table_region([0], 'etr_name')
+        ts1 = TimeSeries(name='ts1', data=[4., 5., 6.], unit='SIunit', timestamps=[0., 1., 2.])
+        ts2 = TimeSeries(name='ts2', data=[7, 8, 9], unit='SIunit', timestamps=ts1)
+        nwbfile.add_acquisition(ElectricalSeries(name='test_eseries', data=[1., 2., 3.], rate=1.0, electrodes=etr))
+        nwbfile.add_acquisition(ts1)
+        nwbfile.add_acquisition(ts2)
+        with NWBHDF5IO(self.path, 'w') as io:
+            io.write(nwbfile, cache_spec=True, cache_index=True)
+
+    def tearDown(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def test_index_written(self):
+        with File(self.path, 'r') as f:
+            self.assertIn('.indexloc', f.attrs)
+            self.assertEqual(f[f.attrs['.indexloc']].name, '/.index')
+
+    def test_read_with_index(self):
+        with NWBHDF5IO(self.path, 'r') as io:
+            builder = io.read_builder()
+            self.assertNotIn('.index', builder)
+            self.assertNotIn('specifications', builder)
+            self.assertNotIn('.indexloc', builder.attributes)
+            nwbfile = io.read()
+            self.assertListEqual(list(nwbfile.acquisition['ts1'].data[:]), [4., 5., 6.])
+            self.assertIs(nwbfile.acquisition['test_eseries'].electrodes.table, nwbfile.electrodes)
+            self.assertEqual(nwbfile.identifier, 'NB123A')
+            self.assertEqual(nwbfile.acquisition['ts1'].conversion, 1.0)
+
+    def read_scanned(self):
+        '''Read the file, and return the NWBFile and whether the file was walked to read it'''
+        calls = list()
+        scan_file = HDF5IO.__dict__['_HDF5IO__scan_file']
+
+        def counting_scan_file(cls, h5obj):
+            calls.append(h5obj.name)
+            return scan_file.__func__(cls, h5obj)
+
+        HDF5IO._HDF5IO__scan_file = classmethod(counting_scan_file)
+        try:
+            with NWBHDF5IO(self.path, 'r') as io:
+                nwbfile = io.read()
+                ts1 = nwbfile.acquisition['ts1']
+                return (ts1.unit, list(ts1.data[:]), sorted(nwbfile.acquisition)), len(calls) > 0
+        finally:
+            HDF5IO._HDF5IO__scan_file = scan_file
+
+    def test_index_used(self):
+        self.assertEqual(self.read_scanned(), (('SIunit', [4., 5., 6.], ['test_eseries', 'ts1', 'ts2']), False))
+
+    def test_index_changed_attribute(self):
+        # change the file behind the back of the index
+        with File(self.path, 'a') as f:
+            f['acquisition/ts1/data'].attrs['unit'] = 'changed'
+        with self.assertWarnsRegex(UserWarning, 'changed after its index was written'):
+            read, scanned = self.read_scanned()
+        self.assertEqual(read, ('changed', [4., 5., 6.], ['test_eseries', 'ts1', 'ts2']))
+        self.assertTrue(scanned)
+
+    def test_index_changed_same_size(self):
+        # a nested change that keeps the size of the file and of every object header
+        with File(self.path, 'a') as f:
+            f['acquisition/ts1/data'].attrs.modify('conversion', 2.0)
+        with self.assertWarnsRegex(UserWarning, 'changed after its index was written'):
+            with NWBHDF5IO(self.path, 'r') as io:
+                self.assertEqual(io.read().acquisition['ts1'].conversion, 2.0)
+
+    def test_index_changed_objects(self):
+        with File(self.path, 'a') as f:
+            f.copy(f['acquisition/ts2'], f['acquisition'], name='ts3')
+            del f['acquisition/ts2']
+        with self.assertWarnsRegex(UserWarning, 'changed after its index was written'):
+            read, scanned = self.read_scanned()
+        self.assertEqual(read, ('SIunit', [4., 5., 6.], ['test_eseries', 'ts1', 'ts3']))
+        self.assertTrue(scanned)
+
+    def test_write_removes_index(self):
+        with NWBHDF5IO(self.path, 'a') as io:
+            nwbfile = io.read()
+            nwbfile.add_acquisition(TimeSeries(name='ts3', data=[1., 2.], unit='SIunit', rate=1.0))
+            io.write(nwbfile)
+        with File(self.path, 'r') as f:
+            self.assertNotIn('.indexloc', f.attrs)
+            self.assertNotIn('.index', f)
+        with NWBHDF5IO(self.path, 'r') as io:
+            self.assertIn('ts3', io.read().acquisition)
+
+    def test_invalid_index(self):
+        with File(self.path, 'a') as f:
+            loc = f.attrs['.indexloc']
+            f[loc][:10] = 0
+        with NWBHDF5IO(self.path, 'r') as io:
+            with self.assertWarnsRegex(UserWarning, 'could not read index'):
+                nwbfile = io.read()
+            self.assertListEqual(list(nwbfile.acquisition['ts1'].data[:]), [4., 5., 6.])
+
+
+class TestMemmap(unittest.TestCase):
+
+    def setUp(self):
+        self.path = "test_memmap.nwb"
+        nwbfile = NWBFile("a file with header data", "NB123A", datetime(2018, 6, 1, tzinfo=tzlocal()))
+        nwbfile.add_acquisition(TimeSeries(name='contiguous', data=np.arange(30.).reshape(10, 3),
+                                           unit='SIunit', rate=1.0))
+        nwbfile.add_acquisition(TimeSeries(name='compressed', data=H5DataIO(np.arange(10), compression='gzip'),
+                                           unit='SIunit', rate=1.0))
+        with NWBHDF5IO(self.path, 'w') as io:
+            io.write(nwbfile)
+
+    def tearDown(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def test_memmap(self):
+        with NWBHDF5IO(self.path, 'r', memmap=True) as io:
+            nwbfile = io.read()
+            data = nwbfile.acquisition['contiguous'].data
+            self.assertIsInstance(data, np.memmap)
+            self.assertFalse(data.flags.writeable)
+            np.testing.assert_array_equal(data[2:4], np.arange(30.).reshape(10, 3)[2:4])
+            compressed = nwbfile.acquisition['compressed'].data
+            self.assertNotIsInstance(compressed, np.memmap)
+            self.assertListEqual(compressed[:].tolist(), list(range(10)))
+
+    def test_no_memmap(self):
+        with NWBHDF5IO(self.path, 'r') as io:
+            nwbfile = io.read()
+            self.assertNotIsInstance(nwbfile.acquisition['contiguous'].data, np.memmap)
+
+
+class TestChunkCache(unittest.TestCase):
+
+    def setUp(self):
+        self.path = "test_chunk_cache.nwb"
+        nwbfile = NWBFile("a file with header data", "NB123A", datetime(2018, 6, 1, tzinfo=tzlocal()))
+        nwbfile.add_acquisition(TimeSeries(name='chunked', data=H5DataIO(np.arange(100.), chunks=(10,)),
+                                           unit='SIunit', rate=1.0))
+        nwbfile.add_acquisition(TimeSeries(name='other', data=H5DataIO(np.arange(100.), chunks=(10,)),
+                                           unit='SIunit', rate=1.0))
+        with NWBHDF5IO(self.path, 'w') as io:
+            io.write(nwbfile)
+
+    def tearDown(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def test_chunk_cache(self):
+        cache = H5ChunkCache(nbytes=4 * 1024**2, nslots=10007, w0=1.0)
+        other = H5ChunkCache(nbytes=2 * 1024**2)
+        with NWBHDF5IO(self.path, 'r', chunk_cache=cache,
+                       dataset_chunk_cache={'acquisition/other/data': other}) as io:
+            nwbfile = io.read()
+            data = nwbfile.acquisition['chunked'].data
+            self.assertTupleEqual(data.id.get_access_plist().get_chunk_cache(), (10007, 4 * 1024**2, 1.0))
+            data = nwbfile.acquisition['other'].data
+            self.assertEqual(data.id.get_access_plist().get_chunk_cache()[1], 2 * 1024**2)
+            self.assertListEqual(data[:3].tolist(), [0., 1., 2.])
+
+    def test_read_ahead(self):
+        with NWBHDF5IO(self.path, 'r', chunk_cache=H5ChunkCache(read_ahead=2)) as io:
+            nwbfile = io.read()
+            data = nwbfile.acquisition['chunked'].data
+            self.assertIsInstance(data, H5ReadAheadDataset)
+            self.assertEqual(len(data), 100)
+            self.assertListEqual(data[0:5].tolist(), list(range(5)))
+            self.assertListEqual(data[5:25].tolist(), list(range(5, 25)))
+            self.assertEqual(data[29], 29.)
+            self.assertEqual(data[-1], 99.)
+            self.assertListEqual(data[::10].tolist(), list(range(0, 100, 10)))
+            self.assertEqual((data.hits, data.misses), (2, 3))
+            self.assertListEqual(list(data)[40:42], [40., 41.])
+            stats = io.get_read_ahead_stats()
+            self.assertDictEqual(stats['/acquisition/chunked/data'], {'hits': 98, 'misses': 7})
+
+    def test_bad_policy(self):
+        with self.assertRaisesRegex(ValueError, 'w0 must be between 0 and 1'):
+            H5ChunkCache(w0=2.0)
+
+
+class TestChunkLRUCache(unittest.TestCase):
+
+    def setUp(self):
+        self.path = "test_chunk_lru_cache.nwb"
+        self.data = np.arange(400.).reshape(100, 4)
+        nwbfile = NWBFile("a file with header data", "NB123A", datetime(2018, 6, 1, tzinfo=tzlocal()))
+        nwbfile.add_acquisition(TimeSeries(name='chunked', unit='SIunit', rate=1.0,
+                                           data=H5DataIO(self.data, chunks=(10, 2), compression='gzip')))
+        with NWBHDF5IO(self.path, 'w') as io:
+            io.write(nwbfile)
+
+    def tearDown(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def test_eviction(self):
+        cache = H5ChunkLRUCache(nbytes=200)
+        cache.put('a', np.zeros(10))
+        cache.put('b', np.zeros(10))
+        self.assertEqual(cache.nbytes, 160)
+        self.assertIsNotNone(cache.get('a'))
+        cache.put('c', np.zeros(6))
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('c'))
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual(cache.nbytes, 128)
+        self.assertAlmostEqual(cache.hit_rate, 2 / 3.)
+        cache.put('d', np.zeros(100))
+        self.assertEqual(len(cache), 2)
+
+    def test_read(self):
+        cache = H5ChunkLRUCache()
+        with NWBHDF5IO(self.path, 'r', chunk_lru_cache=cache) as io:
+            data = io.read().acquisition['chunked'].data
+            for key in (np.s_[5:25], np.s_[7], np.s_[-1, 3], np.s_[3:50:7, 1:], np.s_[..., 2], np.s_[:]):
+                np.testing.assert_array_equal(data[key], self.data[key])
+            misses = cache.misses
+            np.testing.assert_array_equal(data[10:30], self.data[10:30])
+            self.assertEqual(cache.misses, misses)
+            self.assertGreater(cache.hits, 0)
+        self.assertEqual(len(cache), 0)
+
+    def test_read_data(self):
+        pool = BufferPool()
+        with NWBHDF5IO(self.path, 'r') as io:
+            ts = io.read().acquisition['chunked']
+            out = ts.read_data(np.s_[5:25], pool=pool)
+            np.testing.assert_array_equal(out, self.data[5:25])
+            self.assertIs(ts.read_data(np.s_[30:50], pool=pool), out)
+            np.testing.assert_array_equal(out, self.data[30:50])
+            np.testing.assert_array_equal(ts.read_data(np.s_[7, 1:3]), self.data[7, 1:3])
+        with NWBHDF5IO(self.path, 'r', chunk_lru_cache=H5ChunkLRUCache()) as io:
+            ts = io.read().acquisition['chunked']
+            out = np.empty((20, 4))
+            self.assertIs(ts.read_data(np.s_[5:25], out=out), out)
+            np.testing.assert_array_equal(out, self.data[5:25])
+
+
+class TestChunkPlanner(unittest.TestCase):
+
+    def setUp(self):
+        self.path = "test_chunk_planner.nwb"
+
+    def tearDown(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def test_chunk_shape(self):
+        planner = H5ChunkPlanner(nbytes=8000)
+        self.assertEqual(planner.get_chunk_shape((10000, 10), 'float64'), (100, 10))
+        self.assertEqual(planner.get_chunk_shape((50, 10), 'float64'), (50, 10))
+        self.assertEqual(planner.get_chunk_shape((50, 10), 'float64', maxshape=(None, 10)), (100, 10))
+        self.assertEqual(planner.get_chunk_shape((100, 64, 64), 'uint8', access='frame'), (1, 64, 64))
+        self.assertEqual(planner.get_chunk_shape((100, 64, 64), 'uint16', access='frame'), (1, 32, 64))
+        self.assertEqual(planner.get_chunk_shape((10000, 10), 'float32', access='series'), (2000, 1))
+        self.assertIsNone(planner.get_chunk_shape((), 'float64'))
+        with self.assertRaises(ValueError):
+            planner.get_chunk_shape((10,), 'float64', access='random')
+
+    def test_access_pattern(self):
+        planner = H5ChunkPlanner()
+        planner.set_access_pattern('ImageSeries', 'frame')
+        self.assertEqual(planner.get_access_pattern(('TwoPhotonSeries', 'ImageSeries'), 'data'), 'frame')
+        self.assertEqual(planner.get_access_pattern(('TwoPhotonSeries', 'ImageSeries'), 'timestamps'), 'time')
+        self.assertEqual(planner.get_access_pattern(('TimeSeries',), 'data'), 'time')
+
+    def test_write(self):
+        nwbfile = NWBFile("a file with header data", "NB123A", datetime(2018, 6, 1, tzinfo=tzlocal()))
+        nwbfile.add_acquisition(ImageSeries(name='images', data=H5DataIO(np.zeros((20, 16, 16)), compression=True),
+                                            unit='SIunit', rate=1.0))
+        nwbfile.add_acquisition(TimeSeries(name='ts', data=H5DataIO(np.zeros((20, 16)), compression=True),
+                                           unit='SIunit', rate=1.0))
+        with NWBHDF5IO(self.path, 'w') as io:
+            io.write(nwbfile)
+        with File(self.path, 'r') as f:
+            self.assertEqual(f['acquisition/images/data'].chunks, (1, 16, 16))
+            self.assertEqual(f['acquisition/ts/data'].chunks, (20, 16))
+
+    def test_write_chunks_true(self):
+        nwbfile = NWBFile("a file with header data", "NB123A", datetime(2018, 6, 1, tzinfo=tzlocal()))
+        nwbfile.add_acquisition(ImageSeries(name='images', unit='SIunit', rate=1.0,
+                                            data=H5DataIO(np.zeros((20, 16, 16)), compression=True, chunks=True)))
+        iterator = DataChunkIterator(data=np.zeros((20, 16, 16)), buffer_size=5)
+        nwbfile.add_acquisition(ImageSeries(name='iterated', unit='SIunit', rate=1.0,
+                                            data=H5DataIO(iterator, chunks=True)))
+        with NWBHDF5IO(self.path, 'w') as io:
+            io.write(nwbfile)
+        # chunks=True lets h5py guess the chunk shape, rather than the planner choosing one frame per chunk
+        with File(self.path, 'a') as f:
+            guessed = f.create_dataset('guessed', shape=(20, 16, 16), dtype=f['acquisition/images/data'].dtype,
+                                       chunks=True).chunks
+            self.assertNotEqual(guessed, (1, 16, 16))
+            self.assertEqual(f['acquisition/images/data'].chunks, guessed)
+            self.assertIsNotNone(f['acquisition/iterated/data'].chunks)
+            self.assertNotEqual(f['acquisition/iterated/data'].chunks, (1, 16, 16))
+
+
+class TestWriteQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.path = "test_write_queue.nwb"
+        self.nwbfile = NWBFile("a file with header data", "NB123A", datetime(2018, 6, 1, tzinfo=tzlocal()))
+
+    def tearDown(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def test_write(self):
+        threads = list()
+        data = np.arange(100.).reshape(50, 2)
+
+        def _rows():
+            for row in data:
+                threads.append(threading.current_thread())
+                yield row
+        dci = DataChunkIterator(data=_rows(), buffer_size=7)
+        self.nwbfile.add_acquisition(TimeSeries(name='ts', data=dci, unit='SIunit', rate=1.0))
+        with NWBHDF5IO(self.path, 'w') as io:
+            io.write(self.nwbfile, write_queue_size=2)
+        self.assertEqual(len(threads), 50)
+        # the iterator reads its first chunk when it is created, to determine the shape of the data
+        self.assertNotIn(threading.current_thread(), threads[7:])
+        with NWBHDF5IO(self.path, 'r') as io:
+            np.testing.assert_array_equal(io.read().acquisition['ts'].data[:], data)
+
+    def test_producer_error(self):
+        def _rows():
+            for i in range(20):
+                if i == 12:
+                    raise ValueError('bad row')
+                yield [float(i)]
+        dci = DataChunkIterator(data=_rows(), buffer_size=3)
+        self.nwbfile.add_acquisition(TimeSeries(name='ts', data=dci, unit='SIunit', rate=1.0))
+        with NWBHDF5IO(self.path, 'w') as io:
+            with self.assertRaisesRegex(ValueError, 'bad row'):
+                io.write(self.nwbfile, write_queue_size=1)
+
+    def fail_writes(self, after):
+        '''Make writing chunks fail after the given number of chunks, and return a function to undo it'''
+        max_bounds = HDF5IO.__dict__['__selection_max_bounds__']
+        calls = list()
+
+        def failing_max_bounds(cls, selection):
+            calls.append(selection)
+            if len(calls) > after:
+                raise RuntimeError('write failed')
+            return max_bounds.__func__(cls, selection)
+
+        HDF5IO.__selection_max_bounds__ = classmethod(failing_max_bounds)
+
+        def undo():
+            HDF5IO.__selection_max_bounds__ = max_bounds
+        return undo
+
+    def test_writer_error(self):
+        rows = list()
+
+        def _rows():
+            while True:
+                rows.append(len(rows))
+                yield [float(len(rows))]
+        dci = DataChunkIterator(data=_rows(), buffer_size=3)
+        self.nwbfile.add_acquisition(TimeSeries(name='ts', data=dci, unit='SIunit', rate=1.0))
+        undo = self.fail_writes(2)
+        try:
+            with NWBHDF5IO(self.path, 'w') as io:
+                with self.assertRaisesRegex(RuntimeError, 'write failed'):
+                    io.write(self.nwbfile, write_queue_size=2)
+                # the producer was stopped when writing failed
+                self.assertNotIn('DataChunk producer', [t.name for t in threading.enumerate()])
+                produced = len(rows)
+                time.sleep(0.2)
+                self.assertEqual(len(rows), produced)
+        finally:
+            undo()
+
+    def test_stalled_producer(self):
+        release = threading.Event()
+
+        def _rows():
+            for i in range(6):
+                yield [float(i)]
+            release.wait()
+        dci = DataChunkIterator(data=_rows(), buffer_size=3)
+        self.nwbfile.add_acquisition(TimeSeries(name='ts', data=dci, unit='SIunit', rate=1.0))
+        undo = self.fail_writes(1)
+        timeout = h5tools.PRODUCER_JOIN_TIMEOUT
+        h5tools.PRODUCER_JOIN_TIMEOUT = 0.1
+        try:
+            with NWBHDF5IO(self.path, 'w') as io:
+                # the write fails rather than waiting for the stalled iterator
+                with self.assertWarnsRegex(UserWarning, 'did not stop'):
+                    with self.assertRaisesRegex(RuntimeError, 'write failed'):
+                        io.write(self.nwbfile, write_queue_size=1)
+        finally:
+            h5tools.PRODUCER_JOIN_TIMEOUT = timeout
+            release.set()
+            undo()
+
+    def test_negative_size(self):
+        with NWBHDF5IO(self.path, 'w') as io:
+            with self.assertRaises(ValueError):
+                io.write(self.nwbfile, write_queue_size=-1)
+
+
+class TestReadReferences(unittest.TestCase):
+
+    def setUp(self):
+        self.path = "test_read_references.nwb"
+        nwbfile = NWBFile("a file with header data", "NB123A", datetime(2018, 6, 1, tzinfo=tzlocal()))
+        ts1 = TimeSeries(name='ts1', data=[1., 2.], unit='SIunit', rate=1.0)
+        ts2 = TimeSeries(name='ts2', data=[3., 4.], unit='SIunit', rate=1.0)
+        nwbfile.add_acquisition(ts1)
+        nwbfile.add_acquisition(ts2)
+        for i in range(10):
+            nwbfile.add_epoch(float(i), i + 1., ['tag'], [ts1, ts2] if i % 2 else [ts2])
+        with NWBHDF5IO(self.path, 'w') as io:
+            io.write(nwbfile)
+
+    def tearDown(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def test_table_refs(self):
+        with NWBHDF5IO(self.path, 'r') as io:
+            nwbfile = io.read()
+            table = nwbfile.epochs['timeseries'].target.data
+            calls = list()
+            get_container = io.get_container
+
+            def _get_container(h5obj):
+                calls.append(h5obj.name)
+                return get_container(h5obj)
+            io.get_container = _get_container
+            rows = table[:]
+            self.assertEqual(len(rows), 15)
+            self.assertListEqual([row[2].name for row in rows[:4]], ['ts2', 'ts1', 'ts2', 'ts2'])
+            self.assertIs(rows[0][2], nwbfile.acquisition['ts2'])
+            self.assertEqual(len(calls), 2)
+            self.assertListEqual([row[2].name for row in table[1:3]], ['ts1', 'ts2'])
+            self.assertEqual(len(calls), 2)
+            self.assertEqual(table[1][2].name, 'ts1')
+
+    def test_table_refs_blocks(self):
+        expected = list()
+        for i in range(10):
+            expected.extend(['ts1', 'ts2'] if i % 2 else ['ts2'])
+        block = h5_utils.REF_ADDRESS_BLOCK
+        h5_utils.REF_ADDRESS_BLOCK = 4
+        try:
+            with NWBHDF5IO(self.path, 'r') as io:
+                table = io.read().epochs['timeseries'].target.data
+                cached = table._H5Dataset__ref_addresses
+                self.assertListEqual([row[2].name for row in table[5:7]], expected[5:7])
+                # only the addresses of the block that holds the selected rows were read
+                self.assertListEqual(sorted(cached['timeseries']), [1])
+                self.assertListEqual([row[2].name for row in table[13:]], expected[13:])
+                self.assertListEqual(sorted(cached['timeseries']), [1, 3])
+                self.assertListEqual([row[2].name for row in table[:]], expected)
+        finally:
+            h5_utils.REF_ADDRESS_BLOCK = block
+
+    def test_ref_rows(self):
+        get_rows = h5_utils.H5Dataset._H5Dataset__get_rows
+        for arg in (slice(2, 7), slice(None, None, 3), slice(-4, None), 3, -2, np.int64(4), [1, 5, -1],
+                    np.array([0, 9]), np.arange(10) % 3 == 0, (slice(1, 4),), Ellipsis):
+            np.testing.assert_array_equal(get_rows(arg, 10), np.arange(10)[arg])
+        # the rows are found without an index of the whole dataset
+        np.testing.assert_array_equal(get_rows(slice(5, 7), 10 ** 15), [5, 6])
+        self.assertEqual(get_rows(-1, 10 ** 15), 10 ** 15 - 1)
+
+
 class TestLinkResolution(unittest.TestCase):
 
     def test_link_resolve(self):
@@ -428,6 +1093,10 @@ class TestLinkResolution(unittest.TestCase):
             io.write(nwbfile)
         with NWBHDF5IO(self.path, 'r') as io:
             io.read()
+        with NWBHDF5IO(self.path, 'r', lazy=True) as io:
+            read_nwbfile = io.read()
+            electrodes = read_nwbfile.get_acquisition('theta_phase').electrodes
+            self.assertIs(electrodes.table, read_nwbfile.ec_electrodes)
 
     def setUp(self):
         self.path = "test_link_resolve.nwb"
@@ -437,6 +1106,84 @@ class TestLinkResolution(unittest.TestCase):
             os.remove(self.path)
 
 
+class TestReadContainers(unittest.TestCase):
+
+    def setUp(self):
+        self.path = "test_read_containers.nwb"
+        nwbfile = NWBFile("a file with header data", "NB123A", datetime(2018, 6, 1, tzinfo=tzlocal()))
+        device = nwbfile.create_device('device_name')
+        electrode_group = nwbfile.create_electrode_group(
+            name='electrode_group_name',
+            description='desc',
+            device=device,
+            location='unknown')
+        nwbfile.add_electrode(id=0,
+                              x=1.0, y=2.0, z=3.0,
+                              imp=2.718,
+                              location='unknown',
+                              filtering='unknown',
+                              group=electrode_group)
+        etr = nwbfile.create_electrode_table_region([0], 'etr_name')
+        nwbfile.add_acquisition(ElectricalSeries(name='test_eseries', data=[1., 2., 3.], rate=1.0, electrodes=etr))
+        nwbfile.add_acquisition(TimeSeries(name='test_timeseries', data=[4., 5., 6.], unit='SIunit', rate=1.0))
+        with NWBHDF5IO(self.path, 'w') as io:
+            io.write(nwbfile)
+
+    def tearDown(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def test_read_path(self):
+        with NWBHDF5IO(self.path, 'r', lazy=True) as io:
+            ret = io.read_containers(paths='/acquisition/test_timeseries')
+            self.assertListEqual(list(ret.keys()), ['/acquisition/test_timeseries'])
+            ts = ret['/acquisition/test_timeseries']
+            self.assertIsInstance(ts, TimeSeries)
+            self.assertListEqual(ts.data[:].tolist(), [4., 5., 6.])
+            self.assertFalse(io.read_builder()['general'].loaded)
+
+    def test_read_path_with_link(self):
+        with NWBHDF5IO(self.path, 'r', lazy=True) as io:
+            ret = io.read_containers(paths=['acquisition/test_eseries'])
+            es = ret['/acquisition/test_eseries']
+            self.assertIsInstance(es, ElectricalSeries)
+            self.assertEqual(es.electrodes.table.name, 'electrodes')
+
+    def test_read_data_type(self):
+        with NWBHDF5IO(self.path, 'r', lazy=True) as io:
+            ret = io.read_containers(data_types='TimeSeries')
+            self.assertSetEqual(set(ret.keys()), {'/acquisition/test_timeseries', '/acquisition/test_eseries'})
+            self.assertIsInstance(ret['/acquisition/test_eseries'], ElectricalSeries)
+
+    def test_read_data_type_pruned(self):
+        with NWBHDF5IO(self.path, 'r', lazy=True) as io:
+            ret = io.read_containers(data_types='Device')
+            self.assertListEqual(list(ret.keys()), ['/general/devices/device_name'])
+            # a TimeSeries cannot hold a Device, so it was not loaded
+            acquisition = io.read_builder()['acquisition']
+            self.assertFalse(acquisition['test_timeseries'].loaded)
+            self.assertFalse(acquisition['test_eseries'].loaded)
+
+    def test_read_data_type_unknown_namespace(self):
+        with File(self.path, 'a') as f:
+            group = f['acquisition'].create_group('unknown')
+            group.attrs['neurodata_type'] = 'Unknown'
+            group.attrs['namespace'] = 'unknown'
+        with NWBHDF5IO(self.path, 'r', lazy=True) as io:
+            ret = io.read_containers(data_types='TimeSeries')
+            self.assertSetEqual(set(ret.keys()), {'/acquisition/test_timeseries', '/acquisition/test_eseries'})
+
+    def test_read_missing_path(self):
+        with NWBHDF5IO(self.path, 'r') as io:
+            with self.assertRaisesRegex(ValueError, "not found"):
+                io.read_containers(paths='/acquisition/missing')
+
+    def test_read_path_without_data_type(self):
+        with NWBHDF5IO(self.path, 'r') as io:
+            with self.assertRaisesRegex(ValueError, "does not have a data_type"):
+                io.read_containers(paths='/acquisition')
+
+
 class NWBHDF5IOMultiFileTest(unittest.TestCase):
     """Tests for h5tools IO tools"""
 
@@ -524,5 +1271,128 @@ class NWBHDF5IOMultiFileTest(unittest.TestCase):
         self.assertTrue(isinstance(f3.get('/acquisition/test_timeseries/data', getlink=True), HardLink))
 
 
+class TestRepackFile(unittest.TestCase):
+
+    def setUp(self):
+        self.path = "test_repack_source.nwb"
+        self.dest = "test_repack_dest.nwb"
+        self.data = np.arange(4000, dtype=np.float64).reshape((400, 10))
+        nwbfile = NWBFile("a file with header data", "NB123A", datetime(2018, 6, 1, tzinfo=tzlocal()))
+        device = nwbfile.create_device(name='device')
+        group = nwbfile.create_electrode_group('group', 'a group', 'a location', device)
+        for i in range(10):
+            nwbfile.add_electrode(np.nan, np.nan, np.nan, np.nan, 'a', 'a', group, id=i)
+        electrodes = nwbfile.create_electrode_table_region(list(range(2, 8)), 'some electrodes')
+        es = ElectricalSeries(name='es', data=self.data[:, 2:8], electrodes=electrodes,
+                              timestamps=np.arange(400.))
+        ts = TimeSeries(name='ts', data=self.data, unit='SIunit', timestamps=es)
+        nwbfile.add_acquisition(es)
+        nwbfile.add_acquisition(ts)
+        for i in range(4):
+            nwbfile.add_epoch(float(i), i + 1., ['tag'], [es, ts] if i % 2 else [ts])
+        with NWBHDF5IO(self.path, 'w') as io:
+            io.write(nwbfile)
+        with File(self.path) as f:
+            f['analysis/ts'] = SoftLink('/acquisition/ts')
+
+    def tearDown(self):
+        for path in (self.path, self.dest):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_create_options(self):
+        policy = H5RepackPolicy()
+        policy.set_type_options('TimeSeries', chunks=(50, 10))
+        policy.set_type_options('ElectricalSeries', compression='gzip', access='series')
+        policy.set_dataset_options('/acquisition/ts/data', dtype='float32', shuffle=True)
+        with File(self.path, 'r') as f:
+            options = policy.get_create_options(f['acquisition/es/data'], ('ElectricalSeries', 'TimeSeries'))
+            self.assertEqual(options['chunks'], (400, 1))
+            self.assertEqual(options['compression'], 'gzip')
+            options = policy.get_create_options(f['acquisition/ts/data'], ('TimeSeries',))
+            self.assertEqual(options['chunks'], (50, 10))
+            self.assertEqual(options['dtype'], np.dtype('float32'))
+            self.assertTrue(options['shuffle'])
+            self.assertEqual(policy.get_create_options(f['acquisition/es/timestamps']), {'dtype': np.dtype('float64')})
+            with self.assertRaises(ValueError):
+                policy.set_dataset_options('/acquisition/ts/data', chunks=False, compression=True)
+            policy.set_dataset_options('/session_description', dtype='float32')
+            with self.assertRaises(ValueError):
+                policy.get_create_options(f['session_description'])
+
+    def test_repack(self):
+        policy = H5RepackPolicy()
+        policy.set_type_options('TimeSeries', chunks=(64, 10), compression='gzip', compression_opts=4, shuffle=True,
+                                dtype='float32')
+        policy.set_type_options('ElectricalSeries', access='series')
+        NWBHDF5IO.repack_file(self.path, self.dest, policy=policy, workers=2, buffer_size=2000)
+        with File(self.dest, 'r') as f:
+            ts_data = f['acquisition/ts/data']
+            self.assertEqual(ts_data.chunks, (64, 10))
+            self.assertEqual((ts_data.compression, ts_data.compression_opts), ('gzip', 4))
+            self.assertEqual(ts_data.dtype, np.dtype('float32'))
+            self.assertEqual(f['acquisition/es/data'].chunks, (400, 1))
+            self.assertEqual(f['acquisition/es/data'].dtype, np.dtype('float32'))
+            self.assertEqual(f.get('analysis/ts', getlink=True).path, '/acquisition/ts')
+        with NWBHDF5IO(self.dest, 'r') as io:
+            nwbfile = io.read()
+            np.testing.assert_array_equal(nwbfile.acquisition['ts'].data[:], self.data)
+            np.testing.assert_array_equal(nwbfile.acquisition['es'].data[:], self.data[:, 2:8])
+            self.assertListEqual(list(nwbfile.acquisition['es'].electrodes.data[:]), list(range(2, 8)))
+            self.assertIs(nwbfile.acquisition['es'].electrodes.table, nwbfile.electrodes)
+            table = nwbfile.epochs['timeseries'].target.data
+            self.assertListEqual([row[2].name for row in table[:]], ['ts', 'es', 'ts', 'ts', 'es', 'ts'])
+            self.assertIs(table[1][2], nwbfile.acquisition['es'])
+
+    def test_repack_unchanged(self):
+        with File(self.path) as f:
+            f['analysis/timestamps'] = f['acquisition/es/timestamps']
+            f['analysis'].attrs['region'] = f['acquisition/ts/data'].regionref[2:5, 1]
+        NWBHDF5IO.repack_file(self.path, self.dest)
+        with File(self.path, 'r') as src, File(self.dest, 'r') as dest:
+            self.assertEqual(dest['analysis/timestamps'], dest['acquisition/es/timestamps'])
+            region = dest['analysis'].attrs['region']
+            self.assertEqual(dest[region].name, '/acquisition/ts/data')
+            np.testing.assert_array_equal(dest[region][region], self.data[2:5, 1:2])
+            self.assertIsNone(dest['acquisition/ts/data'].chunks)
+            self.assertEqual(dest['acquisition/ts/data'].dtype, src['acquisition/ts/data'].dtype)
+            self.assertSetEqual(set(dest.attrs.keys()), set(src.attrs.keys()))
+            self.assertEqual(dest['acquisition/ts'].attrs['neurodata_type'], 'TimeSeries')
+
+
+class TestStreamWrite(unittest.TestCase):
+
+    def setUp(self):
+        self.path = "test_stream_write.nwb"
+        self.nwbfile = NWBFile("a file with header data", "NB123A", datetime(2018, 6, 1, tzinfo=tzlocal()))
+        self.ts1 = TimeSeries(name='ts1', data=np.arange(10.), unit='SIunit', rate=1.0)
+        self.ts2 = TimeSeries(name='ts2', data=[3., 4.], unit='SIunit', rate=1.0)
+        self.nwbfile.add_acquisition(self.ts1)
+        self.nwbfile.add_acquisition(self.ts2)
+        for i in range(4):
+            self.nwbfile.add_epoch(float(i), i + 1., ['tag'], [self.ts1, self.ts2] if i % 2 else [self.ts2])
+
+    def tearDown(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def test_write(self):
+        with NWBHDF5IO(self.path, 'w') as io:
+            io.write(self.nwbfile, stream=True)
+            f_builder = io.manager.build(self.nwbfile)
+            self.assertIsInstance(f_builder, LazyGroupBuilder)
+            # the written datasets hold on to the HDF5 datasets instead of the data
+            data = io.manager.build(self.ts1)['data']
+            self.assertIsInstance(data.data, Dataset)
+            self.assertEqual(data.data.name, '/acquisition/ts1/data')
+            self.assertIsInstance(io.manager.build(self.nwbfile.epochs)['timeseries'].data, Dataset)
+        with NWBHDF5IO(self.path, 'r') as io:
+            nwbfile = io.read()
+            np.testing.assert_array_equal(nwbfile.acquisition['ts1'].data[:], np.arange(10.))
+            table = nwbfile.epochs['timeseries'].target.data
+            self.assertListEqual([row[2].name for row in table[:]], ['ts2', 'ts1', 'ts2', 'ts2', 'ts1', 'ts2'])
+            self.assertIs(table[1][2], nwbfile.acquisition['ts1'])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,7 +1,7 @@
 import unittest2 as unittest
-from six import text_type
+from six import text_type, with_metaclass
 
-from pynwb.form.utils import docval, fmt_docval_args
+from pynwb.form.utils import docval, fmt_docval_args, trusted_docval, ExtenderMeta
 
 
 class MyTestClass(object):
@@ -317,6 +317,90 @@ class TestDocValidator(unittest.TestCase):
         with self.assertRaises(ValueError):
             method(self, arg1=[[1, 1]])
 
+    def test_mutable_default(self):
+        """Test that docval does not share mutable defaults between calls"""
+        @docval({'name': 'arg1', 'type': list, 'doc': 'argument1 is a list', 'default': list()})
+        def method(self, **kwargs):
+            return kwargs['arg1']
+        ret1 = method(self)
+        ret1.append(1)
+        ret2 = method(self)
+        self.assertListEqual(ret2, [])
+        self.assertIsNot(ret1, ret2)
+
+    def test_type_name(self):
+        """Test that docval checks types given as the name of a class"""
+        @docval({'name': 'arg1', 'type': 'MyTestClass', 'doc': 'argument1 is a MyTestClass'})
+        def method(self, **kwargs):
+            return kwargs['arg1']
+        self.assertIs(method(self, self.test_obj_sub), self.test_obj_sub)
+        with self.assertRaisesRegex(TypeError, "incorrect type for 'arg1'"):
+            method(self, 'a string')
+
+    def test_trusted(self):
+        """Test that docval skips type and shape checks in trusted mode"""
+        @docval({'name': 'arg1', 'type': 'array_data', 'doc': 'argument1 is a 1D array', 'shape': (None,)})
+        def method(self, **kwargs):
+            return kwargs['arg1']
+        with trusted_docval():
+            with trusted_docval():
+                self.assertEqual(self.test_obj.basic_add2('a string', 'not an int'),
+                                 {'arg1': 'a string', 'arg2': 'not an int'})
+            self.assertEqual(method(self, [[1, 2]]), [[1, 2]])
+            self.assertDictEqual(self.test_obj.basic_add2_kw('a string', 100),
+                                 {'arg1': 'a string', 'arg2': 100, 'arg3': False})
+            with self.assertRaisesRegex(TypeError, "missing argument 'arg2'"):
+                self.test_obj.basic_add2('a string')
+            with self.assertRaisesRegex(TypeError, "unrecognized argument: 'bar'"):
+                self.test_obj.basic_add2('a string', 100, bar=1000)
+        with self.assertRaises(TypeError):
+            self.test_obj.basic_add2('a string', 'not an int')
+        with self.assertRaises(ValueError):
+            method(self, [[1, 2]])
+
+
+class TestExtenderMeta(unittest.TestCase):
+
+    def test_post_init(self):
+        """Test that the post-init routines of a class and its bases run for each subclass"""
+        calls = list()
+
+        class Base(with_metaclass(ExtenderMeta, object)):
+
+            @ExtenderMeta.post_init
+            def __base_hook(cls, name, bases, classdict):
+                calls.append(('base', name))
+
+        class Sub(Base):
+
+            @ExtenderMeta.post_init
+            def __sub_hook(cls, name, bases, classdict):
+                calls.append(('sub', name))
+
+        class SubSub(Sub):
+            pass
+
+        self.assertListEqual(calls, [('base', 'Base'), ('base', 'Sub'), ('sub', 'Sub'),
+                                     ('base', 'SubSub'), ('sub', 'SubSub')])
+
+    def test_post_init_override(self):
+        """Test that a post-init routine overridden by a plain attribute does not run"""
+        calls = list()
+
+        class Base(with_metaclass(ExtenderMeta, object)):
+
+            @ExtenderMeta.post_init
+            def hook(cls, name, bases, classdict):
+                calls.append(name)
+
+        class Sub(Base):
+            hook = None
+
+        class SubSub(Sub):
+            pass
+
+        self.assertListEqual(calls, ['Base'])
+
 
 if __name__ == '__main__':
     unittest.main()
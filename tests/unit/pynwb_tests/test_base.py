@@ -2,7 +2,7 @@ import unittest2 as unittest
 import numpy as np
 
 from pynwb.base import ProcessingModule, TimeSeries, Images, Image
-from pynwb.form.data_utils import DataChunkIterator
+from pynwb.form.data_utils import DataChunkIterator, BufferPool
 from pynwb.form.backends.hdf5 import H5DataIO
 
 
@@ -102,6 +102,41 @@ class TestTimeSeries(unittest.TestCase):
         for xi, yi in zip(data, generator_factory()):
             assert np.allclose(xi, yi)
 
+    def test_read_data(self):
+        data = np.arange(20.).reshape(10, 2)
+        ts = TimeSeries('test_ts', data, 'unit', rate=1.0)
+        out = np.empty((3, 2))
+        self.assertIs(ts.read_data(np.s_[2:5], out=out), out)
+        np.testing.assert_array_equal(out, data[2:5])
+        np.testing.assert_array_equal(ts.read_data(), data)
+        np.testing.assert_array_equal(ts.read_data((Ellipsis, 1)), data[:, 1])
+
+    def test_read_data_pool(self):
+        ts = TimeSeries('test_ts', [[1., 2.], [3., 4.], [5., 6.]], 'unit', rate=1.0)
+        pool = BufferPool(nbuffers=2)
+        first = ts.read_data(0, pool=pool)
+        second = ts.read_data(1, pool=pool)
+        self.assertIsNot(first, second)
+        np.testing.assert_array_equal(first, [1., 2.])
+        self.assertIs(ts.read_data(2, pool=pool), first)
+        np.testing.assert_array_equal(first, [5., 6.])
+        self.assertEqual(len(pool), 2)
+
+    def test_append_data(self):
+        ts = TimeSeries('test_ts', [1., 2.], 'unit', timestamps=np.array([0., 1.]))
+        ts.append_data([3., 4.], timestamps=[2., 3.])
+        self.assertListEqual(ts.data, [1., 2., 3., 4.])
+        np.testing.assert_array_equal(ts.timestamps, [0., 1., 2., 3.])
+        with self.assertRaises(ValueError):
+            ts.append_data([5.])
+
+    def test_append_data_rate(self):
+        ts = TimeSeries('test_ts', np.zeros((2, 3)), 'unit', rate=1.0)
+        ts.append_data(np.ones((1, 3)))
+        np.testing.assert_array_equal(ts.data, [[0., 0., 0.], [0., 0., 0.], [1., 1., 1.]])
+        with self.assertRaises(ValueError):
+            ts.append_data([[1., 1., 1.]], timestamps=[3.])
+
     def test_no_time(self):
         with self.assertRaisesRegex(TypeError, "either 'timestamps' or 'rate' must be specified"):
             TimeSeries('test_ts2', [10, 11, 12, 13, 14, 15], 'grams')
@@ -3,6 +3,7 @@ import unittest2 as unittest
 from pynwb.core import DynamicTable, VectorData, ElementIdentifiers, NWBTable
 from pynwb import NWBFile, TimeSeries
 
+import numpy as np
 import pandas as pd
 from datetime import datetime
 from dateutil.tz import tzlocal
@@ -98,6 +99,29 @@ class TestDynamicTable(unittest.TestCase):
         self.add_rows(table)
         self.check_table(table)
 
+    def with_numpy_columns(self):
+        columns = [
+            VectorData(name=s['name'], description=s['description'], data=np.array(d))
+            for s, d in zip(self.spec, self.data)
+        ]
+        return DynamicTable("with_numpy_columns", 'a test table', columns=columns)
+
+    def test_add_row_numpy_upcast(self):
+        table = self.with_numpy_columns()
+        table.add_row({'foo': 6.5, 'bar': 60.0, 'baz': 'hippopotamus'})
+        self.assertEqual(table['foo'][5], 6.5)
+        self.assertEqual(table['foo'].data.dtype, np.float64)
+        self.assertEqual(table['baz'][5], 'hippopotamus')
+        self.assertEqual(list(table['baz'].data[:5]), self.data[2])
+
+    def test_extend_numpy_upcast(self):
+        col = VectorData(name='foo', description='foo column', data=np.array(['a', 'b']))
+        col.extend(['hello', 'world'])
+        self.assertEqual(list(col.data), ['a', 'b', 'hello', 'world'])
+        col = VectorData(name='foo', description='foo column', data=np.array([1, 2]))
+        col.extend([2.5])
+        self.assertEqual(list(col.data), [1., 2., 2.5])
+
     def test_get_item(self):
         table = self.with_spec()
         self.add_rows(table)
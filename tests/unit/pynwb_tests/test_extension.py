@@ -46,6 +46,23 @@ class TestExtension(unittest.TestCase):
         self.test_export()
         get_type_map(extensions=os.path.join(self.tempdir, self.ns_path))
 
+    def test_load_namespace_memoized(self):
+        self.test_export()
+        ns_path = os.path.join(self.tempdir, self.ns_path)
+        type_map1 = get_type_map(extensions=ns_path)
+        type_map2 = get_type_map(extensions=ns_path)
+        self.assertIsNot(type_map1, type_map2)
+        self.assertIn(self.prefix, type_map2.namespace_catalog.namespaces)
+        # a change to the specification file loads the extension again
+        ext_path = os.path.join(self.tempdir, self.ext_source)
+        with open(ext_path) as f:
+            ext = f.read()
+        with open(ext_path, 'w') as f:
+            f.write(ext.replace('TetrodeSeries', 'OctrodeSeries'))
+        os.utime(ext_path, (0, 0))
+        type_map3 = get_type_map(extensions=ns_path)
+        self.assertIsNotNone(type_map3.namespace_catalog.get_spec(self.prefix, 'OctrodeSeries'))
+
     def test_get_class(self):
         self.test_export()
         type_map = get_type_map(extensions=os.path.join(self.tempdir, self.ns_path))
@@ -83,6 +83,15 @@ class NWBFileTest(unittest.TestCase):
         with self.assertRaises(IndexError):
             nwbfile.create_electrode_table_region(list(range(6)), 'test')
 
+    def test_add_electrode_data_checked(self):
+        nwbfile = NWBFile('a', 'b', datetime.now(tzlocal()))
+        device = nwbfile.create_device('a')
+        elecgrp = nwbfile.create_electrode_group('a', 'b', device=device, location='a')
+        data = {'x': np.nan, 'y': np.nan, 'z': np.nan, 'imp': np.nan, 'location': 'a', 'filtering': 'a',
+                'group': elecgrp, 'id': 'a'}
+        with self.assertRaises(TypeError):
+            nwbfile.add_electrode(np.nan, np.nan, np.nan, np.nan, 'a', 'a', elecgrp, data=data)
+
     def test_access_group_after_io(self):
         """
         Motivated by #739
@@ -194,6 +203,29 @@ class NWBFileTest(unittest.TestCase):
         self.nwbfile.add_unit(id=3)
         self.assertEqual(len(self.nwbfile.units), 3)
 
+    def test_add_unit_checked_once(self):
+        """Test that the arguments of add_unit are not checked again by Units.add_unit"""
+        from pynwb.form import utils
+        calls = list()
+        get_data_shape = utils.get_data_shape
+
+        def counting_get_data_shape(*args, **kwargs):
+            calls.append(args[0])
+            return get_data_shape(*args, **kwargs)
+
+        utils.get_data_shape = counting_get_data_shape
+        try:
+            self.nwbfile.add_unit(spike_times=[1., 2.], obs_intervals=[[0., 3.]], id=1)
+        finally:
+            utils.get_data_shape = get_data_shape
+        self.assertEqual(calls, [[1., 2.], [[0., 3.]]])
+        with self.assertRaises(ValueError):
+            self.nwbfile.add_unit(spike_times=[[1., 2.]], id=2)
+
+    def test_add_unit_data_checked(self):
+        with self.assertRaises(TypeError):
+            self.nwbfile.add_unit(data=[1., 2.])
+
     def test_add_trial_column(self):
         self.nwbfile.add_trial_column('trial_type', 'the type of trial')
         self.assertEqual(self.nwbfile.trials.colnames, ('start_time', 'stop_time', 'trial_type'))